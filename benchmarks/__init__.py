@@ -0,0 +1,4 @@
+"""Microbenchmarks for the vLLora instrumentation hot paths.
+
+Run with ``python -m benchmarks.hot_paths``. See README.md for options.
+"""
@@ -0,0 +1,145 @@
+"""Check that tracing and events keep working in forked worker processes.
+
+The parent sets up vLLora against in-process stub OTLP gRPC and ``/events``
+servers and sends spans and events, so its export workers, gRPC channel
+and connection pool exist before the fork. A background thread keeps
+emitting spans while ``--workers`` children are forked, so locks are
+likely to be held at the moment of a fork. Each child sends its own spans
+and events and exits through ``os._exit`` like every multiprocessing
+worker, so only vLLora's exit hook flushes them.
+
+The run fails if a child hangs or exits with an error, if any worker's
+spans or events are missing at the collector, or if the parent can no
+longer flush afterwards.
+
+    python -m benchmarks.fork_safety
+    python -m benchmarks.fork_safety --workers 16 --spans 200
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from .stub_servers import StubGatewayServer, StubOtlpServer
+
+WORKER_ATTRIBUTE = "benchmark.worker"
+PARENT = "parent"
+
+
+def setup(otlp: StubOtlpServer, gateway: StubGatewayServer):
+    os.environ["VLLORA_API_BASE_URL"] = gateway.base_url
+    os.environ.setdefault("VLLORA_API_KEY", "bench")
+    os.environ.setdefault("VLLORA_PROJECT_ID", "bench")
+    os.environ.setdefault("VLLORA_EVENTS_MAX_QUEUE_SIZE", "65536")
+    os.environ.setdefault("VLLORA_EXPORT_MAX_QUEUE_SIZE", "65536")
+
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from vllora.core.tracing import get_tracing_registry, vLLoraTracing
+
+    provider = TracerProvider()
+    get_tracing_registry().install(provider, vLLoraTracing(otlp.endpoint, client_name="benchmarks"))
+    return provider.get_tracer("vllora-benchmarks")
+
+
+def emit(tracer, worker: str, count: int):
+    from vllora.core.events import send_vllora_event_sync
+
+    for i in range(count):
+        with tracer.start_as_current_span("fork-check", attributes={WORKER_ATTRIBUTE: worker}) as span:
+            send_vllora_event_sync(span, "fork-check", {"index": i})
+
+
+def wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8, help="child processes to fork")
+    parser.add_argument("--spans", type=int, default=100, help="spans, each with one event, sent by every process")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a worker or flush counts as hung")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        print("fork() is not available on this platform")
+        return 0
+
+    otlp = StubOtlpServer(count_spans_by=WORKER_ATTRIBUTE).start()
+    gateway = StubGatewayServer().start()
+    try:
+        import vllora
+
+        tracer = setup(otlp, gateway)
+        emit(tracer, PARENT, args.spans)
+        vllora.flush(args.timeout)
+
+        # Keep the export and event workers busy while forking
+        stop = threading.Event()
+        background = [0]
+
+        def keep_emitting():
+            while not stop.is_set():
+                emit(tracer, PARENT, 1)
+                background[0] += 1
+
+        emitter = threading.Thread(target=keep_emitting, daemon=True)
+        emitter.start()
+
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=emit, args=(tracer, f"worker-{i}", args.spans), daemon=True)
+            for i in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(args.timeout)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        emitter.join(args.timeout)
+
+        failures = []
+        for worker in workers:
+            if worker.is_alive():
+                failures.append(f"{worker.name} hung")
+                worker.kill()
+            elif worker.exitcode != 0:
+                failures.append(f"{worker.name} exited with {worker.exitcode}")
+
+        # The parent must still deliver what it sends after the forks
+        emit(tracer, PARENT, args.spans)
+        if not vllora.flush(args.timeout):
+            failures.append("parent flush timed out")
+
+        expected = {f"worker-{i}": args.spans for i in range(args.workers)}
+        expected[PARENT] = 2 * args.spans + background[0]
+        total = sum(expected.values())
+        wait_for(lambda: sum(otlp.spans.values()) >= total and gateway.events >= total, args.timeout)
+        for worker, count in expected.items():
+            received = otlp.spans.get(worker, 0)
+            if received != count:
+                failures.append(f"{worker}: {received} of {count} spans arrived")
+        if gateway.events != total:
+            failures.append(f"{gateway.events} of {total} events arrived")
+
+        print(f"{args.workers} workers forked and finished in {elapsed * 1000:.0f} ms")
+        print(f"spans: {sum(otlp.spans.values())} of {total}, events: {gateway.events} of {total}")
+        for failure in failures:
+            print(f"FAIL {failure}")
+        return 1 if failures else 0
+    finally:
+        gateway.stop()
+        otlp.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# A benchmark takes the number of calls to make and returns a closure making
+# them. Everything done before returning the closure is setup and not timed.
+Benchmark = Callable[[int], Callable[[], None]]
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark whose optional dependencies are not installed."""
+
+
+class BenchmarkResult:
+    def __init__(self, name: str, calls: int, ns_per_call: Optional[float] = None, peak_bytes_per_call: Optional[float] = None, retained_blocks_per_call: Optional[float] = None, skipped: Optional[str] = None):
+        self.name = name
+        self.calls = calls
+        self.ns_per_call = ns_per_call
+        self.peak_bytes_per_call = peak_bytes_per_call
+        self.retained_blocks_per_call = retained_blocks_per_call
+        self.skipped = skipped
+
+    def to_dict(self) -> Dict[str, object]:
+        return dict(self.__dict__)
+
+
+def run_benchmark(name: str, benchmark: Benchmark, calls: int, rounds: int = 5) -> BenchmarkResult:
+    """Time ``rounds`` fresh rounds of ``calls`` calls and keep the fastest, then measure memory in one more round.
+
+    Peak bytes is the highest traced memory during the round above what was
+    in use before it; retained blocks are allocations still alive after it.
+    Both are divided by the number of calls.
+    """
+    best = None
+    try:
+        for _ in range(rounds):
+            run = benchmark(calls)
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter_ns()
+                run()
+                elapsed = time.perf_counter_ns() - start
+            finally:
+                gc.enable()
+            best = elapsed if best is None else min(best, elapsed)
+
+        run = benchmark(calls)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            before_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            after_snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+    except SkipBenchmark as e:
+        return BenchmarkResult(name, calls, skipped=str(e))
+
+    retained = sum(stat.count_diff for stat in after_snapshot.compare_to(before_snapshot, "filename") if stat.count_diff > 0)
+    return BenchmarkResult(
+        name,
+        calls,
+        ns_per_call=best / calls,
+        peak_bytes_per_call=(peak - before) / calls,
+        retained_blocks_per_call=retained / calls,
+    )
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    if not results:
+        return "No benchmarks matched"
+    width = max(len(result.name) for result in results)
+    lines = [f"{'benchmark':<{width}}  {'us/call':>10}  {'peak B/call':>12}  {'blocks/call':>12}"]
+    for result in results:
+        if result.skipped:
+            lines.append(f"{result.name:<{width}}  skipped: {result.skipped}")
+            continue
+        lines.append(
+            f"{result.name:<{width}}  {result.ns_per_call / 1000:>10.2f}  "
+            f"{result.peak_bytes_per_call:>12.1f}  {result.retained_blocks_per_call:>12.2f}"
+        )
+    return "\n".join(lines)
+
+
+def save_results(results: List[BenchmarkResult], path: str):
+    with open(path, "w") as f:
+        json.dump([result.to_dict() for result in results], f, indent=2)
+
+
+def compare_to_baseline(results: List[BenchmarkResult], path: str, tolerance: float) -> List[str]:
+    """Return a message for every benchmark slower than its baseline by more than ``tolerance``."""
+    with open(path) as f:
+        baseline = {entry["name"]: entry for entry in json.load(f)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if result.skipped or not previous or previous.get("ns_per_call") is None:
+            continue
+        if result.ns_per_call > previous["ns_per_call"] * (1 + tolerance):
+            regressions.append(
+                f"{result.name}: {result.ns_per_call / 1000:.2f}us/call, "
+                f"baseline {previous['ns_per_call'] / 1000:.2f}us/call"
+            )
+    return regressions
@@ -0,0 +1,391 @@
+"""Per-call overhead and allocations of the vLLora instrumentation hot paths.
+
+Spans are exported to an in-process OTLP gRPC stub and events are posted to
+an in-process ``/events`` stub, so every benchmark exercises the real
+export path without a gateway. ADK and OpenAI Agents benchmarks are skipped
+when those extras are not installed.
+
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --save baseline.json
+    python -m benchmarks.hot_paths --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from .harness import Benchmark, SkipBenchmark, compare_to_baseline, format_results, run_benchmark, save_results
+from .stub_servers import StubGatewayServer, StubOtlpServer
+
+SESSION_ID = str(uuid.uuid4())
+SPANS_PER_TRACE = 20
+PROMPT = "You are a helpful assistant. " * 150
+# Keys in the ADK session state the callbacks run against
+STATE_KEYS = 200
+
+# name -> (benchmark, fraction of --calls it runs)
+BENCHMARKS: Dict[str, Tuple[Benchmark, float]] = {}
+
+_env = SimpleNamespace()
+
+
+def benchmark(name: str, scale: float = 1.0):
+    def register(fn: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = (fn, scale)
+        return fn
+    return register
+
+
+def setup(otlp: StubOtlpServer, gateway: StubGatewayServer):
+    os.environ["VLLORA_API_BASE_URL"] = gateway.base_url
+    os.environ.setdefault("VLLORA_API_KEY", "bench")
+    os.environ.setdefault("VLLORA_PROJECT_ID", "bench")
+    # Keep the queues from overflowing so drops do not flatter the numbers
+    os.environ.setdefault("VLLORA_EVENTS_MAX_QUEUE_SIZE", "65536")
+    os.environ.setdefault("VLLORA_EXPORT_MAX_QUEUE_SIZE", "65536")
+
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from vllora.core.tracing import vLLoraTracing
+
+    _env.processor = vLLoraTracing(otlp.endpoint, client_name="benchmarks").get_processor()
+    provider = TracerProvider()
+    provider.add_span_processor(_env.processor)
+    _env.tracer = provider.get_tracer("vllora-benchmarks")
+    # Spans from this tracer are not seen by the processor until a benchmark hands them over
+    _env.bare_tracer = TracerProvider().get_tracer("vllora-benchmarks")
+
+
+def _make_traces(calls: int) -> List[list]:
+    """Build unprocessed spans, SPANS_PER_TRACE per trace, the root first."""
+    from opentelemetry.trace import set_span_in_context
+
+    traces = []
+    while sum(len(spans) for spans in traces) < calls:
+        size = min(SPANS_PER_TRACE, calls - sum(len(spans) for spans in traces))
+        root = _env.bare_tracer.start_span("invocation", attributes={"session.id": SESSION_ID})
+        context = set_span_in_context(root)
+        spans = [root]
+        for _ in range(size - 1):
+            spans.append(_env.bare_tracer.start_span("call_llm", context=context, attributes={
+                "openinference.span.kind": "LLM",
+                "llm.model_name": "gpt-4o-mini",
+                "input.value": PROMPT,
+            }))
+        traces.append(spans)
+    return traces
+
+
+@benchmark("processor.on_start")
+def processor_on_start(calls: int):
+    spans = [span for spans in _make_traces(calls) for span in spans]
+    on_start = _env.processor.on_start
+
+    def run():
+        for span in spans:
+            on_start(span)
+    return run
+
+
+@benchmark("processor.on_end")
+def processor_on_end(calls: int):
+    ended = []
+    for spans in _make_traces(calls):
+        for span in spans:
+            _env.processor.on_start(span)
+        # Children end before the root, which releases the trace
+        for span in spans[1:] + spans[:1]:
+            span.end()
+            ended.append(span)
+    on_end = _env.processor.on_end
+
+    def run():
+        for span in ended:
+            on_end(span)
+    return run
+
+
+def _event_span():
+    return _env.tracer.start_span("agent_run [bench_agent]", attributes={"vllora.thread_id": SESSION_ID})
+
+
+@benchmark("events.send_sync.no_loop")
+def events_send_sync_no_loop(calls: int):
+    from vllora.core.events import send_vllora_event_sync
+
+    span = _event_span()
+
+    def run():
+        for _ in range(calls):
+            send_vllora_event_sync(span, "agent", {"vllora.agent_name": "bench_agent", "vllora.thread_id": SESSION_ID})
+    return run
+
+
+@benchmark("events.send_sync.in_loop")
+def events_send_sync_in_loop(calls: int):
+    from vllora.core.events import send_vllora_event_sync
+
+    span = _event_span()
+    loop = asyncio.new_event_loop()
+
+    async def send_all():
+        for _ in range(calls):
+            send_vllora_event_sync(span, "agent", {"vllora.agent_name": "bench_agent", "vllora.thread_id": SESSION_ID})
+
+    def run():
+        try:
+            loop.run_until_complete(send_all())
+        finally:
+            loop.close()
+    return run
+
+
+@benchmark("streaming.chunk")
+def streaming_chunk(calls: int):
+    from vllora.core.streaming import StreamTimer
+
+    timer = StreamTimer(_env.tracer.start_span("call_llm"))
+
+    def run():
+        chunk = timer.chunk
+        for _ in range(calls):
+            chunk()
+        timer.finish()
+    return run
+
+
+def _adk():
+    try:
+        from google.adk.models.llm_request import LlmRequest
+        from google.adk.models.llm_response import LlmResponse
+        from google.adk.sessions.state import State
+
+        from vllora.adk import agent
+    except ImportError as e:
+        raise SkipBenchmark(f"google-adk not installed ({e.name})")
+    return agent, LlmRequest, LlmResponse, State
+
+
+def _callback_context(State):
+    invocation_context = SimpleNamespace(session=SimpleNamespace(id=SESSION_ID), invocation_id=f"e-{uuid.uuid4()}")
+    value = {f"key_{i}": {"turn": i, "note": "x" * 64} for i in range(STATE_KEYS)}
+    return SimpleNamespace(state=State(value, {}), agent_name="bench_agent", _invocation_context=invocation_context)
+
+
+def _in_span(name: str, loop):
+    """Run ``loop`` with a recording span current, as ADK does around callbacks."""
+    from opentelemetry import trace
+
+    span = _env.tracer.start_span(name)
+
+    def run():
+        with trace.use_span(span, end_on_exit=False):
+            loop()
+    return run
+
+
+@benchmark("adk.agent_callbacks")
+def adk_agent_callbacks(calls: int):
+    agent, _, _, State = _adk()
+    context = _callback_context(State)
+
+    def loop():
+        for _ in range(calls):
+            agent.vllora_before_agent_cb(context)
+            agent.vllora_after_agent_cb(context)
+    return _in_span("agent_run [bench_agent]", loop)
+
+
+@benchmark("adk.model_callbacks")
+def adk_model_callbacks(calls: int):
+    agent, LlmRequest, LlmResponse, State = _adk()
+    context = _callback_context(State)
+    requests = [LlmRequest(model="gpt-4o-mini") for _ in range(calls)]
+    response = LlmResponse()
+
+    def loop():
+        for request in requests:
+            agent.vllora_before_model_cb(context, request)
+            agent.vllora_after_model_cb(context, response)
+    return _in_span("call_llm", loop)
+
+
+@benchmark("adk.tool_callbacks")
+def adk_tool_callbacks(calls: int):
+    agent, LlmRequest, _, State = _adk()
+    context = _callback_context(State)
+    tool = SimpleNamespace(name="bench_tool")
+    args = {"city": "Berlin"}
+    response = {"temperature": 21}
+    # Every tool call follows the model call that requested it
+    for _ in range(calls):
+        agent.vllora_before_model_cb(context, LlmRequest(model="gpt-4o-mini"))
+
+    def loop():
+        for _ in range(calls):
+            agent.vllora_before_tool_cb(tool, args, context)
+            agent.vllora_after_tool_cb(tool, args, context, response)
+    return _in_span("execute_tool bench_tool", loop)
+
+
+def _patched_adk_tracer():
+    agent = _adk()[0]
+    if agent.original_start_as_current_span is None:
+        agent.init_agent()
+    return agent
+
+
+@benchmark("adk.start_as_current_span.original")
+def adk_start_as_current_span_original(calls: int):
+    agent = _patched_adk_tracer()
+    tracer = _env.tracer
+
+    def loop():
+        for _ in range(calls):
+            with agent.original_start_as_current_span(tracer, "call_llm"):
+                pass
+    return _in_span("agent_run [bench_agent]", loop)
+
+
+@benchmark("adk.start_as_current_span.patched")
+def adk_start_as_current_span_patched(calls: int):
+    _patched_adk_tracer()
+    tracer = _env.tracer
+
+    def loop():
+        for _ in range(calls):
+            with tracer.start_as_current_span("call_llm"):
+                pass
+    return _in_span("agent_run [bench_agent]", loop)
+
+
+def _openai():
+    try:
+        from vllora.openai import agent
+    except ImportError as e:
+        raise SkipBenchmark(f"openai agents extras not installed ({e.name})")
+    return agent
+
+
+def _openai_post(calls: int, patched: bool):
+    import httpx
+    from openai import AsyncOpenAI
+    from opentelemetry import trace
+
+    agent = _openai()
+    post = agent.post if patched else agent.original_post
+    span = _env.tracer.start_span("call_llm", attributes={"vllora.run_id": str(uuid.uuid4()), "vllora.thread_id": SESSION_ID})
+    loop = asyncio.new_event_loop()
+
+    async def post_all():
+        client = AsyncOpenAI(base_url=_env.gateway.base_url, api_key="bench", max_retries=0)
+        with trace.use_span(span, end_on_exit=False):
+            for _ in range(calls):
+                await post(client, "/chat/completions", cast_to=httpx.Response, body={"model": "gpt-4o-mini"}, options={})
+        await client.close()
+
+    def run():
+        try:
+            loop.run_until_complete(post_all())
+        finally:
+            loop.close()
+    return run
+
+
+# Each call is a real round trip to the stub, so fewer calls are made
+@benchmark("openai.post.original", scale=0.1)
+def openai_post_original(calls: int):
+    return _openai_post(calls, patched=False)
+
+
+@benchmark("openai.post.patched", scale=0.1)
+def openai_post_patched(calls: int):
+    return _openai_post(calls, patched=True)
+
+
+def _openai_on_span_start(calls: int, patched: bool):
+    agent = _openai()
+    from agents.tracing import agent_span, set_trace_processors
+    from agents.tracing import trace as agents_trace
+
+    # The spans are handed to the processor directly, not through the SDK's processors
+    set_trace_processors([])
+    processor = agent.OpenInferenceTracingProcessor(_env.tracer)
+    on_span_start = agent.on_span_start if patched else agent.original_on_span_start
+    # The processor attaches a context per span; keep that out of the caller's context
+    context = contextvars.copy_context()
+
+    def prepare():
+        current_trace = agents_trace("bench")
+        current_trace.start(mark_as_current=True)
+        agent.on_trace_start(processor, current_trace)
+        spans = [agent_span(name="bench_agent") for _ in range(calls)]
+        for span in spans:
+            span.start()
+        return spans
+    spans = context.run(prepare)
+
+    def loop():
+        for span in spans:
+            on_span_start(processor, span)
+
+    def run():
+        context.run(loop)
+    return run
+
+
+@benchmark("openai.on_span_start.original")
+def openai_on_span_start_original(calls: int):
+    return _openai_on_span_start(calls, patched=False)
+
+
+@benchmark("openai.on_span_start.patched")
+def openai_on_span_start_patched(calls: int):
+    return _openai_on_span_start(calls, patched=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="calls per round")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds, the fastest is reported")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    otlp = StubOtlpServer().start()
+    gateway = StubGatewayServer().start()
+    _env.gateway = gateway
+    try:
+        setup(otlp, gateway)
+        results = []
+        for name, (fn, scale) in BENCHMARKS.items():
+            if args.filter in name:
+                results.append(run_benchmark(name, fn, max(1, int(args.calls * scale)), args.rounds))
+        _env.processor.force_flush()
+    finally:
+        otlp.stop()
+        gateway.stop()
+
+    print(format_results(results))
+    print(f"\nstub gateway received {otlp.exports} OTLP exports, {gateway.event_posts} event posts, {gateway.requests} model requests")
+
+    if args.save:
+        save_results(results, args.save)
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Import cost of the vLLora entry points, measured with ``python -X importtime``.
+
+Each module is imported in a fresh interpreter several times and the
+fastest cumulative import time is reported. The run also fails if an entry
+point loads a heavy dependency it is meant to defer to first use or
+``init()``, such as the gRPC exporter, httpx, litellm or the OpenAI Agents SDK.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --save imports.json
+    python -m benchmarks.import_time --baseline imports.json --tolerance 0.3
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+from .harness import BenchmarkResult, compare_to_baseline, save_results
+
+# Never loaded by importing any vLLora entry point
+DEFERRED_EVERYWHERE = (
+    "grpc",
+    "httpx",
+    "litellm",
+    "pdb",
+    "trace",
+    "http.server",
+    "opentelemetry.exporter.otlp.proto.grpc.trace_exporter",
+    "opentelemetry.exporter.otlp.proto.http.trace_exporter",
+)
+
+# Entry point -> extra modules it must not load
+ENTRY_POINTS: Dict[str, Tuple[str, ...]] = {
+    "vllora": ("opentelemetry.sdk.trace", "google.adk", "agents", "openai"),
+    "vllora.core": ("google.adk", "agents", "openai", "openinference"),
+    "vllora.adk": ("google.adk", "agents", "openai"),
+    "vllora.openai": ("agents", "openai", "openinference"),
+}
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module: str) -> Tuple[int, Set[str]]:
+    """Import ``module`` in a fresh interpreter; return its cumulative import time in microseconds and every module loaded."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [_REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=_REPO_ROOT,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr}")
+
+    cumulative = None
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            # The header line
+            continue
+        name = parts[2].strip()
+        loaded.add(name)
+        if name == module and not parts[2][1:].startswith(" "):
+            cumulative = int(parts[1])
+    if cumulative is None:
+        # Already imported by the interpreter itself
+        cumulative = 0
+    return cumulative, loaded
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module, the fastest is reported")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results: List[BenchmarkResult] = []
+    problems: List[str] = []
+    print(f"{'module':<16}  {'import ms':>10}  deferred modules loaded")
+    for module, deferred in ENTRY_POINTS.items():
+        best = None
+        loaded: Set[str] = set()
+        for _ in range(args.repeat):
+            micros, loaded = measure_import(module)
+            best = micros if best is None else min(best, micros)
+        unexpected = sorted(name for name in DEFERRED_EVERYWHERE + deferred if name in loaded)
+        print(f"{module:<16}  {best / 1000:>10.1f}  {', '.join(unexpected) or '-'}")
+        results.append(BenchmarkResult(f"import {module}", 1, ns_per_call=best * 1000))
+        if unexpected:
+            problems.append(f"import {module} loads {', '.join(unexpected)}")
+
+    if args.save:
+        save_results(results, args.save)
+    if args.baseline:
+        problems.extend(compare_to_baseline(results, args.baseline, args.tolerance))
+    if problems:
+        print("\nRegressions:")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import collections
+import gzip
+import json
+import threading
+import zlib
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+_GRPC_EXPORT_METHOD = "/opentelemetry.proto.collector.trace.v1.TraceService/Export"
+
+
+def _span_attribute_values(request: bytes, key: str) -> List[str]:
+    from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
+
+    values = []
+    for resource_spans in ExportTraceServiceRequest.FromString(request).resource_spans:
+        for scope_spans in resource_spans.scope_spans:
+            for span in scope_spans.spans:
+                value = next((attribute.value.string_value for attribute in span.attributes if attribute.key == key), "")
+                values.append(value)
+    return values
+
+
+class StubOtlpServer:
+    """In-process OTLP gRPC collector that accepts and counts every export.
+
+    With ``count_spans_by`` set, it also decodes each request and counts
+    spans per value of that span attribute in ``spans``.
+    """
+
+    def __init__(self, count_spans_by: Optional[str] = None):
+        import grpc
+
+        self.exports = 0
+        self.received_bytes = 0
+        self.spans: "collections.Counter[str]" = collections.Counter()
+        self._lock = threading.Lock()
+
+        def export(request: bytes, context) -> bytes:
+            with self._lock:
+                self.exports += 1
+                self.received_bytes += len(request)
+                if count_spans_by is not None:
+                    self.spans.update(_span_attribute_values(request, count_spans_by))
+            # An empty ExportTraceServiceResponse
+            return b""
+
+        handler = grpc.method_handlers_generic_handler(
+            "opentelemetry.proto.collector.trace.v1.TraceService",
+            {"Export": grpc.unary_unary_rpc_method_handler(export)},
+        )
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        self._server.add_generic_rpc_handlers((handler,))
+        self.port = self._server.add_insecure_port("127.0.0.1:0")
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._server.start()
+        return self
+
+    def stop(self):
+        self._server.stop(grace=None)
+
+
+def _event_count(body: bytes, content_encoding: Optional[str]) -> int:
+    # Batches of events are posted as a JSON array
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    elif content_encoding == "deflate":
+        body = zlib.decompress(body)
+    elif content_encoding == "zstd":
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompress(body)
+    payload = json.loads(body)
+    return len(payload) if isinstance(payload, list) else 1
+
+
+class StubGatewayServer:
+    """In-process HTTP gateway serving ``/events`` and ``/v1/chat/completions``."""
+
+    def __init__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; avoid delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server._lock:
+                    if self.path.rstrip("/").endswith("/events"):
+                        server.event_posts += 1
+                        server.events += _event_count(body, self.headers.get("Content-Encoding"))
+                    else:
+                        server.requests += 1
+                    server.received_bytes += len(body)
+                payload = b"{}"
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.events = 0
+        self.event_posts = 0
+        self.requests = 0
+        self.received_bytes = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-gateway", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -8,8 +8,40 @@ from .feature_flags import (
     FEATURE_OPENAI,
 )
 
+
+
+def health():
+    """Return the circuit state of the vLLora events and OTLP endpoints."""
+    from .core.health import endpoint_health
+    return endpoint_health()
+
+
+def stats():
+    """Return vLLora's own pipeline metrics: spans processed and exported, events sent, failed and dropped, latencies, cache size and queue depths."""
+    # Importing the pipeline registers its metrics
+    from .core import tracing  # noqa: F401
+    from .core.metrics import get_metrics_registry
+    return get_metrics_registry().snapshot()
+
+
+def flush(timeout=None) -> bool:
+    """Export every span and send every event queued so far, waiting at most ``timeout`` seconds (default VLLORA_SHUTDOWN_TIMEOUT)."""
+    from .core.lifecycle import flush as flush_pipelines
+    return flush_pipelines(timeout)
+
+
+def shutdown(timeout=None) -> bool:
+    """Flush, then stop vLLora's worker threads and close its exporters and connections. Also runs at exit and on SIGTERM."""
+    from .core.lifecycle import shutdown as shutdown_pipelines
+    return shutdown_pipelines(timeout)
+
+
 # Initialize available imports and __all__ list
 __all__ = [
+    "health",
+    "stats",
+    "flush",
+    "shutdown",
     "get_available_features",
     "is_feature_available",
     "FEATURE_ADK",
@@ -1,10 +1,10 @@
 """ADK integration module for vLLora."""
 
-def init():
+def init(collector_endpoint=None, api_key=None, project_id=None, **kwargs):
     from .tracing import init
     from .agent import init_agent
     init_agent()
-    init()
+    init(collector_endpoint, api_key, project_id, **kwargs)
 
 __all__ = [
     "init"
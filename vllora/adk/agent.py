@@ -6,68 +6,72 @@ from google.adk.agents.callback_context import CallbackContext
 from typing import Dict, Any
 from google.adk.tools.base_tool import BaseTool
 from google.adk.tools.tool_context import ToolContext
-from .vllora_llm import vLLoraLlm
+from .context import InvocationCache, InvocationState, SessionSequences
 from ..core.events import send_vllora_event_sync
 from opentelemetry import trace
 from google.genai import types
 import os
 import re
+import sys
 import uuid
 
+AGENT_RUN_PATTERN = re.compile(r"agent_run\s*\[(.*?)\]")
+
+# Ids resolved by the first callback of an invocation, reused by the rest
+_invocations = InvocationCache()
+# Invocation ids seen per session, in process so no session state is written
+_sequences = SessionSequences()
+
+def get_sequence_invocation_ids(session_id: str) -> list[str]:
+    """Return the invocation ids recorded for a session by agent and model callbacks, oldest first."""
+    return _sequences.get(session_id)
+
+def _resolve_invocation(callback_context: CallbackContext) -> InvocationState:
+    """Return the cached ids of the callback's invocation, resolving the thread id on first use.
+
+    The thread id is the session that started the conversation, kept in session
+    state as init_session_id. It is read with a single key lookup instead of
+    copying the whole state.
+    """
+    invocation_context = callback_context._invocation_context
+    invocation = _invocations.get_or_create(invocation_context.invocation_id)
+    if invocation.thread_id is None:
+        session_id = invocation_context.session.id
+        init_session_id = callback_context.state.get('init_session_id')
+        if init_session_id is None:
+            callback_context.state['init_session_id'] = session_id
+            init_session_id = session_id
+        invocation.thread_id = init_session_id
+    return invocation
+
+def _run_id(invocation: InvocationState, span) -> str:
+    # Convert trace_id from int to UUID once per trace
+    trace_id = span.get_span_context().trace_id
+    if invocation.trace_id != trace_id:
+        invocation.trace_id = trace_id
+        invocation.run_id = str(uuid.UUID(int=trace_id))
+    return invocation.run_id
+
 # Model callbacks
 def vllora_after_model_cb(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
-    current_state = callback_context.state
-    current_state_dict = current_state.to_dict()
-    session_id = callback_context._invocation_context.session.id
-    invocation_id = callback_context._invocation_context.invocation_id
+    invocation = _resolve_invocation(callback_context)
     span = trace.get_current_span()
-    if 'init_session_id' not in current_state_dict:
-        callback_context.state['init_session_id'] = session_id
-        span.set_attribute("vllora.thread_id", session_id)
-    else:
-        span.set_attribute("vllora.thread_id", current_state_dict['init_session_id'])
-    
-
-    span_context = span.get_span_context()
-        # Convert trace_id from int to UUID
-    run_id = uuid.UUID(int=span_context.trace_id)
-    span.set_attribute("vllora.run_id", run_id.__str__())
+    span.set_attribute("vllora.thread_id", invocation.thread_id)
+    span.set_attribute("vllora.run_id", _run_id(invocation, span))
     return None
 
 def vllora_before_model_cb(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
-    # Read/Write state example
-    session_id = callback_context._invocation_context.session.id
-    agent_name = callback_context.agent_name    
+    agent_name = callback_context.agent_name
     invocation_id = callback_context._invocation_context.invocation_id
-    
-    current_state = callback_context.state
-    current_state_dict = current_state.to_dict()
-    init_session_id = session_id
+    invocation = _resolve_invocation(callback_context)
+    init_session_id = invocation.thread_id
+
     span = trace.get_current_span()
+    span.set_attribute("vllora.thread_id", init_session_id)
+    span.set_attribute("vllora.run_id", _run_id(invocation, span))
+
+    _sequences.append(callback_context._invocation_context.session.id, invocation_id)
 
-    span_context = span.get_span_context()
-        # Convert trace_id from int to UUID
-    run_id = uuid.UUID(int=span_context.trace_id)
-    
-    if 'init_session_id' not in current_state_dict:
-        callback_context.state['init_session_id'] = session_id
-        span.set_attribute("vllora.thread_id", session_id)
-    else:
-        init_session_id = current_state_dict['init_session_id']
-        span.set_attribute("vllora.thread_id", init_session_id)
-   
-    span.set_attribute("vllora.run_id", run_id.__str__())
-
-    sequence_invocation_ids : list[str] = []
-    # check if current_state_dict have sequence_invocation_ids
-    if 'sequence_invocation_ids' in current_state_dict:
-        sequence_invocation_ids = current_state_dict['sequence_invocation_ids']
-       
-    # add invocation_id to sequence_invocation_ids
-    sequence_invocation_ids.append(invocation_id)
-        
-    # update current_state
-    callback_context.state['sequence_invocation_ids'] = sequence_invocation_ids 
     # Create a new config dict if needed
     if not hasattr(llm_request, '_additional_args'):
         llm_request._additional_args = {}
@@ -85,113 +89,65 @@ def vllora_before_model_cb(callback_context: CallbackContext, llm_request: LlmRe
 
 # Agent callbacks
 def vllora_before_agent_cb(callback_context: CallbackContext) -> Optional[types.Content]:
-   session_id = callback_context._invocation_context.session.id
-   invocation_id = callback_context._invocation_context.invocation_id
-   current_state = callback_context.state
-   current_state_dict = current_state.to_dict()
-   
-   init_session_id = session_id
-   span = trace.get_current_span()
-   thread_id = None
-   if 'init_session_id' not in current_state_dict:
-       callback_context.state['init_session_id'] = session_id
-       thread_id = session_id
-   else:
-       thread_id = current_state_dict['init_session_id']
-       init_session_id = thread_id
-   
-   if thread_id is not None:
-       span.set_attribute("vllora.thread_id", thread_id)
-   
-   span_context = span.get_span_context()
-    # Convert trace_id from int to UUID
-   run_id = uuid.UUID(int=span_context.trace_id)
-
-   # Send event for agent_run operations
-   if span.name.startswith("agent_run"):
-       match = re.match(r"agent_run\s*\[(.*?)\]", span.name)
-       agent_name = match.group(1) if match else ""
-       send_vllora_event_sync(span, "agent", {"vllora.agent_name": agent_name, "vllora.thread_id": thread_id, "vllora.run_id": run_id.__str__()})
-
-   sequence_invocation_ids : list[str] = []
-   # check if current_state_dict have sequence_invocation_ids
-   if 'sequence_invocation_ids' in current_state_dict:
-       sequence_invocation_ids = current_state_dict['sequence_invocation_ids']
-
-
-   # add invocation_id to sequence_invocation_ids
-   sequence_invocation_ids.append(invocation_id)
-        
-   # update current_state
-   callback_context.state['sequence_invocation_ids'] = sequence_invocation_ids    
-   
-   return None
+    invocation_id = callback_context._invocation_context.invocation_id
+    invocation = _resolve_invocation(callback_context)
+    invocation.depth += 1
+    thread_id = invocation.thread_id
+
+    span = trace.get_current_span()
+    span.set_attribute("vllora.thread_id", thread_id)
+
+    # Send event for agent_run operations
+    if span.name.startswith("agent_run"):
+        match = AGENT_RUN_PATTERN.match(span.name)
+        agent_name = match.group(1) if match else ""
+        send_vllora_event_sync(span, "agent", {"vllora.agent_name": agent_name, "vllora.thread_id": thread_id, "vllora.run_id": _run_id(invocation, span)})
+
+    _sequences.append(callback_context._invocation_context.session.id, invocation_id)
+
+    return None
 
 def vllora_after_agent_cb(callback_context: CallbackContext) -> Optional[types.Content]:
-    session_id = callback_context._invocation_context.session.id
-    current_state = callback_context.state
-    current_state_dict = current_state.to_dict()
+    invocation_id = callback_context._invocation_context.invocation_id
+    invocation = _resolve_invocation(callback_context)
     span = trace.get_current_span()
-    if 'init_session_id' not in current_state_dict:
-        span.set_attribute("vllora.thread_id", session_id)
-    else:
-        span.set_attribute("vllora.thread_id", current_state_dict['init_session_id'])
+    span.set_attribute("vllora.thread_id", invocation.thread_id)
+
+    invocation.depth -= 1
+    if invocation.depth <= 0:
+        # The outermost agent finished, nothing else in this invocation needs the ids
+        _invocations.release(invocation_id)
     return None
 
 # Tool callbacks
 
 def vllora_before_tool_cb( tool: BaseTool, args: Dict[str, Any], tool_context: CallbackContext) -> Optional[Dict]:
-    session_id = tool_context._invocation_context.session.id
     invocation_id = tool_context._invocation_context.invocation_id
+    invocation = _resolve_invocation(tool_context)
     span = trace.get_current_span()
-    
-    current_state = tool_context.state
-    current_state_dict = current_state.to_dict()
-    span_context = span.get_span_context()
-    # Convert trace_id from int to UUID
-    run_id = uuid.UUID(int=span_context.trace_id)
-    if 'init_session_id' not in current_state_dict:
-       tool_context.state['init_session_id'] = session_id
-       span.set_attribute("vllora.thread_id", session_id)
-       span.set_attribute("vllora.run_id", run_id.__str__())
-    else:
-        span.set_attribute("vllora.thread_id", current_state_dict['init_session_id'])
-        span.set_attribute("vllora.run_id", run_id.__str__())
+    span.set_attribute("vllora.thread_id", invocation.thread_id)
+    span.set_attribute("vllora.run_id", _run_id(invocation, span))
 
-    sequence_invocation_ids : list[str] = []
-    # check if current_state_dict have sequence_invocation_ids
-    if 'sequence_invocation_ids' in current_state_dict:
-        sequence_invocation_ids = current_state_dict['sequence_invocation_ids']
-        
-    # remove invocation_id from sequence_invocation_ids
-    sequence_invocation_ids.remove(invocation_id)
-        
-    # update current_state
-    tool_context.state['sequence_invocation_ids'] = sequence_invocation_ids    
+    _sequences.remove(tool_context._invocation_context.session.id, invocation_id)
 
     return None
 
 def vllora_after_tool_cb(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Dict) -> Optional[Dict]:
-    session_id = tool_context._invocation_context.session.id
-    invocation_id = tool_context._invocation_context.invocation_id
-    current_state = tool_context.state
-    current_state_dict = current_state.to_dict()
+    invocation = _resolve_invocation(tool_context)
     span = trace.get_current_span()
-    span_context = span.get_span_context()
-    # Convert trace_id from int to UUID
-    run_id = uuid.UUID(int=span_context.trace_id)
-    if 'init_session_id' not in current_state_dict:
-        span.set_attribute("vllora.thread_id", session_id)
-        span.set_attribute("vllora.run_id", run_id.__str__())
-    else:
-        span.set_attribute("vllora.thread_id", current_state_dict['init_session_id'])
-        span.set_attribute("vllora.run_id", run_id.__str__())
+    span.set_attribute("vllora.thread_id", invocation.thread_id)
+    span.set_attribute("vllora.run_id", _run_id(invocation, span))
 
     return None
 
 
 original_init = Agent.__init__
 
+def _is_vllora_llm(model) -> bool:
+    # A vLLoraLlm can only exist if its module was imported, so avoid importing it just to check
+    vllora_llm = sys.modules.get(f"{__package__}.vllora_llm")
+    return vllora_llm is not None and isinstance(model, vllora_llm.vLLoraLlm)
+
 # Agent class
 def vllora_agent_init(*args, **kwargs):
     # get model from kwargs
@@ -200,8 +156,10 @@ def vllora_agent_init(*args, **kwargs):
         raise ValueError("model is required")
     # check if model is string or vlloraLlm
     if isinstance(model, str):
+        # Imported here so tracing alone does not load litellm
+        from .vllora_llm import vLLoraLlm
         model = vLLoraLlm(model)
-    elif isinstance(model, vLLoraLlm):
+    elif _is_vllora_llm(model):
         # do nothing
         pass
     else: 
@@ -342,15 +300,19 @@ def vllora_start_as_current_span(self, name, *args, **kwargs):
     return span_context
 
 def init_agent():
+    """Patch the OpenTelemetry tracer and the ADK Agent once; later calls do nothing."""
     global original_start_as_current_span
     
     # Patch the Tracer class from opentelemetry SDK
     from opentelemetry.sdk.trace import Tracer
     
-    if hasattr(Tracer, 'start_as_current_span'):
+    # Wrapping our own wrapper would make it call itself
+    if hasattr(Tracer, 'start_as_current_span') and Tracer.start_as_current_span is not vllora_start_as_current_span:
         original_start_as_current_span = Tracer.start_as_current_span
         Tracer.start_as_current_span = vllora_start_as_current_span
     
     # Monkey patch Agent methods
-    Agent.__init__ = vllora_agent_init
-    Agent.run_async = vllora_agent_run_async
\ No newline at end of file
+    if Agent.__init__ is not vllora_agent_init:
+        Agent.__init__ = vllora_agent_init
+    if Agent.run_async is not vllora_agent_run_async:
+        Agent.run_async = vllora_agent_run_async
\ No newline at end of file
@@ -0,0 +1,221 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from ..core.fork import register_after_fork, reinit_after_fork
+from ..core.log import logger
+from ..core.metrics import get_metrics_registry
+
+# Environment variable constants
+ENV_VLLORA_CACHE = "VLLORA_CACHE"
+ENV_VLLORA_CACHE_MAX_ENTRIES = "VLLORA_CACHE_MAX_ENTRIES"
+ENV_VLLORA_CACHE_TTL = "VLLORA_CACHE_TTL"
+ENV_VLLORA_CACHE_PATH = "VLLORA_CACHE_PATH"
+
+# Default values
+DEFAULT_CACHE_MAX_ENTRIES = 1024
+DEFAULT_CACHE_TTL = 3600.0
+
+_metrics = get_metrics_registry()
+_hits = _metrics.counter("vllora_llm_cache_hits_total", "vLLoraLlm requests answered from the response cache")
+_misses = _metrics.counter("vllora_llm_cache_misses_total", "vLLoraLlm requests sent to the gateway because the response cache had no entry")
+
+
+def _canonical_default(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        # Inline data can be large; its digest identifies it just as well
+        return hashlib.sha256(value).hexdigest()
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="python", exclude_none=True)
+    if callable(value) and hasattr(value, "__qualname__"):
+        # Classes and functions, e.g. a response schema or a tool callable; their repr holds an address
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def request_cache_key(llm_request, model: Optional[str] = None, stream: bool = False) -> str:
+    """Canonical SHA-256 of everything in an LlmRequest that shapes the response.
+
+    The model, contents, generation config (system instruction, tool
+    declarations, sampling parameters, response schema) and the names of the
+    request's tools are hashed; HTTP options are not, as they only carry
+    transport settings and per-request headers. Streaming and non-streaming
+    calls get different keys because their responses are chunked differently.
+
+    Args:
+        llm_request: The ADK LlmRequest about to be sent
+        model: The model the request will be sent to, optional, by default the request's own model
+        stream: Whether the request is streamed
+    """
+    config = llm_request.config.model_dump(mode="python", exclude_none=True, exclude={"http_options"}) if llm_request.config is not None else None
+    canonical = {
+        "model": model or llm_request.model,
+        "contents": [content.model_dump(mode="python", exclude_none=True) for content in llm_request.contents],
+        "config": config,
+        "tools": sorted(llm_request.tools_dict or {}),
+        "stream": stream,
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=_canonical_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Exact-match cache of LlmResponse sequences for vLLoraLlm.
+
+    Responses are kept as serialized JSON, one entry per chunk, so a cached
+    stream replays chunk by chunk and every hit hands out fresh objects. The
+    in-memory tier is an LRU bounded by ``max_entries``; entries older than
+    ``ttl`` seconds are treated as missing. With ``path`` set, entries are
+    also written to a sqlite database there, which outlives the process and
+    is read on memory misses.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, path: Optional[str] = None):
+        """Initialize the response cache.
+
+        Args:
+            max_entries: Responses kept in memory, optional, by default read from env variable VLLORA_CACHE_MAX_ENTRIES
+            ttl: Seconds an entry stays valid, 0 to never expire, optional, by default read from env variable VLLORA_CACHE_TTL
+            path: sqlite file for the on-disk tier, optional, by default read from env variable VLLORA_CACHE_PATH; memory only if unset
+        """
+        if max_entries is None:
+            max_entries = int(os.getenv(ENV_VLLORA_CACHE_MAX_ENTRIES, DEFAULT_CACHE_MAX_ENTRIES))
+        if ttl is None:
+            ttl = float(os.getenv(ENV_VLLORA_CACHE_TTL, DEFAULT_CACHE_TTL))
+        if path is None:
+            path = os.getenv(ENV_VLLORA_CACHE_PATH) or None
+
+        self.max_entries = max(1, max_entries)
+        self.ttl = max(0.0, ttl)
+        self.path = path
+        # key -> (expires_at or None, serialized responses)
+        self._entries: "collections.OrderedDict[str, Tuple[Optional[float], Tuple[str, ...]]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        # Connections inherited from the parent; sqlite must not use or close them in the child
+        self._inherited: List[Any] = []
+        if path:
+            self._open_db(path)
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+        if self._db is not None:
+            self._inherited.append(self._db)
+            self._db = None
+            self._open_db(self.path)
+
+    def _open_db(self, path: str):
+        import sqlite3
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vllora_responses ("
+            "key TEXT PRIMARY KEY, expires_at REAL, responses TEXT NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        """Return fresh LlmResponse objects for ``key``, or None on a miss."""
+        serialized = self._get_serialized(key)
+        if serialized is None:
+            _misses.add()
+            return None
+        _hits.add()
+
+        from google.adk.models.llm_response import LlmResponse
+        return [LlmResponse.model_validate_json(response) for response in serialized]
+
+    def _get_serialized(self, key: str) -> Optional[Tuple[str, ...]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, serialized = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    return serialized
+                del self._entries[key]
+
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT expires_at, responses FROM vllora_responses WHERE key = ?", (key,)
+                ).fetchone()
+            except Exception as e:
+                logger.warning("Could not read the vLLora response cache at %s: %s", self.path, e)
+                return None
+            if row is None:
+                return None
+            expires_at, responses = row
+            if expires_at is not None and expires_at <= now:
+                return None
+            serialized = tuple(json.loads(responses))
+            self._store(key, expires_at, serialized)
+            return serialized
+
+    def put(self, key: str, responses: List[str]):
+        """Cache the serialized responses of one request (``LlmResponse.model_dump_json`` output, in order)."""
+        expires_at = time.time() + self.ttl if self.ttl else None
+        serialized = tuple(responses)
+        with self._lock:
+            self._store(key, expires_at, serialized)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO vllora_responses (key, expires_at, responses) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(serialized)),
+                )
+            except Exception as e:
+                logger.warning("Could not write the vLLora response cache at %s: %s", self.path, e)
+
+    def _store(self, key: str, expires_at: Optional[float], serialized: Tuple[str, ...]):
+        self._entries[key] = (expires_at, serialized)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry, on disk as well."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM vllora_responses")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+@register_after_fork
+def _after_fork_in_child():
+    global _response_cache_lock
+    _response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache, configured from the environment on first use."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
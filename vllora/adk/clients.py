@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from ..core.fork import reinit_after_fork
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Environment variable constants
+ENV_VLLORA_ADK_MAX_CONNECTIONS = "VLLORA_ADK_MAX_CONNECTIONS"
+ENV_VLLORA_ADK_MAX_KEEPALIVE_CONNECTIONS = "VLLORA_ADK_MAX_KEEPALIVE_CONNECTIONS"
+
+# Default values
+DEFAULT_ADK_MAX_CONNECTIONS = 100
+DEFAULT_ADK_MAX_KEEPALIVE_CONNECTIONS = 20
+
+ClientKey = Tuple[str, str, Optional[str]]
+
+
+class LlmClientPool:
+    """Process-wide pool of gateway clients shared by every vLLoraLlm.
+
+    One ``AsyncOpenAI`` client with a bounded keep-alive connection pool is
+    kept per (api_base, api_key, project_id), so any number of agents talking
+    to the same gateway reuse a handful of connections. httpx connections are
+    bound to the event loop that opened them, so clients are kept per loop
+    and dropped together with it.
+    """
+
+    def __init__(self, max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None):
+        if max_connections is None:
+            max_connections = int(os.getenv(ENV_VLLORA_ADK_MAX_CONNECTIONS, DEFAULT_ADK_MAX_CONNECTIONS))
+        if max_keepalive_connections is None:
+            max_keepalive_connections = int(os.getenv(ENV_VLLORA_ADK_MAX_KEEPALIVE_CONNECTIONS, DEFAULT_ADK_MAX_KEEPALIVE_CONNECTIONS))
+
+        self.max_connections = max(1, max_connections)
+        self.max_keepalive_connections = max(0, min(max_keepalive_connections, self.max_connections))
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # Clients hold the parent's sockets; the child opens its own
+        self._lock = threading.Lock()
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get(self, api_base: str, api_key: str, project_id: Optional[str] = None) -> "AsyncOpenAI":
+        """Return the shared client for this gateway on the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        key = (api_base, api_key, project_id)
+        with self._lock:
+            clients = self._clients.get(loop)
+            if clients is None:
+                clients = self._clients[loop] = {}
+            client = clients.get(key)
+            if client is None:
+                client = clients[key] = self._create(api_base, api_key)
+            return client
+
+    def _create(self, api_base: str, api_key: str) -> "AsyncOpenAI":
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+        )
+        return AsyncOpenAI(api_key=api_key, base_url=api_base, http_client=DefaultAsyncHttpxClient(limits=limits))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(clients) for clients in self._clients.values())
+
+    def clear(self):
+        """Forget every pooled client. Open connections close when the clients are collected."""
+        with self._lock:
+            self._clients.clear()
+
+
+_pool = LlmClientPool()
+
+
+def get_client_pool() -> LlmClientPool:
+    return _pool
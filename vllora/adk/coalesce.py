@@ -0,0 +1,139 @@
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+
+from ..core.fork import reinit_after_fork
+from ..core.metrics import get_metrics_registry
+
+# Environment variable constants
+ENV_VLLORA_COALESCE = "VLLORA_COALESCE"
+
+_metrics = get_metrics_registry()
+_coalesced = _metrics.counter("vllora_llm_coalesced_total", "vLLoraLlm requests served by an identical request already in flight")
+_in_flight = _metrics.gauge("vllora_llm_in_flight", "Distinct vLLoraLlm requests in flight with coalescing enabled", len)
+
+
+def coalescing_enabled() -> bool:
+    return os.getenv(ENV_VLLORA_COALESCE, "false").lower() == "true"
+
+
+class Flight:
+    """One upstream request and the chunks it has produced so far.
+
+    Chunks are kept until the request finishes, so a caller that joins
+    mid-stream still replays it from the start.
+    """
+
+    __slots__ = ("key", "run_id", "chunks", "done", "error", "consumers", "task", "_changed")
+
+    def __init__(self, key: Hashable, run_id: Optional[str]):
+        self.key = key
+        # x-run-id the upstream request was sent with, recorded on the spans of coalesced callers
+        self.run_id = run_id
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.consumers = 0
+        self.task: Optional["asyncio.Task"] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Waiters hold the previous event, so replacing it wakes each of them exactly once
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def consume(self, on_abandoned: Callable[[], None]) -> AsyncIterator[str]:
+        """Yield every chunk of the upstream response, waiting for new ones until it finishes."""
+        self.consumers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.consumers -= 1
+            if not self.consumers and not self.done:
+                # Nobody is left to read the response
+                on_abandoned()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent requests into one upstream call.
+
+    The first caller for a key starts the upstream request as a task on its
+    event loop, in its own context, and every caller for that key, the first
+    included, reads the chunks it produces. A caller that stops reading
+    early does not affect the others; the upstream request is cancelled only
+    once every caller has stopped. Finished flights are forgotten straight
+    away, so later identical requests start a new call.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], Flight] = {}
+        _in_flight.track(self)
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # Flights run on the parent's event loops, which do not run in the child
+        self._flights = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def join(self, key: Hashable, run_id: Optional[str], produce: Callable[[], AsyncIterator[str]]) -> Tuple[Flight, bool]:
+        """Return the flight for ``key`` and whether this caller started it.
+
+        Args:
+            key: Identity of the request; equal keys share one upstream call
+            run_id: Run id the upstream request is sent with if this caller starts it
+            produce: Called only by the first caller; returns the upstream chunks
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        flight = self._flights.get(flight_key)
+        if flight is not None:
+            _coalesced.add()
+            return flight, False
+
+        flight = self._flights[flight_key] = Flight(flight_key, run_id)
+        flight.task = loop.create_task(self._produce(flight, produce()))
+        return flight, True
+
+    async def _produce(self, flight: Flight, chunks: AsyncIterator[str]):
+        try:
+            async for chunk in chunks:
+                flight.chunks.append(chunk)
+                flight._notify()
+        except asyncio.CancelledError as e:
+            flight.error = e
+            raise
+        except BaseException as e:
+            # Raised to every caller instead of being left on the task
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(flight)
+            flight._notify()
+
+    def _forget(self, flight: Flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def abandon(self, flight: Flight):
+        """Cancel a flight nobody reads any more; callers arriving later start a new one."""
+        self._forget(flight)
+        if flight.task is not None:
+            flight.task.cancel()
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
@@ -0,0 +1,178 @@
+import collections
+import os
+import threading
+from typing import List, Optional
+
+from ..core.fork import reinit_after_fork
+
+# Environment variable constants
+ENV_VLLORA_ADK_MAX_INVOCATIONS = "VLLORA_ADK_MAX_INVOCATIONS"
+ENV_VLLORA_ADK_MAX_SEQUENCE_IDS = "VLLORA_ADK_MAX_SEQUENCE_IDS"
+ENV_VLLORA_ADK_MAX_SESSIONS = "VLLORA_ADK_MAX_SESSIONS"
+
+# Default values
+DEFAULT_ADK_MAX_INVOCATIONS = 1024
+DEFAULT_ADK_MAX_SEQUENCE_IDS = 1024
+DEFAULT_ADK_MAX_SESSIONS = 1024
+
+
+class InvocationState:
+    """vLLora ids resolved once per ADK invocation and reused by every callback in it."""
+
+    __slots__ = ("thread_id", "trace_id", "run_id", "depth")
+
+    def __init__(self):
+        self.thread_id: Optional[str] = None
+        self.trace_id: Optional[int] = None
+        self.run_id: Optional[str] = None
+        # Agents currently running in the invocation; sub-agents share their parent's invocation id
+        self.depth = 0
+
+
+class InvocationCache:
+    """Bounded map of ADK invocation id to InvocationState.
+
+    Entries are released when the outermost agent of an invocation finishes.
+    Invocations that never finish are evicted least-recently-used first once
+    ``max_invocations`` is reached.
+    """
+
+    def __init__(self, max_invocations: Optional[int] = None):
+        if max_invocations is None:
+            max_invocations = int(os.getenv(ENV_VLLORA_ADK_MAX_INVOCATIONS, DEFAULT_ADK_MAX_INVOCATIONS))
+
+        self.max_invocations = max(1, max_invocations)
+        self._entries: "collections.OrderedDict[str, InvocationState]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # Invocations in flight at the fork finish in the parent
+        self._lock = threading.Lock()
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_create(self, invocation_id: str) -> InvocationState:
+        with self._lock:
+            state = self._entries.get(invocation_id)
+            if state is not None:
+                self._entries.move_to_end(invocation_id)
+                return state
+            while len(self._entries) >= self.max_invocations:
+                self._entries.popitem(last=False)
+            state = self._entries[invocation_id] = InvocationState()
+            return state
+
+    def release(self, invocation_id: str):
+        with self._lock:
+            self._entries.pop(invocation_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class InvocationSequence:
+    """Ordered invocation ids recorded for one session, capped at ``max_ids``.
+
+    Agent and model callbacks append the current invocation id and tool
+    callbacks remove its first occurrence. Repeated ids are stored as runs,
+    so the common pattern of one invocation making many model calls costs
+    O(1) per append and remove. Past the cap the oldest ids are dropped.
+    """
+
+    __slots__ = ("max_ids", "_runs", "_size")
+
+    def __init__(self, max_ids: int):
+        self.max_ids = max(1, max_ids)
+        # [invocation_id, count] runs, oldest first
+        self._runs: "collections.deque[list]" = collections.deque()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, invocation_id: str):
+        runs = self._runs
+        if runs and runs[-1][0] == invocation_id:
+            runs[-1][1] += 1
+        else:
+            runs.append([invocation_id, 1])
+        self._size += 1
+        while self._size > self.max_ids:
+            oldest = runs[0]
+            oldest[1] -= 1
+            self._size -= 1
+            if not oldest[1]:
+                runs.popleft()
+
+    def remove(self, invocation_id: str) -> bool:
+        """Remove the first occurrence of ``invocation_id``. Returns False if it was not recorded."""
+        runs = self._runs
+        for index, run in enumerate(runs):
+            if run[0] != invocation_id:
+                continue
+            run[1] -= 1
+            self._size -= 1
+            if not run[1]:
+                del runs[index]
+                # Join the neighbours if they now hold the same id
+                if 0 < index < len(runs) and runs[index - 1][0] == runs[index][0]:
+                    runs[index - 1][1] += runs[index][1]
+                    del runs[index]
+            return True
+        return False
+
+    def to_list(self) -> List[str]:
+        return [invocation_id for invocation_id, count in self._runs for _ in range(count)]
+
+
+class SessionSequences:
+    """Bounded map of session id to its InvocationSequence, kept in process only.
+
+    Nothing is written to ADK session state, so tracing adds no deltas for
+    session services to persist. The least recently used sessions are
+    dropped once ``max_sessions`` is reached.
+    """
+
+    def __init__(self, max_ids: Optional[int] = None, max_sessions: Optional[int] = None):
+        if max_ids is None:
+            max_ids = int(os.getenv(ENV_VLLORA_ADK_MAX_SEQUENCE_IDS, DEFAULT_ADK_MAX_SEQUENCE_IDS))
+        if max_sessions is None:
+            max_sessions = int(os.getenv(ENV_VLLORA_ADK_MAX_SESSIONS, DEFAULT_ADK_MAX_SESSIONS))
+
+        self.max_ids = max(1, max_ids)
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: "collections.OrderedDict[str, InvocationSequence]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, invocation_id: str):
+        with self._lock:
+            sequence = self._sessions.get(session_id)
+            if sequence is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                sequence = self._sessions[session_id] = InvocationSequence(self.max_ids)
+            else:
+                self._sessions.move_to_end(session_id)
+            sequence.append(invocation_id)
+
+    def remove(self, session_id: str, invocation_id: str) -> bool:
+        with self._lock:
+            sequence = self._sessions.get(session_id)
+            return sequence is not None and sequence.remove(invocation_id)
+
+    def get(self, session_id: str) -> List[str]:
+        with self._lock:
+            sequence = self._sessions.get(session_id)
+            return sequence.to_list() if sequence is not None else []
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
@@ -1,15 +1,18 @@
-from ..core.tracing import vLLoraTracing
+from ..core.tracing import get_tracing_registry, vLLoraTracing
 from typing import Optional
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
 
-def init(collector_endpoint: Optional[str] = None, api_key: Optional[str] = None, project_id: Optional[str] = None):
-    tracer = vLLoraTracing(collector_endpoint, api_key, project_id, "adk")
-    processor = tracer.get_processor()
+def init(collector_endpoint: Optional[str] = None, api_key: Optional[str] = None, project_id: Optional[str] = None, **kwargs):
+    """Initialize vLLora tracing.
+
+    Extra keyword arguments such as protocol, compression, channel_options or
+    events_compression are passed to vLLoraTracing. Calling it again is a
+    no-op, or reconfigures the existing processor if the arguments changed.
+    """
+    tracer = vLLoraTracing(collector_endpoint, api_key, project_id, "adk", **kwargs)
     tracer_provider = trace.get_tracer_provider()
-    if hasattr(tracer_provider, 'add_span_processor'):
-        tracer_provider.add_span_processor(processor)
-    else:
-        custom_provider = TracerProvider()
-        custom_provider.add_span_processor(processor)
-        trace.set_tracer_provider(custom_provider)
\ No newline at end of file
+    if not hasattr(tracer_provider, 'add_span_processor'):
+        tracer_provider = TracerProvider()
+        trace.set_tracer_provider(tracer_provider)
+    get_tracing_registry().install(tracer_provider, tracer)
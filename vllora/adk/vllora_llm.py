@@ -1,19 +1,32 @@
 import os
 import uuid
-from typing import AsyncGenerator, Optional, Dict, Any
+from typing import TYPE_CHECKING, AsyncGenerator, Optional, Dict, Any, Union
 from google.adk.models.base_llm import BaseLlm
 from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
-from google.adk.models.lite_llm import LiteLlm
 from opentelemetry import trace
 from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
 from opentelemetry.trace.propagation import set_span_in_context
 
+from .cache import ENV_VLLORA_CACHE, ResponseCache, get_response_cache, request_cache_key
+from ..core.streaming import StreamTimer
+from .clients import get_client_pool
+from .coalesce import coalescing_enabled, get_single_flight
+
+if TYPE_CHECKING:
+    from google.adk.models.lite_llm import LiteLlm
+
 class vLLoraLlm(BaseLlm):
     """Custom vLLora implementation of BaseLlm."""
     
-    _lite_llm: LiteLlm
-    def __init__(self, model: str, api_key: Optional[str] = None, api_base: Optional[str] = None, project_id: Optional[str] = None, mcp_servers: Optional[list[Dict[str, Any]]] = None, run_id: Optional[str] = None, thread_id: Optional[str] = None, extra_headers: Optional[Dict[str, str]] = None, is_project_in_url: Optional[bool] = False, **kwargs):
+    _lite_llm: "LiteLlm"
+    _api_base: str
+    _api_key: str
+    _project_id: Optional[str]
+    _shared_client: bool
+    _cache: Optional[ResponseCache]
+    _coalesce: bool
+    def __init__(self, model: str, api_key: Optional[str] = None, api_base: Optional[str] = None, project_id: Optional[str] = None, mcp_servers: Optional[list[Dict[str, Any]]] = None, run_id: Optional[str] = None, thread_id: Optional[str] = None, extra_headers: Optional[Dict[str, str]] = None, is_project_in_url: Optional[bool] = False, shared_client: bool = True, cache: Optional[Union[bool, ResponseCache]] = None, coalesce: Optional[bool] = None, **kwargs):
         """Initialize the vLLora LLM.
         
         Args:
@@ -26,6 +39,9 @@ class vLLoraLlm(BaseLlm):
             extra_headers: The extra headers to use for the vLLora LLM, optional
             is_project_in_url: Whether the project ID is in the URL, if not, project id is in header x-project-id, optional, by default False
             mcp_servers: The MCP servers to use for the vLLora LLM, optional
+            shared_client: Whether to send requests through the process-wide client pool, which keeps one keep-alive connection pool per gateway, api key and project, optional, by default True. Ignored if a ``client`` is passed in kwargs
+            cache: Answer repeated identical requests from a response cache, optional, by default enabled if env variable VLLORA_CACHE is "true". True uses the process-wide cache configured by VLLORA_CACHE_MAX_ENTRIES, VLLORA_CACHE_TTL and VLLORA_CACHE_PATH; a ResponseCache instance is used as given
+            coalesce: Send identical concurrent requests to the same gateway once and share the response between them, optional, by default enabled if env variable VLLORA_COALESCE is "true"
         """
         # check if model is start with openai/
         custom_model_name = model
@@ -43,6 +59,9 @@ class vLLoraLlm(BaseLlm):
             raise ValueError("VLLORA_API_BASE_URL is not set")
         if extra_headers is None:
             extra_headers = {"Content-Type": "application/json"}
+        else:
+            # Never write into the caller's dict, it may be shared between models
+            extra_headers = dict(extra_headers)
 
         if run_id:
             extra_headers["x-run-id"] = run_id
@@ -59,6 +78,9 @@ class vLLoraLlm(BaseLlm):
                 extra_headers["x-project-id"] = project_id
 
 
+        # LiteLlm pulls in litellm, which is slow to import; only load it once a model is created
+        from google.adk.models.lite_llm import LiteLlm
+
         self._lite_llm = LiteLlm(
             model=custom_model_name,
             api_key=api_key,
@@ -67,6 +89,20 @@ class vLLoraLlm(BaseLlm):
             mcp_servers=mcp_servers,
             **kwargs
         )
+        self._api_base = api_base
+        self._api_key = api_key
+        self._project_id = project_id
+        self._shared_client = shared_client and "client" not in kwargs
+        if cache is None:
+            cache = os.getenv(ENV_VLLORA_CACHE, "false").lower() == "true"
+        if cache is True:
+            cache = get_response_cache()
+        elif cache is False:
+            cache = None
+        self._cache = cache
+        if coalesce is None:
+            coalesce = coalescing_enabled()
+        self._coalesce = coalesce
     @classmethod
     def supported_models(cls) -> list[str]:
         """Returns a list of supported models in regex for LlmRegistry."""
@@ -84,36 +120,118 @@ class vLLoraLlm(BaseLlm):
         Yields:
             LlmResponse objects containing the generated content
         """
-        # Access session_id from _additional_args if available
-        session_id = None
-        agent_name = None
-        
         span = trace.get_current_span()
+        if not stream:
+            async for response in self._generate(llm_request, stream, span):
+                yield response
+            return
+
+        timer = StreamTimer(span)
+        try:
+            async for response in self._generate(llm_request, stream, span, timer):
+                if response.partial:
+                    timer.chunk()
+                elif response.usage_metadata is not None and response.usage_metadata.candidates_token_count is not None:
+                    timer.output_tokens = response.usage_metadata.candidates_token_count
+                yield response
+        finally:
+            timer.finish()
+
+    async def _generate(self, llm_request: LlmRequest, stream: bool, span, timer: Optional[StreamTimer] = None) -> AsyncGenerator[LlmResponse, None]:
         span_context = span.get_span_context()
-        # Convert trace_id from int to UUID
-        trace_id = uuid.UUID(int=span_context.trace_id)
-        
+
+        # Headers are built fresh for every request; the model is shared by
+        # every session running the agent, so nothing on it may be mutated
+        headers = dict(self._lite_llm._additional_args.get('extra_headers') or {})
+
+        session_id = None
         # Check if _additional_args exists and contains session_id
         if hasattr(llm_request, '_additional_args'):
             session_id = llm_request._additional_args.get('session_id')
-            invocation_id = llm_request._additional_args.get('invocation_id')
             agent_name = llm_request._additional_args.get('agent_name')
-            # Create a new config dict if needed
-            if not hasattr(self._lite_llm, '_additional_args'):
-                self._lite_llm._additional_args = {}
-            prev_extra_headers = self._lite_llm._additional_args.get('extra_headers', {})
-            prev_extra_headers['x-run-id'] = str(trace_id)
-            prev_extra_headers['x-thread-id']= session_id
-            prev_extra_headers['x-agent-name'] = agent_name
-            self._lite_llm._additional_args['extra_headers'] = prev_extra_headers
-        
+            # Convert trace_id from int to UUID
+            headers['x-run-id'] = str(uuid.UUID(int=span_context.trace_id))
+            if session_id is not None:
+                headers['x-thread-id'] = session_id
+            if agent_name is not None:
+                headers['x-agent-name'] = agent_name
+
         span.set_attribute("vllora.thread_id", session_id)
-        ctx = set_span_in_context(span)
-        prev_extra_headers = self._lite_llm._additional_args.get('extra_headers', {})
-        TraceContextTextMapPropagator().inject(prev_extra_headers, ctx)
-        
-        self._lite_llm._additional_args['extra_headers'] = prev_extra_headers
+
+        cache_key = None
+        if self._cache is not None or self._coalesce:
+            # Keyed before LiteLlm sees the request, as it may append to the contents
+            cache_key = request_cache_key(llm_request, llm_request.model or self.model, stream)
+
+        if self._cache is not None:
+            cached = self._cache.get(cache_key)
+            span.set_attribute("vllora.cache_hit", cached is not None)
+            if cached is not None:
+                if timer is not None:
+                    timer.replayed = True
+                for response in cached:
+                    yield response
+                return
+
+        if not self._coalesce:
+            responses = self._send(llm_request, stream, span, headers)
+            if self._cache is None:
+                async for response in responses:
+                    yield response
+                return
+            serialized = []
+            async for response in responses:
+                if serialized is not None:
+                    # Serialized before the caller gets a chance to modify the response
+                    if response.error_code:
+                        serialized = None
+                    else:
+                        serialized.append(response.model_dump_json(exclude_none=True))
+                yield response
+            # Only complete, successful responses are cached; a stream closed early never gets here
+            if serialized:
+                self._cache.put(cache_key, serialized)
+            return
+
+        # Identical requests share one upstream call; its headers carry the first caller's run id
+        single_flight = get_single_flight()
+        flight, started = single_flight.join(
+            (self._api_base, self._api_key, self._project_id, cache_key),
+            headers.get('x-run-id'),
+            lambda: self._send_serialized(llm_request, stream, span, headers, cache_key),
+        )
+        span.set_attribute("vllora.coalesced", not started)
+        if not started and timer is not None:
+            # Chunks already received by the leading call are handed over at once
+            timer.replayed = True
+        if not started and flight.run_id:
+            span.set_attribute("vllora.coalesced_run_id", flight.run_id)
+        async for chunk in flight.consume(lambda: single_flight.abandon(flight)):
+            yield LlmResponse.model_validate_json(chunk)
+
+    async def _send(self, llm_request: LlmRequest, stream: bool, span, headers: Dict[str, str]) -> AsyncGenerator[LlmResponse, None]:
+        """Send the request to the gateway through a per-request copy of the LiteLlm."""
+        TraceContextTextMapPropagator().inject(headers, set_span_in_context(span))
+
+        request_args = dict(self._lite_llm._additional_args, extra_headers=headers)
+        if self._shared_client:
+            request_args['client'] = get_client_pool().get(self._api_base, self._api_key, self._project_id)
+        # A shallow copy shares the model settings and client but gets its own arguments
+        lite_llm = self._lite_llm.model_copy()
+        lite_llm._additional_args = request_args
 
         # Process the request and create a response
-        async for response in self._lite_llm.generate_content_async(llm_request, stream):
-            yield response
\ No newline at end of file
+        async for response in lite_llm.generate_content_async(llm_request, stream):
+            yield response
+
+    async def _send_serialized(self, llm_request: LlmRequest, stream: bool, span, headers: Dict[str, str], cache_key: str) -> AsyncGenerator[str, None]:
+        """Send the request and yield each response as JSON, caching them once the call succeeds."""
+        serialized = []
+        cacheable = True
+        async for response in self._send(llm_request, stream, span, headers):
+            chunk = response.model_dump_json(exclude_none=True)
+            cacheable = cacheable and not response.error_code
+            serialized.append(chunk)
+            yield chunk
+        if self._cache is not None and cacheable and serialized:
+            self._cache.put(cache_key, serialized)
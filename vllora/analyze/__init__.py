@@ -0,0 +1,19 @@
+"""Offline analysis of span files written by the ``jsonl`` and ``parquet`` exporters.
+
+    python -m vllora.analyze vllora-spans/
+
+Requires numpy, and pyarrow for Parquet files, installed with the
+``analyze`` extra.
+"""
+from typing import Any, Dict, Iterable
+
+from .analyzer import DEFAULT_MAX_PENDING_SPANS, DEFAULT_TOP_RUNS, TraceAnalyzer
+from .readers import DEFAULT_BATCH_SIZE, SpanBatch, SpanReader
+from .sketch import LatencySketch
+
+__all__ = ["analyze", "TraceAnalyzer", "SpanBatch", "SpanReader", "LatencySketch"]
+
+
+def analyze(paths: Iterable[str], top_runs: int = DEFAULT_TOP_RUNS, batch_size: int = DEFAULT_BATCH_SIZE, max_pending_spans: int = DEFAULT_MAX_PENDING_SPANS) -> Dict[str, Any]:
+    """Return latency percentiles, critical path breakdowns and the slowest runs of the span files or directories in ``paths``."""
+    return TraceAnalyzer(SpanReader(batch_size), top_runs, max_pending_spans).read(paths).report()
@@ -0,0 +1,92 @@
+"""Summarize span files written by the ``jsonl`` and ``parquet`` exporters.
+
+Reports p50/p95/p99 latency per run, agent, tool and model, how the runs'
+critical paths split into LLM time, tool time and overhead, and the
+critical paths of the slowest runs. Files are streamed a batch at a time,
+and spans waiting for their run's root span are capped by --max-pending,
+so memory stays bounded however many spans they hold.
+
+    python -m vllora.analyze vllora-spans/
+    python -m vllora.analyze spans-*.parquet --top 5
+    python -m vllora.analyze vllora-spans/ --json > report.json
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+from .analyzer import DEFAULT_MAX_PENDING_SPANS, DEFAULT_TOP_RUNS, TraceAnalyzer
+from .readers import DEFAULT_BATCH_SIZE, SpanReader
+
+
+def _print_latency(title: str, rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    width = max(len(title), *(len(row["name"]) for row in rows))
+    print(f"\n{title:<{width}}  {'count':>10}  {'mean ms':>10}  {'p50 ms':>10}  {'p95 ms':>10}  {'p99 ms':>10}")
+    for row in rows:
+        print(f"{row['name']:<{width}}  {row['count']:>10}  {row['mean_ms']:>10.1f}  {row['p50_ms']:>10.1f}  {row['p95_ms']:>10.1f}  {row['p99_ms']:>10.1f}")
+
+
+def _print_critical(title: str, rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    width = max(len(title), *(len(row["name"]) for row in rows))
+    print(f"\n{title:<{width}}  {'critical ms':>14}  {'share':>7}")
+    for row in rows:
+        print(f"{row['name']:<{width}}  {row['ms']:>14.1f}  {row['share']:>7.1%}")
+
+
+def print_report(report: Dict[str, Any], elapsed: float):
+    print(f"{report['spans']} spans, {report['runs']} runs in {elapsed:.1f}s")
+    if report["incomplete_runs"]:
+        print(f"{report['incomplete_runs']} traces without a root span, or given up waiting for one, were left out of the critical paths")
+
+    _print_latency("run", report["latency"]["run"])
+    _print_latency("agent", report["latency"]["agent"])
+    _print_latency("tool", report["latency"]["tool"])
+    _print_latency("model", report["latency"]["model"])
+
+    breakdown = report["breakdown"]
+    print("\ncritical path time")
+    for part in ("llm", "tool", "overhead"):
+        print(f"  {part:<10}{breakdown[part + '_ms']:>14.1f} ms  {breakdown[part + '_share']:>7.1%}")
+    _print_critical("agent", report["critical_path"]["agent"])
+    _print_critical("tool", report["critical_path"]["tool"])
+    _print_critical("model", report["critical_path"]["model"])
+
+    for run in report["slowest_runs"]:
+        print(f"\nrun {run['run_id'] or '-'}  {run['duration_ms']:.1f} ms")
+        for step in run["critical_path"]:
+            print(f"  {step['ms']:>10.1f} ms  {step['span']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m vllora.analyze", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="span files, or directories of them")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_RUNS, help="slowest runs to show the critical path of")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="spans read at a time")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING_SPANS, help="spans held while waiting for their run's root span; traces idle longest are given up beyond this")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    analyzer = TraceAnalyzer(SpanReader(args.batch_size), args.top, args.max_pending)
+    try:
+        analyzer.read(args.paths)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    report = analyzer.report()
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
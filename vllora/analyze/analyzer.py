@@ -0,0 +1,290 @@
+import heapq
+import itertools
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .readers import KIND_AGENT, KIND_LLM, KIND_NAMES, KIND_OTHER, KIND_RUN, KIND_TOOL, Interner, SpanBatch, SpanReader
+from .sketch import LatencySketch
+
+# Default values
+DEFAULT_TOP_RUNS = 10
+DEFAULT_MAX_PENDING_SPANS = 1000000
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _accumulate(totals: np.ndarray, groups: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Add ``weights`` into ``totals`` by group, growing ``totals`` as needed."""
+    if not len(groups):
+        return totals
+    sums = np.bincount(groups, weights=weights)
+    if len(sums) > len(totals):
+        totals = np.concatenate([totals, np.zeros(len(sums) - len(totals))])
+    totals[:len(sums)] += sums
+    return totals
+
+
+class TraceAnalyzer:
+    """Latency percentiles and per-run critical paths over a stream of span batches.
+
+    Every batch updates one latency sketch per agent, tool and model, so
+    memory does not grow with the number of spans. A run's spans are held
+    only until its root span arrives; spans end before their parents and are
+    exported in that order, so by then the run is complete. Its critical
+    path is then computed for all completed runs of the batch at once.
+
+    Roots can be missing, e.g. dropped by a full export queue or written to
+    another worker's files that are not being read. Once more than
+    ``max_pending_spans`` spans are waiting for a root, the traces that went
+    longest without a new span are given up and counted in
+    ``incomplete_runs``, so the held spans stay bounded.
+
+    The critical path of a span runs through the child that ended last,
+    then back through the latest sibling that ended by the time that child
+    started, and so on, recursively. Each span on it is credited with the
+    part of its time not covered by its children on the path. Summed by span
+    kind, this splits each run's wall time into LLM time, tool time and
+    overhead (the run and agent spans themselves), with parallel calls
+    counted once.
+    """
+
+    def __init__(self, reader: Optional[SpanReader] = None, top_runs: int = DEFAULT_TOP_RUNS, max_pending_spans: int = DEFAULT_MAX_PENDING_SPANS):
+        self.reader = reader if reader is not None else SpanReader()
+        self.top_runs = top_runs
+        self.max_pending_spans = max(1, max_pending_spans)
+        self.spans = 0
+        self.runs = 0
+        self.agent_latency = LatencySketch()
+        self.tool_latency = LatencySketch()
+        self.model_latency = LatencySketch()
+        self.run_latency = LatencySketch()
+        # Critical path time in ms by span kind, and by agent, tool and model
+        self.critical_by_kind = np.zeros(len(KIND_NAMES))
+        self.critical_by_agent = np.zeros(0)
+        self.critical_by_tool = np.zeros(0)
+        self.critical_by_model = np.zeros(0)
+        self._pending = SpanBatch.empty()
+        self._abandoned_runs = 0
+        self._slowest: List[Any] = []
+        self._sequence = itertools.count()
+
+    def read(self, paths: Iterable[str]) -> "TraceAnalyzer":
+        for batch in self.reader.read(paths):
+            self.add(batch)
+        return self
+
+    def add(self, batch: SpanBatch):
+        self.spans += len(batch)
+        duration_ms = (batch.end - batch.start) / 1e6
+        self.agent_latency.add(np.where(batch.kind == KIND_AGENT, batch.agent, -1), duration_ms)
+        self.tool_latency.add(np.where(batch.kind == KIND_TOOL, batch.tool, -1), duration_ms)
+        self.model_latency.add(np.where(batch.kind == KIND_LLM, batch.model, -1), duration_ms)
+
+        spans = SpanBatch.concat([self._pending, batch]) if len(self._pending) else batch
+        complete = np.isin(spans.trace, spans.trace[spans.parent == 0])
+        self._pending = spans.take(~complete)
+        if len(self._pending) > self.max_pending_spans:
+            self._abandon_oldest()
+        if complete.any():
+            self._add_runs(spans.take(complete))
+
+    @property
+    def incomplete_runs(self) -> int:
+        """Traces seen without a root span so far, given up or still waiting for one."""
+        return self._abandoned_runs + len(np.unique(self._pending.trace))
+
+    def _abandon_oldest(self):
+        # Give up the traces whose latest span ended longest ago until half the budget is used,
+        # so this runs once per many batches rather than on every one
+        pending = self._pending
+        traces, inverse = np.unique(pending.trace, return_inverse=True)
+        last_end = np.full(len(traces), np.iinfo(np.int64).min)
+        np.maximum.at(last_end, inverse, pending.end)
+        oldest = np.argsort(last_end, kind="stable")
+        released = np.cumsum(np.bincount(inverse)[oldest])
+        count = min(int(np.searchsorted(released, len(pending) - self.max_pending_spans // 2)) + 1, len(traces))
+        abandoned = np.zeros(len(traces), dtype=bool)
+        abandoned[oldest[:count]] = True
+        self._abandoned_runs += count
+        self._pending = pending.take(~abandoned[inverse])
+
+    def _add_runs(self, spans: SpanBatch):
+        count = len(spans)
+        duration = spans.end - spans.start
+
+        # Row of each span's parent, -1 for roots and parents that were never exported
+        by_id = np.argsort(spans.span, kind="stable")
+        position = np.minimum(np.searchsorted(spans.span[by_id], spans.parent), count - 1)
+        found = (spans.parent != 0) & (spans.span[by_id][position] == spans.parent)
+        parent_row = np.where(found, by_id[position], -1)
+
+        # One root per trace, the longest if there are several
+        roots = np.flatnonzero(spans.parent == 0)
+        roots = roots[np.lexsort((duration[roots], spans.trace[roots]))]
+        roots = roots[np.r_[spans.trace[roots][1:] != spans.trace[roots][:-1], True]]
+
+        children = np.flatnonzero(parent_row >= 0)
+        last_child = np.full(count, -1)
+        if len(children):
+            by_end = children[np.lexsort((spans.end[children], parent_row[children]))]
+            last = np.r_[parent_row[by_end][1:] != parent_row[by_end][:-1], True]
+            last_child[parent_row[by_end][last]] = by_end[last]
+        previous = self._previous_siblings(spans, parent_row, children)
+
+        # Walk down the critical paths of every run together, clipping each span to its parent's window
+        window_start = spans.start.copy()
+        window_end = spans.end.copy()
+        path = []
+        frontier = roots
+        while len(frontier):
+            path.append(frontier)
+            down = last_child[frontier]
+            down = down[down >= 0]
+            back = previous[frontier]
+            back = back[back >= 0]
+            frontier = np.concatenate([down, back])
+            parents = parent_row[frontier]
+            window_start[frontier] = np.maximum(spans.start[frontier], window_start[parents])
+            window_end[frontier] = np.maximum(np.minimum(spans.end[frontier], window_end[parents]), window_start[frontier])
+        path = np.concatenate(path)
+
+        window_ms = (window_end[path] - window_start[path]) / 1e6
+        on_path_children = path[parent_row[path] >= 0]
+        covered = np.bincount(parent_row[on_path_children], weights=(window_end[on_path_children] - window_start[on_path_children]) / 1e6, minlength=count)
+        exclusive_ms = np.maximum(window_ms - covered[path], 0.0)
+
+        kinds = spans.kind[path]
+        self.critical_by_kind += np.bincount(kinds, weights=exclusive_ms, minlength=len(KIND_NAMES))
+        for kind, column, attribute in ((KIND_AGENT, spans.agent, "critical_by_agent"), (KIND_TOOL, spans.tool, "critical_by_tool"), (KIND_LLM, spans.model, "critical_by_model")):
+            on_kind = (kinds == kind) & (column[path] >= 0)
+            setattr(self, attribute, _accumulate(getattr(self, attribute), column[path][on_kind], exclusive_ms[on_kind]))
+
+        root_ms = duration[roots] / 1e6
+        self.runs += len(roots)
+        self.run_latency.add(np.zeros(len(roots), dtype=np.int64), root_ms)
+        self._track_slowest(spans, roots, root_ms, path, exclusive_ms, window_start)
+
+    @staticmethod
+    def _previous_siblings(spans: SpanBatch, parent_row: np.ndarray, children: np.ndarray) -> np.ndarray:
+        """For each child, the sibling that ended last no later than it started, or -1."""
+        previous = np.full(len(spans), -1)
+        if not len(children):
+            return previous
+        # Merge sibling ends with child starts, per parent and in time order, ends first at equal
+        # times. Spans of zero length never precede another, so each step back along a chain
+        # starts strictly earlier and chains cannot loop
+        ended = children[spans.end[children] > spans.start[children]]
+        rows = np.concatenate([ended, children])
+        parents = parent_row[rows]
+        times = np.concatenate([spans.end[ended], spans.start[children]])
+        is_start = np.concatenate([np.zeros(len(ended), dtype=bool), np.ones(len(children), dtype=bool)])
+        order = np.lexsort((is_start, times, parents))
+        rows, parents, is_start = rows[order], parents[order], is_start[order]
+
+        latest_end = np.maximum.accumulate(np.where(is_start, -1, np.arange(len(order))))
+        starts = np.flatnonzero(is_start)
+        before = latest_end[starts]
+        valid = (before >= 0) & (parents[np.maximum(before, 0)] == parents[starts])
+        previous[rows[starts[valid]]] = rows[before[valid]]
+        return previous
+
+    def _track_slowest(self, spans: SpanBatch, roots: np.ndarray, root_ms: np.ndarray, path: np.ndarray, exclusive_ms: np.ndarray, window_start: np.ndarray):
+        if not self.top_runs:
+            return
+        threshold = self._slowest[0][0] if len(self._slowest) >= self.top_runs else -1.0
+        candidates = np.flatnonzero(root_ms > threshold)
+        if not len(candidates):
+            return
+        # Only the few runs that may enter the top list get their path spelled out
+        candidates = candidates[np.argsort(root_ms[candidates])[-self.top_runs:]]
+        path_traces = spans.trace[path]
+        for candidate in candidates:
+            root = roots[candidate]
+            on_trace = np.flatnonzero(path_traces == spans.trace[root])
+            steps = on_trace[np.argsort(window_start[path[on_trace]], kind="stable")]
+            critical_path = [
+                {"span": self._label(spans, path[step]), "ms": float(exclusive_ms[step])}
+                for step in steps
+            ]
+            entry = (float(root_ms[candidate]), next(self._sequence), spans.run_id[root], critical_path)
+            if len(self._slowest) < self.top_runs:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _label(self, spans: SpanBatch, row: int) -> str:
+        kind = spans.kind[row]
+        name = None
+        if kind == KIND_AGENT and spans.agent[row] >= 0:
+            name = self.reader.agents.values[spans.agent[row]]
+        elif kind == KIND_TOOL and spans.tool[row] >= 0:
+            name = self.reader.tools.values[spans.tool[row]]
+        elif kind == KIND_LLM and spans.model[row] >= 0:
+            name = self.reader.models.values[spans.model[row]]
+        return f"{KIND_NAMES[kind]}:{name}" if name else KIND_NAMES[kind]
+
+    def report(self) -> Dict[str, Any]:
+        """Return the results so far as plain data, ready for ``json.dumps``."""
+        critical_total = float(self.critical_by_kind.sum())
+        llm_ms = float(self.critical_by_kind[KIND_LLM])
+        tool_ms = float(self.critical_by_kind[KIND_TOOL])
+        overhead_ms = float(self.critical_by_kind[[KIND_RUN, KIND_AGENT, KIND_OTHER]].sum())
+
+        def share(ms: float) -> float:
+            return ms / critical_total if critical_total else 0.0
+
+        return {
+            "spans": self.spans,
+            "runs": self.runs,
+            "incomplete_runs": self.incomplete_runs,
+            "latency": {
+                "run": _latency_rows(self.run_latency, ["run"]),
+                "agent": _latency_rows(self.agent_latency, self.reader.agents.values),
+                "tool": _latency_rows(self.tool_latency, self.reader.tools.values),
+                "model": _latency_rows(self.model_latency, self.reader.models.values),
+            },
+            "breakdown": {
+                "llm_ms": llm_ms,
+                "tool_ms": tool_ms,
+                "overhead_ms": overhead_ms,
+                "llm_share": share(llm_ms),
+                "tool_share": share(tool_ms),
+                "overhead_share": share(overhead_ms),
+            },
+            "critical_path": {
+                "agent": _critical_rows(self.critical_by_agent, self.reader.agents, critical_total),
+                "tool": _critical_rows(self.critical_by_tool, self.reader.tools, critical_total),
+                "model": _critical_rows(self.critical_by_model, self.reader.models, critical_total),
+            },
+            "slowest_runs": [
+                {"run_id": run_id, "duration_ms": duration_ms, "critical_path": critical_path}
+                for duration_ms, _, run_id, critical_path in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+
+def _latency_rows(sketch: LatencySketch, names: List[str]) -> List[Dict[str, Any]]:
+    counts = sketch.counts()
+    means = sketch.means()
+    quantiles = sketch.quantiles(QUANTILES)
+    rows = [
+        {
+            "name": names[group],
+            "count": int(counts[group]),
+            "mean_ms": float(means[group]),
+            **{f"p{int(q * 100)}_ms": float(quantiles[group, column]) for column, q in enumerate(QUANTILES)},
+        }
+        for group in range(min(sketch.groups, len(names)))
+        if counts[group]
+    ]
+    return sorted(rows, key=lambda row: row["count"], reverse=True)
+
+
+def _critical_rows(totals: np.ndarray, names: Interner, critical_total: float) -> List[Dict[str, Any]]:
+    rows = [
+        {"name": names.values[group], "ms": float(ms), "share": float(ms / critical_total) if critical_total else 0.0}
+        for group, ms in enumerate(totals)
+        if ms > 0
+    ]
+    return sorted(rows, key=lambda row: row["ms"], reverse=True)
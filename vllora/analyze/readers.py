@@ -0,0 +1,204 @@
+import glob
+import gzip
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Default values
+DEFAULT_BATCH_SIZE = 65536
+
+# vLLora span kinds, by the names spans are renamed to
+KIND_RUN = 0
+KIND_AGENT = 1
+KIND_LLM = 2
+KIND_TOOL = 3
+KIND_OTHER = 4
+KIND_NAMES = ("run", "agent", "llm", "tool", "other")
+_KINDS_BY_SPAN_NAME = {"run": KIND_RUN, "invocation": KIND_RUN, "agent": KIND_AGENT, "task": KIND_LLM, "tool": KIND_TOOL}
+
+_PARQUET_COLUMNS = ["trace_id", "span_id", "parent_span_id", "name", "start_time", "end_time", "run_id", "agent_name", "tool_name", "model"]
+
+
+class Interner:
+    """Maps strings to dense ints, so label columns become integer arrays."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class SpanBatch:
+    """Columns of a batch of spans as numpy arrays.
+
+    ``trace`` folds the 128-bit trace id into 64 bits. ``parent`` is 0 for
+    root spans. Times are nanoseconds. ``agent``, ``tool`` and ``model``
+    are ids from the reader's interners, -1 when unset. ``run_id`` is only
+    filled in for root spans.
+    """
+
+    __slots__ = ("trace", "span", "parent", "start", "end", "kind", "agent", "tool", "model", "run_id")
+
+    FIELDS = __slots__
+
+    def __init__(self, **columns: np.ndarray):
+        for field in self.FIELDS:
+            setattr(self, field, columns[field])
+
+    def __len__(self) -> int:
+        return len(self.trace)
+
+    def take(self, index: np.ndarray) -> "SpanBatch":
+        return SpanBatch(**{field: getattr(self, field)[index] for field in self.FIELDS})
+
+    @classmethod
+    def concat(cls, batches: List["SpanBatch"]) -> "SpanBatch":
+        return cls(**{field: np.concatenate([getattr(batch, field) for batch in batches]) for field in cls.FIELDS})
+
+    @classmethod
+    def empty(cls) -> "SpanBatch":
+        columns = {field: np.zeros(0, dtype=np.int64) for field in cls.FIELDS}
+        columns.update(trace=np.zeros(0, dtype=np.uint64), span=np.zeros(0, dtype=np.uint64), parent=np.zeros(0, dtype=np.uint64))
+        columns.update(kind=np.zeros(0, dtype=np.int8), run_id=np.empty(0, dtype=object))
+        return cls(**columns)
+
+
+class SpanReader:
+    """Streams span files written by the ``jsonl`` and ``parquet`` exporters as SpanBatch objects.
+
+    Directories are expanded to the span files in them, oldest first by
+    name. Only ``batch_size`` spans are held at a time; Parquet files are
+    read a record batch at a time and need pyarrow.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+        self.agents = Interner()
+        self.tools = Interner()
+        self.models = Interner()
+
+    @staticmethod
+    def expand(paths: Iterable[str]) -> List[str]:
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                found = []
+                for pattern in ("*.parquet", "*.jsonl", "*.jsonl.gz"):
+                    found.extend(glob.glob(os.path.join(path, pattern)))
+                files.extend(sorted(found, key=os.path.basename))
+            else:
+                files.append(path)
+        return files
+
+    def read(self, paths: Iterable[str]) -> Iterator[SpanBatch]:
+        for path in self.expand(paths):
+            if path.endswith(".parquet"):
+                yield from self._read_parquet(path)
+            else:
+                yield from self._read_jsonl(path)
+
+    def _read_jsonl(self, path: str) -> Iterator[SpanBatch]:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            records = []
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+                    if len(records) >= self.batch_size:
+                        yield self._from_records(records)
+                        records = []
+            if records:
+                yield self._from_records(records)
+
+    def _from_records(self, records: List[dict]) -> SpanBatch:
+        trace, span, parent, start, end, kind, agent, tool, model, run_id = ([] for _ in range(10))
+        for record in records:
+            trace_id = record["trace_id"]
+            trace.append(int(trace_id[:16], 16) ^ int(trace_id[16:], 16))
+            span.append(int(record["span_id"], 16))
+            parent_span_id = record.get("parent_span_id")
+            parent.append(int(parent_span_id, 16) if parent_span_id else 0)
+            start.append(record.get("start_time") or 0)
+            end.append(record.get("end_time") or 0)
+            kind.append(_KINDS_BY_SPAN_NAME.get(record.get("name"), KIND_OTHER))
+            agent.append(self.agents.add(record.get("agent_name")))
+            tool.append(self.tools.add(record.get("tool_name")))
+            model.append(self.models.add(record.get("model")))
+            run_id.append(None if parent_span_id else record.get("run_id"))
+        return SpanBatch(
+            trace=np.array(trace, dtype=np.uint64),
+            span=np.array(span, dtype=np.uint64),
+            parent=np.array(parent, dtype=np.uint64),
+            start=np.array(start, dtype=np.int64),
+            end=np.array(end, dtype=np.int64),
+            kind=np.array(kind, dtype=np.int8),
+            agent=np.array(agent, dtype=np.int64),
+            tool=np.array(tool, dtype=np.int64),
+            model=np.array(model, dtype=np.int64),
+            run_id=np.array(run_id, dtype=object),
+        )
+
+    def _read_parquet(self, path: str) -> Iterator[SpanBatch]:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet span files requires pyarrow, install it with: pip install 'vllora[analyze]'") from e
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [column for column in _PARQUET_COLUMNS if column in parquet_file.schema_arrow.names]
+        for record_batch in parquet_file.iter_batches(batch_size=self.batch_size, columns=columns):
+            yield self._from_record_batch(record_batch)
+
+    def _from_record_batch(self, record_batch) -> SpanBatch:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def column(name):
+            return record_batch.column(record_batch.schema.get_field_index(name))
+
+        trace_ids = column("trace_id")
+        raw = np.frombuffer(trace_ids.buffers()[1], dtype=">u8")[2 * trace_ids.offset:2 * (trace_ids.offset + len(trace_ids))]
+        parent = pc.fill_null(column("parent_span_id"), 0).to_numpy().astype(np.uint64)
+
+        names = column("name").dictionary_encode()
+        name_kinds = np.array([_KINDS_BY_SPAN_NAME.get(name, KIND_OTHER) for name in names.dictionary.to_pylist()] + [KIND_OTHER], dtype=np.int8)
+
+        run_id = np.empty(len(record_batch), dtype=object)
+        if "run_id" in record_batch.schema.names:
+            roots = np.flatnonzero(parent == 0)
+            run_id[roots] = column("run_id").take(pa.array(roots)).to_pylist()
+
+        return SpanBatch(
+            trace=(raw[0::2] ^ raw[1::2]).astype(np.uint64),
+            span=column("span_id").to_numpy().astype(np.uint64),
+            parent=parent,
+            start=pc.fill_null(column("start_time").cast(pa.int64()), 0).to_numpy(),
+            end=pc.fill_null(column("end_time").cast(pa.int64()), 0).to_numpy(),
+            kind=name_kinds[pc.fill_null(names.indices, len(name_kinds) - 1).to_numpy()],
+            agent=self._interned(column("agent_name"), self.agents),
+            tool=self._interned(column("tool_name"), self.tools),
+            model=self._interned(column("model"), self.models),
+            run_id=run_id,
+        )
+
+    @staticmethod
+    def _interned(array, interner: Interner) -> np.ndarray:
+        import pyarrow.compute as pc
+
+        # Intern each distinct value of the batch once, then map the whole column
+        encoded = array.dictionary_encode()
+        ids = np.array([interner.add(value) for value in encoded.dictionary.to_pylist()] + [-1], dtype=np.int64)
+        return ids[pc.fill_null(encoded.indices, len(ids) - 1).to_numpy()]
@@ -0,0 +1,83 @@
+import math
+from typing import Sequence
+
+import numpy as np
+
+# Default values
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MIN_MS = 0.001
+DEFAULT_MAX_MS = 1e8
+
+
+class LatencySketch:
+    """Latency distributions of many groups, e.g. one per agent, in fixed memory.
+
+    Values are counted in logarithmic buckets, so any quantile is returned
+    within ``relative_accuracy`` of the true value, as in DDSketch. Memory
+    is one row of bucket counts per group whatever the number of values,
+    and batches are added with a handful of numpy operations. Values below
+    ``min_ms`` or above ``max_ms`` are counted in the first or last bucket.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, min_ms: float = DEFAULT_MIN_MS, max_ms: float = DEFAULT_MAX_MS):
+        self.relative_accuracy = relative_accuracy
+        self.min_ms = min_ms
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = int(math.ceil(math.log(max_ms / min_ms) / self._log_gamma)) + 1
+        self._counts = np.zeros((0, self._buckets), dtype=np.int64)
+        self._sums = np.zeros(0, dtype=np.float64)
+
+    @property
+    def groups(self) -> int:
+        return self._counts.shape[0]
+
+    def _grow(self, groups: int):
+        if groups <= self.groups:
+            return
+        size = max(groups, 2 * self.groups)
+        counts = np.zeros((size, self._buckets), dtype=np.int64)
+        counts[:self.groups] = self._counts
+        sums = np.zeros(size, dtype=np.float64)
+        sums[:self.groups] = self._sums
+        self._counts, self._sums = counts, sums
+
+    def add(self, groups: np.ndarray, values_ms: np.ndarray):
+        """Count ``values_ms[i]`` for group ``groups[i]``. Negative groups are skipped."""
+        keep = groups >= 0
+        groups, values_ms = groups[keep], values_ms[keep]
+        if not len(groups):
+            return
+        self._grow(int(groups.max()) + 1)
+        ratio = np.maximum(values_ms, self.min_ms) / self.min_ms
+        buckets = np.minimum(np.ceil(np.log(ratio) / self._log_gamma), self._buckets - 1).astype(np.int64)
+        cells, counts = np.unique(groups.astype(np.int64) * self._buckets + buckets, return_counts=True)
+        self._counts.reshape(-1)[cells] += counts
+        self._sums += np.bincount(groups, weights=values_ms, minlength=len(self._sums))
+
+    def merge(self, other: "LatencySketch"):
+        """Add another sketch with the same settings into this one."""
+        self._grow(other.groups)
+        self._counts[:other.groups] += other._counts[:other.groups]
+        self._sums[:other.groups] += other._sums[:other.groups]
+
+    def counts(self) -> np.ndarray:
+        return self._counts.sum(axis=1)
+
+    def means(self) -> np.ndarray:
+        counts = self.counts()
+        return np.divide(self._sums, counts, out=np.zeros_like(self._sums), where=counts > 0)
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """Return a (groups, len(qs)) array of quantiles in ms, NaN for empty groups."""
+        cumulative = np.cumsum(self._counts, axis=1)
+        totals = cumulative[:, -1]
+        result = np.full((self.groups, len(qs)), np.nan)
+        for column, q in enumerate(qs):
+            ranks = np.floor(q * np.maximum(totals - 1, 0))
+            buckets = (cumulative > ranks[:, None]).argmax(axis=1)
+            # Midpoint of the bucket's range, within relative_accuracy of any value in it
+            values = self.min_ms * 2 * self._gamma ** buckets / (self._gamma + 1)
+            values[buckets == 0] = self.min_ms
+            result[:, column] = np.where(totals > 0, values, np.nan)
+        return result
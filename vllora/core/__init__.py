@@ -1,4 +1,5 @@
 """Core functionality for vLLora."""
 
 from .tracing import *
+from .rules import register_span_rule
 from .events import send_vllora_event, send_vllora_event_sync
@@ -1,83 +1,375 @@
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+import json
 import os
-import asyncio
-import httpx
+import queue
+import threading
+import time
+from .payload import get_payload_limiter
+from .health import ENDPOINT_EVENTS, STATE_CLOSED, get_circuit_breaker
+from .log import rate_limited_logger
+from .metrics import get_metrics_registry
+from .spool import ENV_VLLORA_SPOOL_DIR, DiskSpool, SpoolReplayer, spool_directory
+from .fork import register_after_fork, reinit_after_fork
+from .transport import DEFAULT_EVENTS_COMPRESSION, ENV_VLLORA_EVENTS_COMPRESSION, compress_body, resolve_compression
 
+if TYPE_CHECKING:
+    import httpx
+
+# Environment variable constants
+ENV_VLLORA_API_BASE_URL = "VLLORA_API_BASE_URL"
+ENV_VLLORA_API_KEY = "VLLORA_API_KEY"
+ENV_VLLORA_PROJECT_ID = "VLLORA_PROJECT_ID"
+ENV_VLLORA_EVENTS_MAX_QUEUE_SIZE = "VLLORA_EVENTS_MAX_QUEUE_SIZE"
+ENV_VLLORA_EVENTS_MAX_BATCH_SIZE = "VLLORA_EVENTS_MAX_BATCH_SIZE"
+ENV_VLLORA_EVENTS_TIMEOUT = "VLLORA_EVENTS_TIMEOUT"
+
+# Default values
+DEFAULT_EVENTS_MAX_QUEUE_SIZE = 2048
+# Batches larger than one are posted as a JSON array; set the batch size to one
+# for gateways that only accept a single event per request.
+DEFAULT_EVENTS_MAX_BATCH_SIZE = 32
+DEFAULT_EVENTS_TIMEOUT = 5
+DEFAULT_EVENTS_MAX_CONNECTIONS = 4
+
+# Queued after the last event to stop the worker
+_STOP = object()
+
+# Metrics
+_metrics = get_metrics_registry()
+EVENTS_SENT = _metrics.counter("vllora_events_sent_total", "Events accepted by the events API")
+EVENTS_FAILED = _metrics.counter("vllora_events_failed_total", "Events whose delivery attempt failed or was refused by an open circuit")
+EVENTS_DROPPED = _metrics.counter("vllora_events_dropped_total", "Events dropped because the queue was full or they could not be delivered or spooled")
+EVENTS_SPOOLED = _metrics.counter("vllora_events_spooled_total", "Events written to the disk spool")
+EVENT_POST_DURATION = _metrics.histogram("vllora_event_post_duration_seconds", "Time taken to post one request to the events API")
+EVENTS_QUEUE_DEPTH = _metrics.gauge("vllora_events_queue_depth", "Events waiting to be sent", lambda dispatcher: dispatcher._queue.qsize())
+
+
+def _build_event(span, operation: str, attributes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Snapshot a span into an event payload on the caller's thread."""
+    span_context = span.get_span_context()
+
+    parent_span_id = None
+    parent = getattr(span, 'parent', None)
+    if parent:
+        parent_span_id = format(parent.span_id, '016x')
+
+    event_attributes = dict(attributes) if attributes else {}
+    span_attributes = getattr(span, 'attributes', None)
+    if span_attributes:
+        event_attributes.update(span_attributes)
+
+    return {
+        "span_id": format(span_context.span_id, '016x'),
+        "trace_id": format(span_context.trace_id, '032x'),
+        "parent_span_id": parent_span_id,
+        "operation": operation,
+        "attributes": get_payload_limiter().limit(event_attributes)
+    }
+
+
+class EventDispatcher:
+    """Ships events to the vLLora events API from a background worker thread.
+
+    Callers only enqueue; the worker owns one keep-alive connection pool and
+    drains the queue in batches. A full queue drops the event instead of
+    blocking the agent.
+    """
+
+    def __init__(self, max_queue_size: Optional[int] = None, max_batch_size: Optional[int] = None, timeout: Optional[float] = None, compression: Optional[str] = None):
+        if max_queue_size is None:
+            max_queue_size = int(os.getenv(ENV_VLLORA_EVENTS_MAX_QUEUE_SIZE, DEFAULT_EVENTS_MAX_QUEUE_SIZE))
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv(ENV_VLLORA_EVENTS_MAX_BATCH_SIZE, DEFAULT_EVENTS_MAX_BATCH_SIZE))
+        if timeout is None:
+            timeout = float(os.getenv(ENV_VLLORA_EVENTS_TIMEOUT, DEFAULT_EVENTS_TIMEOUT))
+
+        self.max_batch_size = max(1, max_batch_size)
+        self.timeout = timeout
+        self.compression = resolve_compression(compression, ENV_VLLORA_EVENTS_COMPRESSION, DEFAULT_EVENTS_COMPRESSION)
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, max_queue_size))
+        self._client: Optional["httpx.Client"] = None
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._spool: Optional[DiskSpool] = None
+        self._spool_root: Optional[str] = None
+        self._replayer: Optional[SpoolReplayer] = None
+        self._closed = False
+        # Connection pools inherited from the parent; kept referenced so collecting them never closes its connections
+        self._inherited: List[Any] = []
+        EVENTS_QUEUE_DEPTH.track(self)
+        reinit_after_fork(self)
+        if os.getenv(ENV_VLLORA_SPOOL_DIR):
+            self.enable_spool(os.path.join(os.getenv(ENV_VLLORA_SPOOL_DIR), "events"))
+
+    def _after_fork_in_child(self):
+        # Queued events are sent by the parent; the child starts its own worker, connection pool and spool
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._worker = None
+        if self._client is not None:
+            self._inherited.append(self._client)
+            self._client = None
+        self._spool = None
+        self._replayer = None
+        if self._spool_root is not None and not self._closed:
+            self.enable_spool(self._spool_root)
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for delivery. Returns False if it was dropped."""
+        if self._closed:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            EVENTS_DROPPED.add()
+            return False
+        return True
+
+    def set_compression(self, compression: str):
+        """Set the Content-Encoding used for /events requests ("none", "gzip", "deflate" or "zstd")."""
+        self.compression = resolve_compression(compression, ENV_VLLORA_EVENTS_COMPRESSION, DEFAULT_EVENTS_COMPRESSION)
+
+    def enable_spool(self, directory: str):
+        """Spool events to ``directory`` while the events API is unreachable."""
+        with self._lock:
+            self._spool_root = directory
+            directory = spool_directory(directory)
+            if self._spool is not None and self._spool.directory == directory:
+                return
+            if self._replayer is not None:
+                self._replayer.stop()
+            self._spool = DiskSpool(directory)
+            self._replayer = SpoolReplayer(self._spool, get_circuit_breaker(ENDPOINT_EVENTS).guard(self._replay_body), name="vllora-spool-events")
+            if self._spool.has_pending():
+                self._replayer.start()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name="vllora-events", daemon=True)
+                worker.start()
+                self._worker = worker
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = _STOP in batch
+            if stop:
+                self._queue.task_done()
+                batch = [event for event in batch if event is not _STOP]
+            if batch:
+                try:
+                    self._send(self._encode(batch), len(batch))
+                except Exception as e:
+                    rate_limited_logger.error("events.encode", "Error encoding events for vLLora events API: %s", e)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued event has been sent, spooled or dropped. Returns False if ``timeout`` seconds passed first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                if deadline is None:
+                    self._queue.all_tasks_done.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Send what is queued, then stop the worker, close the connection pool and the spool.
+
+        Events enqueued afterwards are dropped. Returns False if ``timeout``
+        seconds passed before the queue was drained.
+        """
+        self._closed = True
+        # One deadline for draining the queue and stopping the worker together
+        deadline = None if timeout is None else time.monotonic() + timeout
+        flushed = self.flush(timeout)
+        with self._lock:
+            worker = self._worker
+            if worker is not None:
+                try:
+                    self._queue.put_nowait(_STOP)
+                except queue.Full:
+                    pass
+            if self._replayer is not None:
+                self._replayer.stop()
+        if worker is not None and flushed:
+            worker.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if not worker or not worker.is_alive():
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            if self._spool is not None:
+                self._spool.close()
+        return flushed
+
+    def _get_client(self) -> "httpx.Client":
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.Client(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=DEFAULT_EVENTS_MAX_CONNECTIONS,
+                    max_keepalive_connections=DEFAULT_EVENTS_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    def _encode(self, batch: List[Dict[str, Any]]) -> bytes:
+        payload = batch[0] if len(batch) == 1 else batch
+        return json.dumps(payload).encode("utf-8")
+
+    def _send(self, body: bytes, count: int = 1):
+        if not os.getenv(ENV_VLLORA_API_BASE_URL):
+            # Nowhere to send them; not a delivery failure, so the circuit and spool are left alone
+            rate_limited_logger.warning("events.unconfigured", "%s is not set, dropping %d events", ENV_VLLORA_API_BASE_URL, count)
+            self.dropped += count
+            EVENTS_DROPPED.add(count)
+            return
+        circuit_breaker = get_circuit_breaker(ENDPOINT_EVENTS)
+        spool = self._spool
+        # Keep delivery order: new events queue behind an existing backlog
+        backlog = spool is not None and spool.has_pending()
+        if not backlog and circuit_breaker.allow():
+            try:
+                self._post(body)
+                circuit_breaker.record_success()
+                EVENTS_SENT.add(count)
+                return
+            except Exception as e:
+                circuit_breaker.record_failure()
+                rate_limited_logger.warning("events.send", "Error sending event to vLLora events API: %s", e)
+        if not backlog:
+            EVENTS_FAILED.add(count)
+
+        if spool is None:
+            self.dropped += count
+            EVENTS_DROPPED.add(count)
+            return
+        spool.append(body)
+        EVENTS_SPOOLED.add(count)
+        self._replayer.start()
+        if backlog and circuit_breaker.state == STATE_CLOSED:
+            self._replayer.wake()
+
+    def _replay_body(self, body: bytes) -> bool:
+        try:
+            self._post(body)
+        except Exception:
+            return False
+        return True
+
+    def _post(self, body: bytes):
+        api_base_url = os.getenv(ENV_VLLORA_API_BASE_URL)
+        if not api_base_url:
+            raise Exception(f"{ENV_VLLORA_API_BASE_URL} is not set")
 
-async def send_vllora_event(span, operation: str, attributes: Dict[str, Any] = None):
-    """Send span event to vLLora events API (non-blocking)"""
-    api_base_url = os.getenv("VLLORA_API_BASE_URL")
-    if not api_base_url:
-        return
-    
-    try:
-        span_context = span.get_span_context()
-        span_id = format(span_context.span_id, '016x')
-        trace_id_hex = format(span_context.trace_id, '032x')
-        
-        parent_span_id = None
-        if hasattr(span, 'parent') and span.parent:
-            parent_span_id = format(span.parent.span_id, '016x')
-        
-        event_attributes = attributes or {}
-        if span.attributes:
-            event_attributes.update(dict(span.attributes))
-        
-        event_data = {
-            "span_id": span_id,
-            "trace_id": trace_id_hex,
-            "parent_span_id": parent_span_id,
-            "operation": operation,
-            "attributes": event_attributes
-        }
-        
         headers = {
             "Content-Type": "application/json"
         }
-        
-        api_key = os.getenv("VLLORA_API_KEY")
-        project_id = os.getenv("VLLORA_PROJECT_ID")
-        
+
+        api_key = os.getenv(ENV_VLLORA_API_KEY)
+        project_id = os.getenv(ENV_VLLORA_PROJECT_ID)
+
         if api_key:
             headers["x-api-key"] = api_key
         if project_id:
             headers["x-project-id"] = project_id
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+
+        body, content_encoding = compress_body(body, self.compression)
+        if content_encoding:
+            headers["Content-Encoding"] = content_encoding
+
+        start = time.perf_counter()
+        try:
+            response = self._get_client().post(
                 f"{api_base_url.replace('/v1', '')}/events",
-                json=event_data,
+                content=body,
                 headers=headers,
-                timeout=5
             )
-        
+        finally:
+            EVENT_POST_DURATION.record(time.perf_counter() - start)
+
         if response.status_code != 200:
-            print(f"Error sending event to API: {response.status_code}")
-            print(f"Event data: {event_data}")
-            print(f"Event attributes: {event_attributes}")
-            print(f"Event headers: {headers}")
-            print(f"Event response: {response.text}")
-            raise Exception(f"Error sending event to API: {response.status_code}")
-    except Exception as e:
-        print(f"Error sending event to API: {e}")
-        raise e
+            raise Exception(f"Error sending event to API: {response.status_code} {response.text}")
 
 
-def send_vllora_event_sync(span, operation: str, attributes: Dict[str, Any] = None):
-    """Send span event to vLLora events API (synchronous wrapper for backward compatibility)"""
+_dispatcher: Optional[EventDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_event_dispatcher() -> EventDispatcher:
+    """Return the process-wide event dispatcher, creating it on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = EventDispatcher()
+    return _dispatcher
+
+
+def peek_event_dispatcher() -> Optional[EventDispatcher]:
+    """Return the process-wide event dispatcher if one was created, without creating it."""
+    return _dispatcher
+
+
+@register_after_fork
+def _after_fork_in_child():
+    global _dispatcher_lock
+    _dispatcher_lock = threading.Lock()
+
+
+def _trace_sampled(span, attributes: Optional[Dict[str, Any]]) -> bool:
+    # Follow the sampling decision of the vLLora processor the span's trace goes through
+    for processor in getattr(getattr(span, '_span_processor', None), '_span_processors', ()):
+        sample_event = getattr(processor, 'sample_event', None)
+        if sample_event is not None:
+            thread_id = attributes.get("vllora.thread_id") if attributes else None
+            if thread_id is None and getattr(span, 'attributes', None):
+                thread_id = span.attributes.get("vllora.thread_id")
+            return sample_event(span, thread_id)
+    return True
+
+
+def _enqueue_event(span, operation: str, attributes: Optional[Dict[str, Any]]):
+    if not os.getenv(ENV_VLLORA_API_BASE_URL):
+        return
     try:
-        # Try to get the current event loop
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If we're in an async context, create a task
-            asyncio.create_task(send_vllora_event(span, operation, attributes))
-        else:
-            # If no event loop is running, run the async function
-            loop.run_until_complete(send_vllora_event(span, operation, attributes))
-    except RuntimeError:
-        # No event loop exists, create a new one
-        asyncio.run(send_vllora_event(span, operation, attributes))
+        if not _trace_sampled(span, attributes):
+            return
+        get_event_dispatcher().enqueue(_build_event(span, operation, attributes))
+    except Exception as e:
+        rate_limited_logger.error("events.enqueue", "Error queueing event for vLLora events API: %s", e)
 
 
+async def send_vllora_event(span, operation: str, attributes: Dict[str, Any] = None):
+    """Send span event to vLLora events API (non-blocking)"""
+    _enqueue_event(span, operation, attributes)
 
 
+def send_vllora_event_sync(span, operation: str, attributes: Dict[str, Any] = None):
+    """Send span event to vLLora events API (synchronous wrapper for backward compatibility)"""
+    _enqueue_event(span, operation, attributes)
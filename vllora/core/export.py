@@ -0,0 +1,235 @@
+import collections
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter
+from opentelemetry.sdk.trace.export import SpanExportResult
+
+from .fork import reinit_after_fork
+from .log import rate_limited_logger
+from .metrics import get_metrics_registry
+
+# Environment variable constants
+ENV_VLLORA_EXPORT_MAX_QUEUE_SIZE = "VLLORA_EXPORT_MAX_QUEUE_SIZE"
+ENV_VLLORA_EXPORT_MAX_BATCH_SIZE = "VLLORA_EXPORT_MAX_BATCH_SIZE"
+ENV_VLLORA_EXPORT_SCHEDULE_DELAY_MILLIS = "VLLORA_EXPORT_SCHEDULE_DELAY_MILLIS"
+ENV_VLLORA_EXPORT_OVERFLOW_POLICY = "VLLORA_EXPORT_OVERFLOW_POLICY"
+
+# Overflow policies
+OVERFLOW_DROP = "drop"
+OVERFLOW_BLOCK = "block"
+
+# Default values
+DEFAULT_EXPORT_MAX_QUEUE_SIZE = 2048
+DEFAULT_EXPORT_MAX_BATCH_SIZE = 512
+DEFAULT_EXPORT_SCHEDULE_DELAY_MILLIS = 200
+DEFAULT_EXPORT_OVERFLOW_POLICY = OVERFLOW_DROP
+
+# Metrics
+_metrics = get_metrics_registry()
+SPANS_EXPORTED = _metrics.counter("vllora_spans_exported_total", "Spans accepted by an exporter, including spans spooled to disk")
+SPANS_EXPORT_FAILED = _metrics.counter("vllora_spans_export_failed_total", "Spans in batches an exporter failed to export")
+SPANS_DROPPED = _metrics.counter("vllora_spans_dropped_total", "Spans dropped because an export queue was full")
+SPAN_EXPORT_DURATION = _metrics.histogram("vllora_span_export_duration_seconds", "Time taken to export one batch of spans")
+SPAN_EXPORT_QUEUE_DEPTH = _metrics.gauge("vllora_span_export_queue_depth", "Spans waiting in export queues", lambda stage: len(stage._queue))
+
+
+class BatchExportStage:
+    """Queues finished spans for a single exporter and exports them in batches.
+
+    Each stage owns its own worker thread, so a slow sink only backs up its
+    own queue. When the queue is full, new spans are either dropped or the
+    caller blocks until there is room, depending on ``overflow_policy``.
+    """
+
+    def __init__(self, span_exporter: SpanExporter, max_queue_size: Optional[int] = None, max_batch_size: Optional[int] = None, schedule_delay_millis: Optional[float] = None, overflow_policy: Optional[str] = None):
+        if max_queue_size is None:
+            max_queue_size = int(os.getenv(ENV_VLLORA_EXPORT_MAX_QUEUE_SIZE, DEFAULT_EXPORT_MAX_QUEUE_SIZE))
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv(ENV_VLLORA_EXPORT_MAX_BATCH_SIZE, DEFAULT_EXPORT_MAX_BATCH_SIZE))
+        if schedule_delay_millis is None:
+            schedule_delay_millis = float(os.getenv(ENV_VLLORA_EXPORT_SCHEDULE_DELAY_MILLIS, DEFAULT_EXPORT_SCHEDULE_DELAY_MILLIS))
+        if overflow_policy is None:
+            overflow_policy = os.getenv(ENV_VLLORA_EXPORT_OVERFLOW_POLICY, DEFAULT_EXPORT_OVERFLOW_POLICY)
+        if overflow_policy not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"overflow_policy must be '{OVERFLOW_DROP}' or '{OVERFLOW_BLOCK}', got '{overflow_policy}'")
+
+        self.span_exporter = span_exporter
+        self.max_queue_size = max(1, max_queue_size)
+        self.max_batch_size = max(1, min(max_batch_size, self.max_queue_size))
+        self.schedule_delay = max(0.0, schedule_delay_millis) / 1000
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+
+        self._queue: "collections.deque[ReadableSpan]" = collections.deque()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._shutdown = False
+        self._worker: Optional[threading.Thread] = None
+        SPAN_EXPORT_QUEUE_DEPTH.track(self)
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # Queued spans are exported by the parent; the child starts its own worker on its first span
+        self._queue.clear()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._worker = None
+
+    def enqueue(self, span: ReadableSpan) -> bool:
+        """Queue a span for export. Returns False if it was dropped."""
+        with self._condition:
+            if self._shutdown:
+                return False
+            if self._worker is None:
+                self._start_worker()
+            while len(self._queue) >= self.max_queue_size:
+                if self.overflow_policy == OVERFLOW_DROP:
+                    self.dropped += 1
+                    SPANS_DROPPED.add()
+                    return False
+                self._condition.wait()
+                if self._shutdown:
+                    return False
+            self._queue.append(span)
+            if len(self._queue) == 1 or len(self._queue) >= self.max_batch_size:
+                self._condition.notify_all()
+        return True
+
+    def _start_worker(self):
+        name = f"vllora-export-{type(self.span_exporter).__name__}"
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._queue and not self._shutdown:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.schedule_delay
+                while (len(self._queue) < self.max_batch_size and not self._flush_requested and not self._shutdown):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._queue:
+                    self._flush_requested = False
+                    self._condition.notify_all()
+                    if self._shutdown:
+                        return
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                self._condition.notify_all()
+
+            start = time.perf_counter()
+            try:
+                result = self.span_exporter.export(batch)
+            except Exception as e:
+                result = SpanExportResult.FAILURE
+                exporter_name = type(self.span_exporter).__name__
+                rate_limited_logger.error(f"export.{exporter_name}", "Error exporting spans with %s: %s", exporter_name, e)
+            finally:
+                SPAN_EXPORT_DURATION.record(time.perf_counter() - start)
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+            if result == SpanExportResult.SUCCESS:
+                SPANS_EXPORTED.add(len(batch))
+            else:
+                SPANS_EXPORT_FAILED.add(len(batch))
+
+    def force_flush(self, timeout_millis: float = 30000) -> bool:
+        """Export everything queued so far. Returns False if the deadline passed first."""
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self._condition:
+            if self._worker is None:
+                return True
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._queue or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._flush_requested = False
+        return self.span_exporter.force_flush(int(max(0, deadline - time.monotonic()) * 1000))
+
+    def shutdown(self, timeout_millis: float = 30000):
+        """Drain the queue, stop the worker and shut the exporter down. Later calls do nothing."""
+        with self._condition:
+            if self._shutdown:
+                return
+        # One deadline for draining the queue and stopping the worker together
+        deadline = time.monotonic() + timeout_millis / 1000
+        self.force_flush(timeout_millis)
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        self.span_exporter.shutdown()
+
+
+class SharedSpanExporter(SpanExporter):
+    """One exporter, and so one connection, used by several export stages.
+
+    Every stage using it calls ``acquire`` once; ``shutdown`` only shuts the
+    wrapped exporter down when the last of them shuts down. Given ``create``,
+    a forked child builds its own exporter with it on first use instead of
+    sharing the parent's connection.
+    """
+
+    def __init__(self, span_exporter: SpanExporter, create: Optional[Callable[[], SpanExporter]] = None):
+        self.span_exporter: Optional[SpanExporter] = span_exporter
+        self.create = create
+        self.closed = False
+        self._users = 0
+        self._lock = threading.Lock()
+        # Exporters inherited from the parent; kept referenced so collecting them never closes its connections
+        self._inherited: List[SpanExporter] = []
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+        if self.create is not None and self.span_exporter is not None:
+            self._inherited.append(self.span_exporter)
+            self.span_exporter = None
+
+    def _get(self) -> SpanExporter:
+        span_exporter = self.span_exporter
+        if span_exporter is None:
+            with self._lock:
+                if self.span_exporter is None:
+                    self.span_exporter = self.create()
+                span_exporter = self.span_exporter
+        return span_exporter
+
+    def acquire(self) -> "SharedSpanExporter":
+        with self._lock:
+            self._users += 1
+        return self
+
+    def export(self, spans) -> SpanExportResult:
+        return self._get().export(spans)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        span_exporter = self.span_exporter
+        return span_exporter.force_flush(timeout_millis) if span_exporter is not None else True
+
+    def shutdown(self):
+        with self._lock:
+            self._users -= 1
+            if self._users > 0 or self.closed:
+                return
+            self.closed = True
+            span_exporter = self.span_exporter
+        if span_exporter is not None:
+            span_exporter.shutdown()
@@ -0,0 +1,202 @@
+import abc
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter
+from opentelemetry.sdk.trace.export import SpanExportResult
+
+from .log import rate_limited_logger
+from .usage import INPUT_TOKEN_ATTRIBUTES, MODEL_ATTRIBUTES, OUTPUT_TOKEN_ATTRIBUTES, TOTAL_TOKEN_ATTRIBUTES, first_attribute, token_count
+
+# Environment variable constants
+ENV_VLLORA_JSONL_DIR = "VLLORA_JSONL_DIR"
+ENV_VLLORA_JSONL_MAX_ROWS = "VLLORA_JSONL_MAX_ROWS"
+ENV_VLLORA_JSONL_ROLL_SECONDS = "VLLORA_JSONL_ROLL_SECONDS"
+
+# Default values
+DEFAULT_SPAN_FILES_DIR = "vllora-spans"
+DEFAULT_SPAN_FILES_MAX_ROWS = 100000
+DEFAULT_SPAN_FILES_ROLL_SECONDS = 300.0
+
+# vLLora attributes stored as fields of their own, field name -> attribute
+VLLORA_FIELDS = (
+    ("run_id", "vllora.run_id"),
+    ("thread_id", "vllora.thread_id"),
+    ("agent_name", "vllora.agent_name"),
+    ("task_name", "vllora.task_name"),
+    ("tool_name", "vllora.tool_name"),
+    ("client_name", "vllora.client_name"),
+)
+_VLLORA_FIELD_ATTRIBUTES = frozenset(attribute for _, attribute in VLLORA_FIELDS)
+
+# Fields of every span record, in file column order
+SPAN_FIELDS = (
+    ("trace_id", "span_id", "parent_span_id", "name", "kind", "status", "start_time", "end_time", "duration_ms")
+    + tuple(field for field, _ in VLLORA_FIELDS)
+    + ("model", "input_tokens", "output_tokens", "total_tokens", "ttft_ms", "cache_hit", "attributes")
+)
+
+
+def span_record(span: ReadableSpan) -> Dict[str, Any]:
+    """Flatten a finished span into the fields written to span files.
+
+    Ids are ints, times are nanoseconds since the epoch, and attributes
+    without a field of their own are collected in ``attributes``.
+    """
+    context = span.get_span_context()
+    attributes = span.attributes or {}
+    start, end = span.start_time, span.end_time
+
+    record = {
+        "trace_id": context.trace_id,
+        "span_id": context.span_id,
+        "parent_span_id": span.parent.span_id if span.parent is not None else None,
+        "name": span.name,
+        "kind": span.kind.name,
+        "status": span.status.status_code.name,
+        "start_time": start,
+        "end_time": end,
+        "duration_ms": (end - start) / 1e6 if start is not None and end is not None else None,
+    }
+    for field, attribute in VLLORA_FIELDS:
+        value = attributes.get(attribute)
+        record[field] = str(value) if value is not None else None
+    model = first_attribute(attributes, MODEL_ATTRIBUTES)
+    record["model"] = str(model) if model is not None else None
+    record["input_tokens"] = token_count(attributes, INPUT_TOKEN_ATTRIBUTES)
+    record["output_tokens"] = token_count(attributes, OUTPUT_TOKEN_ATTRIBUTES)
+    record["total_tokens"] = token_count(attributes, TOTAL_TOKEN_ATTRIBUTES)
+    ttft = attributes.get("vllora.ttft_ms")
+    record["ttft_ms"] = float(ttft) if ttft is not None else None
+    cache_hit = attributes.get("vllora.cache_hit")
+    record["cache_hit"] = bool(cache_hit) if cache_hit is not None else None
+    other = {key: value for key, value in attributes.items() if key not in _VLLORA_FIELD_ATTRIBUTES}
+    record["attributes"] = other or None
+    return record
+
+
+class RollingFileSpanExporter(SpanExporter, abc.ABC):
+    """Base for exporters that write spans to a directory of rolling files.
+
+    Spans are buffered and written out as a file of their own once
+    ``max_rows`` spans are buffered or the oldest of them is
+    ``roll_seconds`` old, and on every flush. Files are written under a
+    temporary name and renamed when complete, so readers never see a
+    partial one, and no file stays open between exports. Subclasses buffer
+    records in ``_add`` and write them in ``_write_file``.
+    """
+
+    suffix = ""
+
+    def __init__(self, directory: str, max_rows: int, roll_seconds: float):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_rows = max(1, max_rows)
+        self.roll_seconds = max(0.0, roll_seconds)
+        self.files_written = 0
+        self._rows = 0
+        self._first_row_at: Optional[float] = None
+        self._sequence = 0
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _add(self, record: Dict[str, Any]):
+        """Buffer one span record."""
+
+    @abc.abstractmethod
+    def _take(self) -> Any:
+        """Return the buffered records and start a new buffer."""
+
+    @abc.abstractmethod
+    def _write_file(self, path: str, buffered: Any):
+        """Write records returned by ``_take`` to ``path``."""
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self._shutdown:
+            return SpanExportResult.FAILURE
+        with self._lock:
+            for span in spans:
+                if not self._rows:
+                    self._first_row_at = time.monotonic()
+                self._add(span_record(span))
+                self._rows += 1
+                if self._rows >= self.max_rows:
+                    self._write()
+            if self._rows and time.monotonic() - self._first_row_at >= self.roll_seconds:
+                self._write()
+        return SpanExportResult.SUCCESS
+
+    def _write(self):
+        buffered, rows = self._take(), self._rows
+        self._rows = 0
+        self._first_row_at = None
+
+        self._sequence += 1
+        name = f"spans-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._sequence:06d}{self.suffix}"
+        path = os.path.join(self.directory, name)
+        try:
+            self._write_file(path + ".tmp", buffered)
+            os.replace(path + ".tmp", path)
+            self.files_written += 1
+        except Exception as e:
+            exporter_name = type(self).__name__
+            rate_limited_logger.error(f"export.{exporter_name}", "Error writing %d spans to %s: %s", rows, path, e)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Write the buffered spans to a file now."""
+        with self._lock:
+            if self._rows:
+                self._write()
+        return True
+
+    def shutdown(self):
+        self.force_flush()
+        self._shutdown = True
+
+
+class JsonlSpanExporter(RollingFileSpanExporter):
+    """Writes spans to rolling JSON Lines files, one span record per line.
+
+    Trace and span ids are written as hex strings; everything else as in
+    ``span_record``.
+    """
+
+    suffix = ".jsonl"
+
+    def __init__(self, directory: Optional[str] = None, max_rows: Optional[int] = None, roll_seconds: Optional[float] = None):
+        """Initialize the JSON Lines exporter.
+
+        Args:
+            directory: Where files are written, optional, by default read from env variable VLLORA_JSONL_DIR
+            max_rows: Spans per file, optional, by default read from env variable VLLORA_JSONL_MAX_ROWS
+            roll_seconds: Longest a span is buffered before its file is written, optional, by default read from env variable VLLORA_JSONL_ROLL_SECONDS
+        """
+        if directory is None:
+            directory = os.getenv(ENV_VLLORA_JSONL_DIR, DEFAULT_SPAN_FILES_DIR)
+        if max_rows is None:
+            max_rows = int(os.getenv(ENV_VLLORA_JSONL_MAX_ROWS, DEFAULT_SPAN_FILES_MAX_ROWS))
+        if roll_seconds is None:
+            roll_seconds = float(os.getenv(ENV_VLLORA_JSONL_ROLL_SECONDS, DEFAULT_SPAN_FILES_ROLL_SECONDS))
+        super().__init__(directory, max_rows, roll_seconds)
+        self._lines: List[str] = []
+
+    def _add(self, record: Dict[str, Any]):
+        record["trace_id"] = format(record["trace_id"], "032x")
+        record["span_id"] = format(record["span_id"], "016x")
+        if record["parent_span_id"] is not None:
+            record["parent_span_id"] = format(record["parent_span_id"], "016x")
+        self._lines.append(json.dumps(record, separators=(",", ":"), default=str))
+
+    def _take(self) -> List[str]:
+        lines, self._lines = self._lines, []
+        return lines
+
+    def _write_file(self, path: str, lines: List[str]):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
@@ -0,0 +1,45 @@
+import logging
+import os
+import weakref
+from typing import Any, Callable, List
+
+logger = logging.getLogger("vllora")
+
+# Objects whose _after_fork_in_child() runs in forked children, and module-level callbacks run before them
+_instances: "weakref.WeakSet[Any]" = weakref.WeakSet()
+_callbacks: List[Callable[[], None]] = []
+
+
+def reinit_after_fork(obj: Any) -> Any:
+    """Call ``obj._after_fork_in_child()`` in every child process forked from this one.
+
+    Locks, worker threads and connections are copied into a forked child in
+    whatever state the parent had them, and the threads themselves are not.
+    Objects that own any of them register here so the child gets fresh ones
+    before it runs any code. Objects are held weakly.
+    """
+    _instances.add(obj)
+    return obj
+
+
+def register_after_fork(callback: Callable[[], None]) -> Callable[[], None]:
+    """Run ``callback`` in every forked child, before the registered objects are re-initialized."""
+    _callbacks.append(callback)
+    return callback
+
+
+def _after_fork_in_child():
+    for callback in list(_callbacks):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning("Error re-initializing vLLora after fork: %s", e)
+    for obj in list(_instances):
+        try:
+            obj._after_fork_in_child()
+        except Exception as e:
+            logger.warning("Error re-initializing vLLora %s after fork: %s", type(obj).__name__, e)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,184 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter
+from opentelemetry.sdk.trace.export import SpanExportResult
+
+from .fork import register_after_fork
+from .log import logger
+
+# Environment variable constants
+ENV_VLLORA_CIRCUIT_FAILURE_THRESHOLD = "VLLORA_CIRCUIT_FAILURE_THRESHOLD"
+ENV_VLLORA_CIRCUIT_BACKOFF_MILLIS = "VLLORA_CIRCUIT_BACKOFF_MILLIS"
+ENV_VLLORA_CIRCUIT_MAX_BACKOFF_MILLIS = "VLLORA_CIRCUIT_MAX_BACKOFF_MILLIS"
+
+# Circuit states
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Endpoint names
+ENDPOINT_EVENTS = "events"
+ENDPOINT_OTLP = "otlp"
+
+# Default values
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_BACKOFF_MILLIS = 1000
+DEFAULT_CIRCUIT_MAX_BACKOFF_MILLIS = 60000
+
+
+class CircuitBreaker:
+    """Tracks the health of one remote endpoint.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused without touching the network. Once the backoff has
+    elapsed a single probe is let through (half-open); success closes the
+    circuit, failure reopens it with the backoff doubled, up to
+    ``max_backoff_millis``.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, backoff_millis: Optional[float] = None, max_backoff_millis: Optional[float] = None):
+        if failure_threshold is None:
+            failure_threshold = int(os.getenv(ENV_VLLORA_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_FAILURE_THRESHOLD))
+        if backoff_millis is None:
+            backoff_millis = float(os.getenv(ENV_VLLORA_CIRCUIT_BACKOFF_MILLIS, DEFAULT_CIRCUIT_BACKOFF_MILLIS))
+        if max_backoff_millis is None:
+            max_backoff_millis = float(os.getenv(ENV_VLLORA_CIRCUIT_MAX_BACKOFF_MILLIS, DEFAULT_CIRCUIT_MAX_BACKOFF_MILLIS))
+
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.initial_backoff = backoff_millis / 1000
+        self.max_backoff = max(self.initial_backoff, max_backoff_millis / 1000)
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected = 0
+        self._backoff = self.initial_backoff
+        self._next_probe = 0.0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call to the endpoint may be attempted now."""
+        if self.state == STATE_CLOSED:
+            return True
+        with self._lock:
+            if self.state == STATE_OPEN and time.monotonic() >= self._next_probe:
+                self.state = STATE_HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        self.total_successes += 1
+        if self.state == STATE_CLOSED and not self.consecutive_failures:
+            return
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                logger.info("vLLora %s endpoint recovered, closing circuit", self.name)
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self._backoff = self.initial_backoff
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state == STATE_CLOSED:
+                    logger.warning("vLLora %s endpoint failed %d times in a row, opening circuit", self.name, self.consecutive_failures)
+                    self._opened_at = time.monotonic()
+                self.state = STATE_OPEN
+                # Jitter spreads probes from many processes hitting the same gateway
+                self._next_probe = time.monotonic() + self._backoff * random.uniform(0.8, 1.2)
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+
+    def guard(self, send: Callable[[bytes], bool]) -> Callable[[bytes], bool]:
+        """Wrap a send function so it is skipped while the circuit is open and its outcome recorded."""
+        def guarded(data: bytes) -> bool:
+            if not self.allow():
+                return False
+            try:
+                sent = send(data)
+            except Exception as e:
+                # Counted as a failure so a half-open probe never leaves the circuit stuck
+                logger.debug("vLLora %s send raised: %s", self.name, e)
+                sent = False
+            if sent:
+                self.record_success()
+                return True
+            self.record_failure()
+            return False
+        return guarded
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_successes": self.total_successes,
+            "rejected": self.rejected,
+            "open_for_seconds": None if self._opened_at is None else now - self._opened_at,
+            "next_probe_in_seconds": max(0.0, self._next_probe - now) if self.state == STATE_OPEN else None,
+        }
+
+
+class GuardedSpanExporter(SpanExporter):
+    """Fails exports fast while the exporter's circuit is open."""
+
+    def __init__(self, span_exporter: SpanExporter, circuit_breaker: CircuitBreaker):
+        self.span_exporter = span_exporter
+        self.circuit_breaker = circuit_breaker
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if not self.circuit_breaker.allow():
+            return SpanExportResult.FAILURE
+        try:
+            result = self.span_exporter.export(spans)
+        except Exception:
+            result = SpanExportResult.FAILURE
+        if result == SpanExportResult.SUCCESS:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+        return result
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.span_exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        self.span_exporter.shutdown()
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for an endpoint, creating it on first use."""
+    circuit_breaker = _circuit_breakers.get(name)
+    if circuit_breaker is None:
+        with _circuit_breakers_lock:
+            circuit_breaker = _circuit_breakers.setdefault(name, CircuitBreaker(name))
+    return circuit_breaker
+
+
+def endpoint_health() -> Dict[str, Dict[str, Any]]:
+    """Return the circuit state of every endpoint vLLora talks to."""
+    return {name: circuit_breaker.snapshot() for name, circuit_breaker in list(_circuit_breakers.items())}
+
+
+@register_after_fork
+def _after_fork_in_child():
+    # Circuit state carries over to the child; only the locks are replaced
+    global _circuit_breakers_lock
+    _circuit_breakers_lock = threading.Lock()
+    for circuit_breaker in _circuit_breakers.values():
+        circuit_breaker._lock = threading.Lock()
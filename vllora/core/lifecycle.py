@@ -0,0 +1,153 @@
+import atexit
+import os
+import signal
+import threading
+import time
+import weakref
+from typing import Optional
+
+from .fork import register_after_fork
+from .log import logger
+
+# Environment variable constants
+ENV_VLLORA_SHUTDOWN_TIMEOUT = "VLLORA_SHUTDOWN_TIMEOUT"
+ENV_VLLORA_EXIT_HOOKS = "VLLORA_EXIT_HOOKS"
+
+# Default values
+DEFAULT_SHUTDOWN_TIMEOUT = 5.0
+
+# Processors created in this process, flushed and shut down together with the events pipeline
+_processors: "weakref.WeakSet" = weakref.WeakSet()
+_hooks_installed = False
+_lock = threading.Lock()
+
+
+def _default_timeout() -> float:
+    return float(os.getenv(ENV_VLLORA_SHUTDOWN_TIMEOUT, DEFAULT_SHUTDOWN_TIMEOUT))
+
+
+def register_processor(processor):
+    """Track a span processor for ``flush`` and ``shutdown`` and install the exit hooks once."""
+    _processors.add(processor)
+    install_exit_hooks()
+
+
+def unregister_processor(processor):
+    _processors.discard(processor)
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """Export every span and send every event queued so far.
+
+    Args:
+        timeout: Seconds to wait in total, optional, by default read from env variable VLLORA_SHUTDOWN_TIMEOUT
+
+    Returns False if the deadline passed before everything was delivered.
+    """
+    if timeout is None:
+        timeout = _default_timeout()
+    deadline = time.monotonic() + timeout
+
+    flushed = True
+    for processor in list(_processors):
+        remaining = max(0.0, deadline - time.monotonic())
+        flushed = processor.force_flush(int(remaining * 1000)) and flushed
+
+    from .events import peek_event_dispatcher
+    dispatcher = peek_event_dispatcher()
+    if dispatcher is not None:
+        flushed = dispatcher.flush(max(0.0, deadline - time.monotonic())) and flushed
+    return flushed
+
+
+def shutdown(timeout: Optional[float] = None) -> bool:
+    """Flush, then stop every worker thread and close exporters, connections and spools.
+
+    Args:
+        timeout: Seconds to wait in total, optional, by default read from env variable VLLORA_SHUTDOWN_TIMEOUT
+
+    Spans and events recorded afterwards are dropped. Returns False if the
+    deadline passed before everything was delivered.
+    """
+    if timeout is None:
+        timeout = _default_timeout()
+    deadline = time.monotonic() + timeout
+
+    flushed = flush(timeout)
+    for processor in list(_processors):
+        processor.shutdown(int(max(0.0, deadline - time.monotonic()) * 1000))
+        _processors.discard(processor)
+
+    from .events import peek_event_dispatcher
+    dispatcher = peek_event_dispatcher()
+    if dispatcher is not None:
+        dispatcher.shutdown(max(0.0, deadline - time.monotonic()))
+    if not flushed:
+        logger.warning("vLLora shutdown timed out after %.1fs, some spans or events were not delivered", timeout)
+    return flushed
+
+
+def _on_exit():
+    shutdown()
+
+
+def _finalize_in_child(_):
+    import multiprocessing.util
+    # multiprocessing children leave through os._exit, which skips atexit handlers
+    multiprocessing.util.Finalize(None, _on_exit, exitpriority=0)
+
+
+def _on_signal(signum, frame, previous):
+    # Only flush: the previous handler may keep the process running, and if it
+    # exits, atexit shuts the pipeline down. The signal may have interrupted the
+    # main thread while it held a pipeline lock, so flush from another thread
+    # and give up at the deadline.
+    timeout = _default_timeout()
+    worker = threading.Thread(target=flush, args=(timeout,), name="vllora-flush", daemon=True)
+    worker.start()
+    worker.join(timeout + 1)
+
+    if callable(previous):
+        previous(signum, frame)
+    else:
+        # Restore the default action and deliver the signal again
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+
+def install_exit_hooks():
+    """Flush at interpreter exit, when a multiprocessing worker exits and on SIGTERM. Disabled with env variable VLLORA_EXIT_HOOKS=false.
+
+    The SIGTERM handler is only installed from the main thread and never
+    replaces an ignored signal. It only flushes, then calls the handler the
+    application installed first, or the default action; shutting down is
+    left to atexit.
+    """
+    global _hooks_installed
+    if _hooks_installed or os.getenv(ENV_VLLORA_EXIT_HOOKS, "true").lower() == "false":
+        return
+    with _lock:
+        if _hooks_installed:
+            return
+        _hooks_installed = True
+        atexit.register(_on_exit)
+
+        import multiprocessing
+        import multiprocessing.util
+        if multiprocessing.parent_process() is not None:
+            _finalize_in_child(None)
+        # Forked children inherit the hooks above but not multiprocessing finalizers
+        multiprocessing.util.register_after_fork(_on_exit, _finalize_in_child)
+
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+        if previous == signal.SIG_IGN or previous is None:
+            return
+        signal.signal(signal.SIGTERM, lambda signum, frame: _on_signal(signum, frame, previous))
+
+
+@register_after_fork
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
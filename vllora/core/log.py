@@ -0,0 +1,54 @@
+import logging
+import threading
+import time
+from typing import Dict
+
+from .fork import reinit_after_fork
+
+logger = logging.getLogger("vllora")
+
+# Default values
+DEFAULT_LOG_INTERVAL_SECONDS = 60.0
+
+
+class RateLimitedLogger:
+    """Logs at most one message per key per interval and counts the rest.
+
+    The next message logged for a key reports how many were suppressed since
+    the previous one, so a brownout produces a handful of lines instead of
+    one per failed call.
+    """
+
+    def __init__(self, logger: logging.Logger, interval_seconds: float = DEFAULT_LOG_INTERVAL_SECONDS):
+        self.logger = logger
+        self.interval_seconds = interval_seconds
+        self._last_logged: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+
+    def log(self, level: int, key: str, msg: str, *args):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_logged.get(key)
+            if last is not None and now - last < self.interval_seconds:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last_logged[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            msg += " (%d similar messages suppressed)"
+            args = args + (suppressed,)
+        self.logger.log(level, msg, *args)
+
+    def warning(self, key: str, msg: str, *args):
+        self.log(logging.WARNING, key, msg, *args)
+
+    def error(self, key: str, msg: str, *args):
+        self.log(logging.ERROR, key, msg, *args)
+
+
+rate_limited_logger = RateLimitedLogger(logger)
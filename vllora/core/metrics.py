@@ -0,0 +1,274 @@
+import bisect
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .fork import register_after_fork
+from .log import logger
+
+# Environment variable constants
+ENV_VLLORA_METRICS_PORT = "VLLORA_METRICS_PORT"
+ENV_VLLORA_METRICS_OTEL = "VLLORA_METRICS_OTEL"
+
+# Default values
+DEFAULT_METRICS_ADDRESS = "0.0.0.0"
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonic count, e.g. spans exported."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def collect(self) -> int:
+        return self.value
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+
+class Gauge:
+    """Current level summed over the tracked objects, e.g. queue depth.
+
+    Objects are held weakly and measured only when the gauge is read, so
+    tracking costs nothing on the hot path.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, measure: Callable[[Any], Union[int, float]]):
+        self.name = name
+        self.description = description
+        self.measure = measure
+        self._tracked: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+    def track(self, obj: Any):
+        self._tracked.add(obj)
+
+    def collect(self) -> Union[int, float]:
+        return sum(self.measure(obj) for obj in list(self._tracked))
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, e.g. export latency in seconds."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, unit: str = "s"):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.unit = unit
+        self.count = 0
+        self.sum = 0.0
+        # One slot per bucket plus one for values above the last bound
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self._otel_histogram = None
+
+    def record(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+        if self._otel_histogram is not None:
+            self._otel_histogram.record(value)
+
+    def collect(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """Registry of vLLora's own pipeline metrics.
+
+    Metrics are created once per name at import time by the modules that
+    update them. ``snapshot`` returns their current values,
+    ``prometheus_text`` renders them in the Prometheus text format and
+    ``bind_meter`` reports them, and any registered later, through an
+    OpenTelemetry meter.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._meter = None
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            meter = self._meter
+        # Modules imported after init() register their metrics late; report them too
+        if meter is not None:
+            self._bind(meter, metric)
+        return metric
+
+    def _after_fork_in_child(self):
+        # A forked child counts its own work from zero; the parent keeps reporting its totals
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            if metric.type != "gauge":
+                metric._reset()
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter(name, description))
+
+    def gauge(self, name: str, description: str, measure: Callable[[Any], Union[int, float]]) -> Gauge:
+        return self._register(Gauge(name, description, measure))
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, unit: str = "s") -> Histogram:
+        return self._register(Histogram(name, description, buckets, unit))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current value of every metric, keyed by name."""
+        result = {}
+        for name, metric in list(self._metrics.items()):
+            value = metric.collect()
+            if metric.type == "histogram":
+                value = dict(value, buckets={str(bound): count for bound, count in value["buckets"]})
+            result[name] = value
+        return result
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+        for name, metric in list(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            value = metric.collect()
+            if metric.type == "histogram":
+                for bound, count in value["buckets"]:
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {value["count"]}')
+                lines.append(f"{name}_sum {value['sum']}")
+                lines.append(f"{name}_count {value['count']}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def bind_meter(self, meter):
+        """Report every metric, including those registered later, through an OpenTelemetry meter. Only the first call has an effect."""
+        with self._lock:
+            if self._meter is not None:
+                return
+            self._meter = meter
+            metrics = list(self._metrics.values())
+
+        for metric in metrics:
+            self._bind(meter, metric)
+
+    @staticmethod
+    def _bind(meter, metric: Metric):
+        from opentelemetry.metrics import Observation
+
+        def observe(options):
+            return [Observation(metric.collect())]
+
+        if metric.type == "counter":
+            meter.create_observable_counter(metric.name, callbacks=[observe], description=metric.description)
+        elif metric.type == "gauge":
+            meter.create_observable_gauge(metric.name, callbacks=[observe], description=metric.description)
+        else:
+            # Histograms can't be observed after the fact, so new values are recorded as they come in
+            metric._otel_histogram = meter.create_histogram(metric.name, unit=metric.unit, description=metric.description)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
+
+
+_prometheus_server = None
+_prometheus_lock = threading.Lock()
+
+
+@register_after_fork
+def _after_fork_in_child():
+    global _prometheus_lock
+    _prometheus_lock = threading.Lock()
+    # The server stays with the parent; start_prometheus_server in a child returns its address instead of binding the port again
+    _registry._after_fork_in_child()
+
+
+def start_prometheus_server(port: Optional[int] = None, address: str = DEFAULT_METRICS_ADDRESS) -> Optional[Tuple[str, int]]:
+    """Serve the registry in Prometheus text format on ``/metrics``.
+
+    Args:
+        port: Port to listen on, optional, by default read from env variable VLLORA_METRICS_PORT. Use 0 to pick a free port.
+        address: Address to bind, defaults to all interfaces
+
+    Returns the bound address, or None if no port is configured. The server
+    is started once per process; later calls return its address.
+    """
+    global _prometheus_server
+    if port is None:
+        if not os.getenv(ENV_VLLORA_METRICS_PORT):
+            return None
+        port = int(os.getenv(ENV_VLLORA_METRICS_PORT))
+
+    with _prometheus_lock:
+        if _prometheus_server is None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = _registry.prometheus_text().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            server = ThreadingHTTPServer((address, port), Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="vllora-metrics", daemon=True).start()
+            _prometheus_server = server
+            logger.info("Serving vLLora metrics on http://%s:%d/metrics", *server.server_address[:2])
+        return _prometheus_server.server_address[:2]
+
+
+def enable_otel_metrics(meter_provider=None):
+    """Report vLLora metrics through OpenTelemetry, using the global meter provider by default."""
+    if meter_provider is None:
+        from opentelemetry import metrics
+        meter_provider = metrics.get_meter_provider()
+    _registry.bind_meter(meter_provider.get_meter("vllora"))
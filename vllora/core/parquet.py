@@ -0,0 +1,107 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from .files import DEFAULT_SPAN_FILES_DIR, DEFAULT_SPAN_FILES_MAX_ROWS, DEFAULT_SPAN_FILES_ROLL_SECONDS, VLLORA_FIELDS, RollingFileSpanExporter
+
+# Environment variable constants
+ENV_VLLORA_PARQUET_DIR = "VLLORA_PARQUET_DIR"
+ENV_VLLORA_PARQUET_MAX_ROWS = "VLLORA_PARQUET_MAX_ROWS"
+ENV_VLLORA_PARQUET_ROLL_SECONDS = "VLLORA_PARQUET_ROLL_SECONDS"
+ENV_VLLORA_PARQUET_COMPRESSION = "VLLORA_PARQUET_COMPRESSION"
+
+# Default values
+DEFAULT_PARQUET_DIR = DEFAULT_SPAN_FILES_DIR
+DEFAULT_PARQUET_MAX_ROWS = DEFAULT_SPAN_FILES_MAX_ROWS
+DEFAULT_PARQUET_ROLL_SECONDS = DEFAULT_SPAN_FILES_ROLL_SECONDS
+DEFAULT_PARQUET_COMPRESSION = "zstd"
+
+# vLLora attributes stored in their own columns, column name -> attribute
+VLLORA_COLUMNS = VLLORA_FIELDS
+
+
+def span_schema():
+    """Arrow schema of the span files written by ParquetSpanExporter."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("trace_id", pa.binary(16)),
+            ("span_id", pa.uint64()),
+            ("parent_span_id", pa.uint64()),
+            ("name", pa.string()),
+            ("kind", pa.string()),
+            ("status", pa.string()),
+            ("start_time", pa.timestamp("ns", tz="UTC")),
+            ("end_time", pa.timestamp("ns", tz="UTC")),
+            ("duration_ms", pa.float64()),
+        ]
+        + [(column, pa.string()) for column, _ in VLLORA_COLUMNS]
+        + [
+            ("model", pa.string()),
+            ("input_tokens", pa.int64()),
+            ("output_tokens", pa.int64()),
+            ("total_tokens", pa.int64()),
+            ("ttft_ms", pa.float64()),
+            ("cache_hit", pa.bool_()),
+            # Every other attribute as a JSON object
+            ("attributes", pa.string()),
+        ]
+    )
+
+
+class ParquetSpanExporter(RollingFileSpanExporter):
+    """Writes spans to rolling Parquet files with one typed column per field.
+
+    Spans are converted to columns as they are exported; see
+    RollingFileSpanExporter for when files are written. Requires pyarrow,
+    installed with the ``parquet`` extra.
+    """
+
+    suffix = ".parquet"
+
+    def __init__(self, directory: Optional[str] = None, max_rows: Optional[int] = None, roll_seconds: Optional[float] = None, compression: Optional[str] = None):
+        """Initialize the Parquet exporter.
+
+        Args:
+            directory: Where files are written, optional, by default read from env variable VLLORA_PARQUET_DIR
+            max_rows: Spans per file, optional, by default read from env variable VLLORA_PARQUET_MAX_ROWS
+            roll_seconds: Longest a span is buffered before its file is written, optional, by default read from env variable VLLORA_PARQUET_ROLL_SECONDS
+            compression: Parquet codec ("zstd", "snappy", "gzip" or "none"), optional, by default read from env variable VLLORA_PARQUET_COMPRESSION
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The parquet exporter requires pyarrow, install it with: pip install 'vllora[parquet]'") from e
+
+        if directory is None:
+            directory = os.getenv(ENV_VLLORA_PARQUET_DIR, DEFAULT_PARQUET_DIR)
+        if max_rows is None:
+            max_rows = int(os.getenv(ENV_VLLORA_PARQUET_MAX_ROWS, DEFAULT_PARQUET_MAX_ROWS))
+        if roll_seconds is None:
+            roll_seconds = float(os.getenv(ENV_VLLORA_PARQUET_ROLL_SECONDS, DEFAULT_PARQUET_ROLL_SECONDS))
+        if compression is None:
+            compression = os.getenv(ENV_VLLORA_PARQUET_COMPRESSION, DEFAULT_PARQUET_COMPRESSION)
+
+        super().__init__(directory, max_rows, roll_seconds)
+        self.compression = compression.lower()
+        self._schema = span_schema()
+        self._columns: Dict[str, List[Any]] = {name: [] for name in self._schema.names}
+
+    def _add(self, record: Dict[str, Any]):
+        record["trace_id"] = record["trace_id"].to_bytes(16, "big")
+        attributes = record["attributes"]
+        if attributes is not None:
+            record["attributes"] = json.dumps(attributes, separators=(",", ":"), default=str)
+        for name, values in self._columns.items():
+            values.append(record[name])
+
+    def _take(self) -> Dict[str, List[Any]]:
+        columns, self._columns = self._columns, {name: [] for name in self._schema.names}
+        return columns
+
+    def _write_file(self, path: str, columns: Dict[str, List[Any]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.table(columns, schema=self._schema), path, compression=self.compression)
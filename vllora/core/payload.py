@@ -0,0 +1,150 @@
+import hashlib
+import os
+from typing import Any, Dict, MutableMapping, Optional, Set
+
+# Environment variable constants
+ENV_VLLORA_MAX_ATTRIBUTE_BYTES = "VLLORA_MAX_ATTRIBUTE_BYTES"
+ENV_VLLORA_MAX_SPAN_BYTES = "VLLORA_MAX_SPAN_BYTES"
+ENV_VLLORA_DEDUP_MIN_BYTES = "VLLORA_DEDUP_MIN_BYTES"
+
+# Default values
+DEFAULT_MAX_ATTRIBUTE_BYTES = 0
+DEFAULT_MAX_SPAN_BYTES = 0
+DEFAULT_DEDUP_MIN_BYTES = 0
+
+# Appended to a value cut to fit its budget
+TRUNCATION_MARKER = "...[truncated {} bytes]"
+# Replaces a value whose body was already sent earlier in the same trace
+CONTENT_REFERENCE_PREFIX = "vllora-content:sha256:"
+# Set next to the first occurrence of a deduplicated value, holding its hash
+CONTENT_HASH_ATTRIBUTE_PREFIX = "vllora.content_hash."
+# Identifying attributes never cut to fit the span budget
+BUDGET_EXEMPT_PREFIX = "vllora."
+BUDGET_EXEMPT_ATTRIBUTES = ("session.id",)
+
+
+def _truncate(encoded: bytes, max_bytes: int) -> str:
+    cut = len(encoded) - max_bytes
+    return encoded[:max_bytes].decode("utf-8", "ignore") + TRUNCATION_MARKER.format(cut)
+
+
+def _budget_exempt(key: str) -> bool:
+    return key.startswith(BUDGET_EXEMPT_PREFIX) or key in BUDGET_EXEMPT_ATTRIBUTES
+
+
+class PayloadLimiter:
+    """Keeps large span attributes such as prompts and tool schemas in budget.
+
+    Every step is off by default. Values over ``max_attribute_bytes`` are
+    truncated, and the largest values are truncated further until the span
+    fits in ``max_span_bytes``; ``vllora.*`` and ``session.id`` attributes
+    count towards that budget but are never cut. A limit of 0 disables
+    that step.
+
+    Deduplication is off unless ``dedup_min_bytes`` is set. String
+    attributes of at least that size, and within ``max_attribute_bytes``,
+    are then hashed. The first span in a trace carrying a value keeps its
+    body untruncated and gets a ``vllora.content_hash.<key>`` attribute;
+    later spans get a ``vllora-content:sha256:<hash>`` reference instead
+    of the body. Resolving references is up to the reader, and a reference
+    points at nothing if the span holding the body is dropped.
+    """
+
+    def __init__(self, max_attribute_bytes: Optional[int] = None, max_span_bytes: Optional[int] = None, dedup_min_bytes: Optional[int] = None):
+        if max_attribute_bytes is None:
+            max_attribute_bytes = int(os.getenv(ENV_VLLORA_MAX_ATTRIBUTE_BYTES, DEFAULT_MAX_ATTRIBUTE_BYTES))
+        if max_span_bytes is None:
+            max_span_bytes = int(os.getenv(ENV_VLLORA_MAX_SPAN_BYTES, DEFAULT_MAX_SPAN_BYTES))
+        if dedup_min_bytes is None:
+            dedup_min_bytes = int(os.getenv(ENV_VLLORA_DEDUP_MIN_BYTES, DEFAULT_DEDUP_MIN_BYTES))
+
+        self.max_attribute_bytes = max(0, max_attribute_bytes)
+        self.max_span_bytes = max(0, max_span_bytes)
+        self.dedup_min_bytes = max(0, dedup_min_bytes)
+        # Shortest string that could need any work; utf-8 is at most 4 bytes per character
+        limits = [limit for limit in (self.max_attribute_bytes, self.dedup_min_bytes) if limit]
+        self._min_chars = (min(limits) + 3) // 4 if limits else None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_attribute_bytes or self.max_span_bytes or self.dedup_min_bytes)
+
+    def apply(self, attributes: MutableMapping[str, Any], seen_hashes: Optional[Set[str]] = None):
+        """Deduplicate and truncate string attributes in place."""
+        sizes: Dict[str, int] = {}
+        total = 0
+        for key, value in tuple(attributes.items()):
+            if not isinstance(value, str):
+                continue
+            if self._min_chars is None or len(value) < self._min_chars:
+                if self.max_span_bytes:
+                    size = len(value)
+                    if not _budget_exempt(key):
+                        sizes[key] = size
+                    total += size
+                continue
+
+            encoded = value.encode("utf-8")
+            # Values over the cap would be truncated, so they are never deduplicated
+            if seen_hashes is not None and self.dedup_min_bytes and self.dedup_min_bytes <= len(encoded) and (not self.max_attribute_bytes or len(encoded) <= self.max_attribute_bytes):
+                digest = hashlib.sha256(encoded).hexdigest()
+                if digest in seen_hashes:
+                    value = CONTENT_REFERENCE_PREFIX + digest
+                    attributes[key] = value
+                    encoded = value.encode("utf-8")
+                else:
+                    # The body is shipped exactly as hashed: it counts towards the span budget but is never cut
+                    seen_hashes.add(digest)
+                    attributes[CONTENT_HASH_ATTRIBUTE_PREFIX + key] = digest
+                    total += len(encoded)
+                    continue
+
+            if self.max_attribute_bytes and len(encoded) > self.max_attribute_bytes:
+                value = _truncate(encoded, self.max_attribute_bytes)
+                attributes[key] = value
+                encoded = value.encode("utf-8")
+
+            if not _budget_exempt(key):
+                sizes[key] = len(encoded)
+            total += len(encoded)
+
+        if self.max_span_bytes and total > self.max_span_bytes:
+            self._fit_span_budget(attributes, sizes, total - self.max_span_bytes)
+
+    def _fit_span_budget(self, attributes: MutableMapping[str, Any], sizes: Dict[str, int], over: int):
+        # Cut the largest values first; exempt attributes are not in sizes, so cutting stops once only they remain
+        for key in sorted(sizes, key=sizes.get, reverse=True):
+            if over <= 0:
+                break
+            encoded = attributes[key].encode("utf-8")
+            keep = max(0, len(encoded) - over - len(TRUNCATION_MARKER) - 16)
+            truncated = _truncate(encoded, keep)
+            attributes[key] = truncated
+            over -= len(encoded) - len(truncated.encode("utf-8"))
+
+    def limit(self, attributes: Dict[str, Any]) -> Dict[str, Any]:
+        """Truncate oversized values in an event attribute dict in place and return it."""
+        if not self.max_attribute_bytes:
+            return attributes
+        for key, value in attributes.items():
+            if isinstance(value, str) and len(value) >= self._min_chars:
+                encoded = value.encode("utf-8")
+                if len(encoded) > self.max_attribute_bytes:
+                    attributes[key] = _truncate(encoded, self.max_attribute_bytes)
+        return attributes
+
+
+_payload_limiter: Optional[PayloadLimiter] = None
+
+
+def set_payload_limiter(limiter: Optional[PayloadLimiter]):
+    """Set the limiter applied to vLLora event attributes."""
+    global _payload_limiter
+    _payload_limiter = limiter
+
+
+def get_payload_limiter() -> PayloadLimiter:
+    global _payload_limiter
+    if _payload_limiter is None:
+        _payload_limiter = PayloadLimiter()
+    return _payload_limiter
@@ -0,0 +1,98 @@
+from typing import Any, Dict, Optional
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+
+from .usage import INPUT_TOKEN_ATTRIBUTES, OUTPUT_TOKEN_ATTRIBUTES, TOTAL_TOKEN_ATTRIBUTES, first_attribute, token_count
+
+# Span names after rewriting, see rules.DEFAULT_SPAN_RULES
+AGENT_SPAN_NAME = "agent"
+LLM_SPAN_NAME = "task"
+TOOL_SPAN_NAME = "tool"
+
+# Attributes carrying the cost of an LLM call, when the instrumentation reports it
+COST_ATTRIBUTES = ("llm.cost.total", "gen_ai.usage.cost")
+
+
+class RunRollup:
+    """Running totals of one run, updated as its spans end.
+
+    Each span adds a few numbers and nothing is kept per span, so a run
+    costs the same memory whether it has ten spans or ten thousand. The
+    totals are set on the run span when it ends:
+
+    - ``vllora.run.spans``: spans that ended within the run
+    - ``vllora.run.llm_calls`` / ``vllora.run.tool_calls``: LLM and tool spans
+    - ``vllora.run.input_tokens`` / ``vllora.run.output_tokens`` / ``vllora.run.total_tokens``:
+      token usage summed over LLM spans
+    - ``vllora.run.cost``: cost summed over LLM spans, when they report one
+    - ``vllora.run.agent_ms`` / ``vllora.run.llm_ms`` / ``vllora.run.tool_ms``: summed
+      durations of agent, LLM and tool spans; parallel calls each count in full
+    """
+
+    __slots__ = ("spans", "llm_calls", "tool_calls", "input_tokens", "output_tokens", "total_tokens", "cost", "agent_ns", "llm_ns", "tool_ns")
+
+    def __init__(self):
+        self.spans = 0
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.cost: Optional[float] = None
+        self.agent_ns = 0
+        self.llm_ns = 0
+        self.tool_ns = 0
+
+    def add(self, span: ReadableSpan):
+        """Count a finished span, already renamed by the rewrite rules."""
+        self.spans += 1
+        name = span._name
+        if name != LLM_SPAN_NAME and name != TOOL_SPAN_NAME and name != AGENT_SPAN_NAME:
+            return
+        start, end = span._start_time, span._end_time
+        duration = end - start if start is not None and end is not None else 0
+
+        if name == TOOL_SPAN_NAME:
+            self.tool_calls += 1
+            self.tool_ns += duration
+        elif name == AGENT_SPAN_NAME:
+            self.agent_ns += duration
+        else:
+            self.llm_calls += 1
+            self.llm_ns += duration
+            attributes = span._attributes
+            input_tokens = token_count(attributes, INPUT_TOKEN_ATTRIBUTES) or 0
+            output_tokens = token_count(attributes, OUTPUT_TOKEN_ATTRIBUTES) or 0
+            total_tokens = token_count(attributes, TOTAL_TOKEN_ATTRIBUTES)
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.total_tokens += total_tokens if total_tokens is not None else input_tokens + output_tokens
+            cost = first_attribute(attributes, COST_ATTRIBUTES)
+            if cost is not None:
+                try:
+                    self.cost = (self.cost or 0.0) + float(cost)
+                except (TypeError, ValueError):
+                    pass
+
+    def merge(self, other: "RunRollup"):
+        for field in self.__slots__:
+            if field != "cost":
+                setattr(self, field, getattr(self, field) + getattr(other, field))
+        if other.cost is not None:
+            self.cost = (self.cost or 0.0) + other.cost
+
+    def attributes(self) -> Dict[str, Any]:
+        attributes = {
+            "vllora.run.spans": self.spans,
+            "vllora.run.llm_calls": self.llm_calls,
+            "vllora.run.tool_calls": self.tool_calls,
+            "vllora.run.input_tokens": self.input_tokens,
+            "vllora.run.output_tokens": self.output_tokens,
+            "vllora.run.total_tokens": self.total_tokens,
+            "vllora.run.agent_ms": self.agent_ns / 1e6,
+            "vllora.run.llm_ms": self.llm_ns / 1e6,
+            "vllora.run.tool_ms": self.tool_ns / 1e6,
+        }
+        if self.cost is not None:
+            attributes["vllora.run.cost"] = self.cost
+        return attributes
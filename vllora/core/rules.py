@@ -0,0 +1,123 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+
+# OpenInference attribute carrying the span kind
+SPAN_KIND_ATTRIBUTE = "openinference.span.kind"
+
+_AGENT_RUN_PATTERN = re.compile(r"agent_run\s*\[(.*?)\]")
+
+
+class SpanRewriteRule:
+    """Declarative rule that renames a finished span and sets attributes on it.
+
+    A rule matches on exactly one of ``name`` (exact span name),
+    ``name_prefix`` or ``kind`` (the ``openinference.span.kind`` attribute).
+
+    Args:
+        rename: The new span name, e.g. "agent", "task" or "tool"
+        name: Match spans with exactly this name, optional
+        name_prefix: Match spans whose name starts with this prefix, optional
+        kind: Match spans with this openinference span kind, optional
+        name_attribute: Attribute that receives the original span name, optional
+        attributes: Static attributes set on every matched span, optional
+        extract: Callable returning extra attributes computed from the span, optional
+    """
+
+    def __init__(self, rename: str, name: Optional[str] = None, name_prefix: Optional[str] = None, kind: Optional[str] = None, name_attribute: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None, extract: Optional[Callable[[ReadableSpan], Dict[str, Any]]] = None):
+        if sum(match is not None for match in (name, name_prefix, kind)) != 1:
+            raise ValueError("exactly one of name, name_prefix or kind must be set")
+        self.rename = rename
+        self.name = name
+        self.name_prefix = name_prefix
+        self.kind = kind
+        self.name_attribute = name_attribute
+        self.attributes = dict(attributes) if attributes else {}
+        self.extract = extract
+
+    def apply(self, span: ReadableSpan):
+        attributes = span._attributes
+        if self.name_attribute is not None:
+            attributes[self.name_attribute] = span._name
+        for key, value in self.attributes.items():
+            attributes[key] = value
+        if self.extract is not None:
+            for key, value in self.extract(span).items():
+                attributes[key] = value
+        span._name = self.rename
+
+
+def _agent_run_attributes(span: ReadableSpan) -> Dict[str, Any]:
+    # Extract agent name from the span name if it follows the pattern "agent_run [name]"
+    match = _AGENT_RUN_PATTERN.match(span._name)
+    agent_name = match.group(1) if match else span._attributes.get("agent.name", "")
+    return {"vllora.agent_name": agent_name}
+
+
+DEFAULT_SPAN_RULES = (
+    SpanRewriteRule("run", name="invocation"),
+    SpanRewriteRule("agent", name_prefix="agent_run", extract=_agent_run_attributes),
+    SpanRewriteRule("task", name_prefix="call_llm", attributes={"vllora.task_name": "call_llm"}),
+    SpanRewriteRule("agent", kind="AGENT", name_attribute="vllora.agent_name"),
+    SpanRewriteRule("task", kind="LLM", name_attribute="vllora.task_name"),
+    SpanRewriteRule("tool", kind="TOOL", name_attribute="vllora.tool_name"),
+)
+
+_registered_rules: List[SpanRewriteRule] = []
+
+
+def register_span_rule(rule: SpanRewriteRule):
+    """Register a rewrite rule for processors created after this call.
+
+    Registered rules take precedence over the built-in ADK and OpenInference rules.
+    """
+    _registered_rules.append(rule)
+
+
+def get_registered_span_rules() -> List[SpanRewriteRule]:
+    return list(_registered_rules)
+
+
+class SpanRewriteEngine:
+    """Compiled set of rewrite rules applied with a single dispatch per span.
+
+    Exact names are matched first, then name prefixes, then span kinds. Within
+    each group the earliest rule wins, and only that rule is applied: a span
+    renamed by a name rule is not renamed again by a kind rule.
+    """
+
+    def __init__(self, rules: Iterable[SpanRewriteRule]):
+        self._by_name: Dict[str, SpanRewriteRule] = {}
+        self._by_kind: Dict[str, SpanRewriteRule] = {}
+        self._by_prefix: List[SpanRewriteRule] = []
+        for rule in rules:
+            if rule.name is not None:
+                self._by_name.setdefault(rule.name, rule)
+            elif rule.kind is not None:
+                self._by_kind.setdefault(rule.kind, rule)
+            else:
+                self._by_prefix.append(rule)
+        self._prefixes = tuple(rule.name_prefix for rule in self._by_prefix)
+
+    def match(self, span: ReadableSpan) -> Optional[SpanRewriteRule]:
+        name = span._name
+        rule = self._by_name.get(name)
+        if rule is not None:
+            return rule
+        if self._prefixes and name.startswith(self._prefixes):
+            for rule in self._by_prefix:
+                if name.startswith(rule.name_prefix):
+                    return rule
+        if self._by_kind:
+            kind = span._attributes.get(SPAN_KIND_ATTRIBUTE)
+            if kind is not None:
+                return self._by_kind.get(kind)
+        return None
+
+    def apply(self, span: ReadableSpan) -> Optional[SpanRewriteRule]:
+        """Rewrite the span in place and return the rule that matched, if any."""
+        rule = self.match(span)
+        if rule is not None:
+            rule.apply(span)
+        return rule
@@ -0,0 +1,111 @@
+import hashlib
+import os
+from typing import Callable, Iterable, List, Optional
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+from opentelemetry.trace import StatusCode
+
+# Environment variable constants
+ENV_VLLORA_SAMPLING_RATIO = "VLLORA_SAMPLING_RATIO"
+ENV_VLLORA_SAMPLING_BY = "VLLORA_SAMPLING_BY"
+ENV_VLLORA_TAIL_SAMPLING = "VLLORA_TAIL_SAMPLING"
+ENV_VLLORA_TAIL_SAMPLING_LATENCY_MILLIS = "VLLORA_TAIL_SAMPLING_LATENCY_MILLIS"
+ENV_VLLORA_TAIL_SAMPLING_MAX_SPANS = "VLLORA_TAIL_SAMPLING_MAX_SPANS"
+
+# Head sampling keys
+SAMPLE_BY_TRACE = "trace"
+SAMPLE_BY_THREAD = "thread"
+
+# Default values
+DEFAULT_SAMPLING_RATIO = 1.0
+DEFAULT_SAMPLING_BY = SAMPLE_BY_TRACE
+DEFAULT_TAIL_SAMPLING_MAX_SPANS = 10000
+DEFAULT_HEAD_SAMPLING_MAX_PENDING_SPANS = 1000
+
+_BOUND = 1 << 64
+
+
+class HeadSampler:
+    """Decides up front whether a trace is kept.
+
+    With ``by="trace"`` the decision is derived from the trace id, like
+    OpenTelemetry's ratio sampler. With ``by="thread"`` it is derived from
+    ``vllora.thread_id`` so every run of a thread is kept or dropped together;
+    the span processor holds a trace's spans until its thread id is known, up
+    to ``max_pending_spans``, and traces that never get one fall back to the
+    trace id.
+    """
+
+    def __init__(self, ratio: Optional[float] = None, by: Optional[str] = None, max_pending_spans: int = DEFAULT_HEAD_SAMPLING_MAX_PENDING_SPANS):
+        if ratio is None:
+            ratio = float(os.getenv(ENV_VLLORA_SAMPLING_RATIO, DEFAULT_SAMPLING_RATIO))
+        if by is None:
+            by = os.getenv(ENV_VLLORA_SAMPLING_BY, DEFAULT_SAMPLING_BY)
+        if by not in (SAMPLE_BY_TRACE, SAMPLE_BY_THREAD):
+            raise ValueError(f"by must be '{SAMPLE_BY_TRACE}' or '{SAMPLE_BY_THREAD}', got '{by}'")
+
+        self.ratio = min(1.0, max(0.0, ratio))
+        self.by = by
+        self.max_pending_spans = max(0, max_pending_spans)
+        self._threshold = int(self.ratio * _BOUND)
+
+    @property
+    def samples_everything(self) -> bool:
+        return self._threshold >= _BOUND
+
+    def should_sample(self, trace_id: int, thread_id: Optional[str] = None) -> bool:
+        if self._threshold >= _BOUND:
+            return True
+        if self._threshold <= 0:
+            return False
+        if self.by == SAMPLE_BY_THREAD and thread_id:
+            digest = hashlib.blake2b(str(thread_id).encode(), digest_size=8).digest()
+            return int.from_bytes(digest, "big") < self._threshold
+        return (trace_id & (_BOUND - 1)) < self._threshold
+
+
+TailRule = Callable[[List[ReadableSpan]], bool]
+
+
+class TailSampler:
+    """Decides whether to keep a trace once its root span has ended.
+
+    A buffered trace is kept if any span errored, if the root span took at
+    least ``latency_threshold_millis``, or if any of ``rules`` returns True
+    for the trace's spans.
+
+    Events are sent as they happen, before the decision is made, so only
+    spans are tail-sampled: a dropped trace still has its events sent.
+    """
+
+    def __init__(self, latency_threshold_millis: Optional[float] = None, keep_errors: bool = True, rules: Optional[Iterable[TailRule]] = None, max_spans_per_trace: Optional[int] = None):
+        if latency_threshold_millis is None and os.getenv(ENV_VLLORA_TAIL_SAMPLING_LATENCY_MILLIS):
+            latency_threshold_millis = float(os.getenv(ENV_VLLORA_TAIL_SAMPLING_LATENCY_MILLIS))
+        if max_spans_per_trace is None:
+            max_spans_per_trace = int(os.getenv(ENV_VLLORA_TAIL_SAMPLING_MAX_SPANS, DEFAULT_TAIL_SAMPLING_MAX_SPANS))
+
+        self.latency_threshold_ns = None if latency_threshold_millis is None else int(latency_threshold_millis * 1_000_000)
+        self.keep_errors = keep_errors
+        self.rules = list(rules) if rules else []
+        self.max_spans_per_trace = max(1, max_spans_per_trace)
+
+    @classmethod
+    def from_env(cls) -> Optional["TailSampler"]:
+        """Build a tail sampler from VLLORA_TAIL_SAMPLING_* env variables, if enabled."""
+        if os.getenv(ENV_VLLORA_TAIL_SAMPLING, "false").lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls()
+
+    def should_keep(self, spans: List[ReadableSpan], root: ReadableSpan) -> bool:
+        if self.keep_errors:
+            for span in spans:
+                if span.status.status_code is StatusCode.ERROR:
+                    return True
+        if self.latency_threshold_ns is not None and root.end_time is not None and root.start_time is not None:
+            if root.end_time - root.start_time >= self.latency_threshold_ns:
+                return True
+        for rule in self.rules:
+            if rule(spans):
+                return True
+        return False
+
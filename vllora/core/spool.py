@@ -0,0 +1,282 @@
+import os
+import struct
+import threading
+import zlib
+from typing import Callable, List, Optional, Sequence
+
+from opentelemetry.sdk.trace.export import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter
+from opentelemetry.sdk.trace.export import SpanExportResult
+
+from .log import rate_limited_logger
+from .metrics import get_metrics_registry
+
+# Environment variable constants
+ENV_VLLORA_SPOOL_DIR = "VLLORA_SPOOL_DIR"
+ENV_VLLORA_SPOOL_MAX_BYTES = "VLLORA_SPOOL_MAX_BYTES"
+ENV_VLLORA_SPOOL_SEGMENT_BYTES = "VLLORA_SPOOL_SEGMENT_BYTES"
+ENV_VLLORA_SPOOL_REPLAY_INTERVAL_MILLIS = "VLLORA_SPOOL_REPLAY_INTERVAL_MILLIS"
+
+# Default values
+DEFAULT_SPOOL_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SPOOL_SEGMENT_BYTES = 8 * 1024 * 1024
+DEFAULT_SPOOL_REPLAY_INTERVAL_MILLIS = 5000
+
+# Metrics
+_metrics = get_metrics_registry()
+SPANS_SPOOLED = _metrics.counter("vllora_spans_spooled_total", "Spans written to the disk spool instead of the collector")
+SPOOL_BYTES = _metrics.gauge("vllora_spool_bytes", "Bytes waiting in disk spools", lambda spool: spool.size)
+
+# Each record is stored as <length><crc32><payload>
+_HEADER = struct.Struct(">II")
+_SEGMENT_SUFFIX = ".seg"
+_CURSOR_FILE = "cursor"
+
+# Process that loaded vLLora; processes forked from it spool to a subdirectory of their own
+_main_pid = os.getpid()
+
+
+def spool_directory(directory: str) -> str:
+    """Return the spool directory this process should use under ``directory``.
+
+    A forked worker gets ``worker-<pid>`` inside it, so parent and children
+    never append to or replay the same segments.
+    """
+    pid = os.getpid()
+    if pid == _main_pid:
+        return directory
+    return os.path.join(directory, f"worker-{pid}")
+
+
+class DiskSpool:
+    """Append-only record log split into size-rotated segment files.
+
+    Records are replayed oldest first. Fully replayed segments are deleted,
+    and the read position within the current one is kept in a cursor file so
+    a restart resumes where replay stopped. When the spool exceeds
+    ``max_bytes`` the oldest segments are dropped.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, segment_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.getenv(ENV_VLLORA_SPOOL_MAX_BYTES, DEFAULT_SPOOL_MAX_BYTES))
+        if segment_bytes is None:
+            segment_bytes = int(os.getenv(ENV_VLLORA_SPOOL_SEGMENT_BYTES, DEFAULT_SPOOL_SEGMENT_BYTES))
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = max(1, min(segment_bytes, max_bytes))
+        self.dropped_bytes = 0
+        self._lock = threading.Lock()
+        self._segments: List[int] = sorted(
+            int(name[:-len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(directory)
+            if name.endswith(_SEGMENT_SUFFIX) and name[:-len(_SEGMENT_SUFFIX)].isdigit()
+        )
+        self._sizes = {seq: os.path.getsize(self._segment_path(seq)) for seq in self._segments}
+        # Kept in step with _sizes under the lock, so size can be read from any thread
+        self._total_bytes = sum(self._sizes.values())
+        self._read_seq, self._read_offset = self._load_cursor()
+        self._writer = None
+        self._write_seq: Optional[int] = None
+        SPOOL_BYTES.track(self)
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{_SEGMENT_SUFFIX}")
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, _CURSOR_FILE)) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except (OSError, ValueError):
+            return None, 0
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, _CURSOR_FILE)
+        with open(path + ".tmp", "w") as f:
+            f.write(f"{self._read_seq} {self._read_offset}")
+        os.replace(path + ".tmp", path)
+
+    @property
+    def size(self) -> int:
+        return self._total_bytes
+
+    def has_pending(self) -> bool:
+        return bool(self._segments)
+
+    def append(self, record: bytes):
+        """Append one record, rotating segments and dropping the oldest data as needed."""
+        with self._lock:
+            if self._writer is None or self._sizes[self._write_seq] + _HEADER.size + len(record) > self.segment_bytes:
+                self._rotate()
+            self._writer.write(_HEADER.pack(len(record), zlib.crc32(record)))
+            self._writer.write(record)
+            self._writer.flush()
+            self._sizes[self._write_seq] += _HEADER.size + len(record)
+            self._total_bytes += _HEADER.size + len(record)
+            self._enforce_max_bytes()
+
+    def _rotate(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._write_seq = (self._segments[-1] + 1) if self._segments else 0
+        self._segments.append(self._write_seq)
+        self._sizes[self._write_seq] = 0
+        self._writer = open(self._segment_path(self._write_seq), "ab")
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._write_seq = None
+
+    def _enforce_max_bytes(self):
+        while len(self._segments) > 1 and self.size > self.max_bytes:
+            self.dropped_bytes += self._sizes[self._segments[0]]
+            self._remove_oldest()
+
+    def _remove_oldest(self):
+        seq = self._segments.pop(0)
+        self._total_bytes -= self._sizes.pop(seq, 0)
+        if seq == self._write_seq:
+            self._close_writer()
+        if seq == self._read_seq:
+            self._read_seq, self._read_offset = None, 0
+        try:
+            os.remove(self._segment_path(seq))
+        except OSError:
+            pass
+
+    def replay(self, send: Callable[[bytes], bool]) -> int:
+        """Send spooled records in order until one fails. Returns the number sent."""
+        sent = 0
+        while True:
+            with self._lock:
+                if not self._segments:
+                    return sent
+                seq = self._segments[0]
+                if seq == self._write_seq:
+                    # Stop appending to the segment we are about to read
+                    self._close_writer()
+                offset = self._read_offset if self._read_seq == seq else 0
+
+            try:
+                with open(self._segment_path(seq), "rb") as f:
+                    f.seek(offset)
+                    while True:
+                        header = f.read(_HEADER.size)
+                        if len(header) < _HEADER.size:
+                            break
+                        length, crc = _HEADER.unpack(header)
+                        record = f.read(length)
+                        if len(record) < length or zlib.crc32(record) != crc:
+                            # Torn write from a crash, the rest of the segment is unreadable
+                            break
+                        if not send(record):
+                            with self._lock:
+                                if self._segments and self._segments[0] == seq:
+                                    self._read_seq, self._read_offset = seq, offset
+                                    self._save_cursor()
+                            return sent
+                        offset += _HEADER.size + length
+                        sent += 1
+            except FileNotFoundError:
+                pass
+
+            with self._lock:
+                if self._segments and self._segments[0] == seq:
+                    self._remove_oldest()
+                    self._read_seq, self._read_offset = None, 0
+                    self._save_cursor()
+
+    def close(self):
+        with self._lock:
+            self._close_writer()
+
+
+class SpoolReplayer:
+    """Background thread that drains a spool whenever the remote accepts records again."""
+
+    def __init__(self, spool: DiskSpool, send: Callable[[bytes], bool], interval_millis: Optional[float] = None, name: str = "vllora-spool"):
+        if interval_millis is None:
+            interval_millis = float(os.getenv(ENV_VLLORA_SPOOL_REPLAY_INTERVAL_MILLIS, DEFAULT_SPOOL_REPLAY_INTERVAL_MILLIS))
+        self.spool = spool
+        self.send = send
+        self.interval = interval_millis / 1000
+        self.name = name
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self.spool.has_pending():
+                try:
+                    self.spool.replay(self.send)
+                except Exception as e:
+                    rate_limited_logger.warning(f"spool.{self.name}", "Error replaying vLLora spool %s: %s", self.spool.directory, e)
+
+    def wake(self):
+        """Replay now instead of waiting for the next interval."""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+
+class SpoolingSpanExporter(SpanExporter):
+    """Wraps an OTLP exporter and spools batches it fails to deliver.
+
+    While a backlog exists, new batches are spooled too, so the remote
+    receives spans in the order they ended. ``send_encoded`` must deliver one
+    encoded ExportTraceServiceRequest and return True on success.
+    """
+
+    def __init__(self, span_exporter: SpanExporter, spool: DiskSpool, send_encoded: Callable[[bytes], bool], replay_interval_millis: Optional[float] = None):
+        self.span_exporter = span_exporter
+        self.spool = spool
+        self.replayer = SpoolReplayer(spool, send_encoded, replay_interval_millis, name="vllora-spool-spans")
+        if spool.has_pending():
+            self.replayer.start()
+
+    def _spool(self, spans: Sequence[ReadableSpan]):
+        from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+
+        self.spool.append(encode_spans(spans).SerializeToString())
+        SPANS_SPOOLED.add(len(spans))
+        self.replayer.start()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self.spool.has_pending():
+            self._spool(spans)
+            self.replayer.wake()
+            return SpanExportResult.SUCCESS
+        try:
+            result = self.span_exporter.export(spans)
+        except Exception:
+            result = SpanExportResult.FAILURE
+        if result != SpanExportResult.SUCCESS:
+            self._spool(spans)
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.span_exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        self.replayer.stop()
+        self.spool.close()
+        self.span_exporter.shutdown()
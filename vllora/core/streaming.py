@@ -0,0 +1,91 @@
+import time
+from typing import Optional
+
+from .metrics import get_metrics_registry
+
+_metrics = get_metrics_registry()
+_ttft = _metrics.histogram("vllora_llm_time_to_first_token_seconds", "Time from sending a streamed LLM request to its first chunk")
+_inter_chunk = _metrics.histogram("vllora_llm_inter_chunk_seconds", "Mean gap between chunks of a streamed LLM response")
+
+
+class StreamTimer:
+    """Latency of one streamed LLM response, recorded on its span when the stream ends.
+
+    ``chunk`` is called for every content chunk as it passes through and
+    only keeps running totals, so nothing is buffered and each call is a
+    clock read and a few integer operations. ``finish`` sets:
+
+    - ``vllora.ttft_ms``: time from the request to the first chunk
+    - ``vllora.stream_chunks``: number of content chunks
+    - ``vllora.inter_chunk_ms_mean`` / ``vllora.inter_chunk_ms_max``: gaps between chunks
+    - ``vllora.stream_duration_ms``: time from the request to the end of the stream
+    - ``vllora.output_tokens`` / ``vllora.tokens_per_second``: when the provider reports usage,
+      with the rate measured from the first chunk to the end of the stream
+
+    The first chunk is also marked with a ``vllora.first_token`` span event.
+
+    Set ``replayed`` when the chunks are not coming from upstream, e.g. a
+    response cache hit. The span then gets ``vllora.stream_replayed`` and
+    only the chunk count and duration, and nothing is recorded in the
+    latency histograms.
+    """
+
+    __slots__ = ("span", "start_ns", "first_ns", "last_ns", "chunks", "max_gap_ns", "output_tokens", "replayed", "_finished")
+
+    def __init__(self, span, start_ns: Optional[int] = None):
+        self.span = span
+        self.start_ns = start_ns if start_ns is not None else time.perf_counter_ns()
+        self.first_ns = 0
+        self.last_ns = 0
+        self.chunks = 0
+        self.max_gap_ns = 0
+        self.output_tokens: Optional[int] = None
+        self.replayed = False
+        self._finished = False
+
+    def chunk(self):
+        now = time.perf_counter_ns()
+        if self.chunks:
+            gap = now - self.last_ns
+            if gap > self.max_gap_ns:
+                self.max_gap_ns = gap
+        else:
+            self.first_ns = now
+            if self.span.is_recording() and not self.replayed:
+                self.span.add_event("vllora.first_token")
+        self.last_ns = now
+        self.chunks += 1
+
+    def finish(self):
+        """Record the totals on the span. Only the first call has an effect."""
+        if self._finished:
+            return
+        self._finished = True
+        end_ns = time.perf_counter_ns()
+        span = self.span
+        if not span.is_recording():
+            return
+
+        attributes = {
+            "vllora.stream_chunks": self.chunks,
+            "vllora.stream_duration_ms": (end_ns - self.start_ns) / 1e6,
+        }
+        if self.replayed:
+            # Replayed chunks arrive as fast as they are read back, which says nothing about upstream latency
+            attributes["vllora.stream_replayed"] = True
+            span.set_attributes(attributes)
+            return
+        if self.chunks:
+            ttft_ns = self.first_ns - self.start_ns
+            attributes["vllora.ttft_ms"] = ttft_ns / 1e6
+            _ttft.record(ttft_ns / 1e9)
+        if self.chunks > 1:
+            mean_gap_ns = (self.last_ns - self.first_ns) / (self.chunks - 1)
+            attributes["vllora.inter_chunk_ms_mean"] = mean_gap_ns / 1e6
+            attributes["vllora.inter_chunk_ms_max"] = self.max_gap_ns / 1e6
+            _inter_chunk.record(mean_gap_ns / 1e9)
+        if self.output_tokens is not None:
+            attributes["vllora.output_tokens"] = self.output_tokens
+            if self.chunks and end_ns > self.first_ns:
+                attributes["vllora.tokens_per_second"] = self.output_tokens / ((end_ns - self.first_ns) / 1e9)
+        span.set_attributes(attributes)
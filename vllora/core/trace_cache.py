@@ -0,0 +1,155 @@
+import collections
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .fork import reinit_after_fork
+from .metrics import get_metrics_registry
+
+# Environment variable constants
+ENV_VLLORA_TRACE_CACHE_MAX_TRACES = "VLLORA_TRACE_CACHE_MAX_TRACES"
+ENV_VLLORA_TRACE_CACHE_TTL_SECONDS = "VLLORA_TRACE_CACHE_TTL_SECONDS"
+
+# Default values
+DEFAULT_TRACE_CACHE_MAX_TRACES = 10000
+DEFAULT_TRACE_CACHE_TTL_SECONDS = 3600
+
+# Metrics
+_metrics = get_metrics_registry()
+TRACE_CACHE_SIZE = _metrics.gauge("vllora_trace_cache_size", "Open traces held in the per-trace cache", len)
+TRACE_CACHE_EVICTIONS = _metrics.counter("vllora_trace_cache_evictions_total", "Traces evicted from the cache before their root span ended")
+
+
+class TraceState:
+    """Per-trace state kept by the span processor while a trace is open."""
+
+    __slots__ = ("attributes", "run_id", "sampled", "pending", "buffer", "tail_kept", "content_hashes", "rollups", "last_access")
+
+    def __init__(self):
+        self.attributes: Dict[str, Any] = {}
+        self.run_id: Optional[str] = None
+        self.sampled: Optional[bool] = None
+        # Spans ended before a thread-keyed head sampling decision could be made
+        self.pending: Optional[List[Any]] = None
+        self.buffer: Optional[List[Any]] = None
+        self.tail_kept = False
+        self.content_hashes: Set[str] = set()
+        # RunRollup per (run id, thread id), created on first use
+        self.rollups: Optional[Dict[Tuple[Any, Any], Any]] = None
+        self.last_access = time.monotonic()
+
+
+class TraceCache:
+    """Bounded map of trace id to TraceState.
+
+    Entries are released explicitly when a trace's root span ends. Traces that
+    never close are evicted least-recently-used first once ``max_traces`` is
+    reached, or once they have been idle for longer than ``ttl_seconds``.
+    Evicted states that still hold spans awaiting a sampling decision are
+    passed to ``on_evict``, outside the cache lock.
+    """
+
+    def __init__(self, max_traces: Optional[int] = None, ttl_seconds: Optional[float] = None, on_evict: Optional[Callable[[TraceState], None]] = None):
+        if max_traces is None:
+            max_traces = int(os.getenv(ENV_VLLORA_TRACE_CACHE_MAX_TRACES, DEFAULT_TRACE_CACHE_MAX_TRACES))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv(ENV_VLLORA_TRACE_CACHE_TTL_SECONDS, DEFAULT_TRACE_CACHE_TTL_SECONDS))
+
+        self.max_traces = max(1, max_traces)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.releases = 0
+        self.on_evict = on_evict
+        self._entries: "collections.OrderedDict[int, TraceState]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        TRACE_CACHE_SIZE.track(self)
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # Traces open at the fork belong to the parent, which finishes and exports them. Only
+        # the one the forking thread was in can continue in the child, so its state is kept.
+        from opentelemetry import trace
+
+        trace_id = trace.get_current_span().get_span_context().trace_id
+        state = self._entries.get(trace_id)
+        self._lock = threading.Lock()
+        self._entries.clear()
+        if state is not None:
+            if state.buffer is not None:
+                # Buffered spans are exported by the parent
+                state.buffer = []
+            state.pending = None
+            # So are the run totals counted so far
+            state.rollups = None
+            self._entries[trace_id] = state
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_create(self, trace_id: int) -> TraceState:
+        """Return the state for ``trace_id``, creating it if needed."""
+        now = time.monotonic()
+        evicted = None
+        with self._lock:
+            state = self._entries.get(trace_id)
+            if state is not None:
+                self.hits += 1
+                self._entries.move_to_end(trace_id)
+            else:
+                self.misses += 1
+                evicted = self._evict(now)
+                state = TraceState()
+                self._entries[trace_id] = state
+            state.last_access = now
+        if evicted and self.on_evict is not None:
+            for evicted_state in evicted:
+                self.on_evict(evicted_state)
+        return state
+
+    def release(self, trace_id: int) -> Optional[TraceState]:
+        """Drop the state for a finished trace and return it."""
+        with self._lock:
+            state = self._entries.pop(trace_id, None)
+            if state is not None:
+                self.releases += 1
+            return state
+
+    def _evict(self, now: float) -> List[TraceState]:
+        """Evict expired and excess entries, returning those that still hold spans."""
+        evicted = []
+        # Entries are ordered by last access, so expired ones sit at the front
+        if self.ttl_seconds > 0:
+            expire_before = now - self.ttl_seconds
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if oldest.last_access >= expire_before:
+                    break
+                self._evict_oldest(evicted)
+        while len(self._entries) >= self.max_traces:
+            self._evict_oldest(evicted)
+        return evicted
+
+    def _evict_oldest(self, evicted: List[TraceState]):
+        _, state = self._entries.popitem(last=False)
+        self.evictions += 1
+        TRACE_CACHE_EVICTIONS.add()
+        if state.pending or state.buffer:
+            evicted.append(state)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache size and hit/miss/eviction counters."""
+        return {
+            "size": len(self._entries),
+            "max_traces": self.max_traces,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "releases": self.releases,
+        }
@@ -1,13 +1,27 @@
 import os
-from trace import Trace
+import threading
+import time
 import uuid
+import weakref
 
-from typing import Optional, Dict
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from typing import Any, Callable, Iterable, Optional, Dict, Tuple
 from opentelemetry.sdk.trace.export import SpanProcessor
 from opentelemetry.sdk.trace.export import ReadableSpan
 from opentelemetry.sdk.trace.export import ConsoleSpanExporter
 from opentelemetry.sdk.trace.export import SpanExporter
+from .export import BatchExportStage, SharedSpanExporter
+from .transport import PROTOCOL_HTTP_PROTOBUF, OtlpReplaySender, create_otlp_exporter, resolve_protocol
+from .health import ENDPOINT_OTLP, GuardedSpanExporter, get_circuit_breaker
+from .spool import ENV_VLLORA_SPOOL_DIR, DiskSpool, SpoolingSpanExporter, spool_directory
+from .events import get_event_dispatcher
+from .lifecycle import register_processor, unregister_processor
+from .fork import reinit_after_fork
+from .trace_cache import TraceCache, TraceState
+from .rollup import RunRollup
+from .sampling import SAMPLE_BY_THREAD, HeadSampler, TailSampler
+from .payload import PayloadLimiter, set_payload_limiter
+from .metrics import ENV_VLLORA_METRICS_OTEL, enable_otel_metrics, get_metrics_registry, start_prometheus_server
+from .rules import DEFAULT_SPAN_RULES, SpanRewriteEngine, SpanRewriteRule, get_registered_span_rules
 
 # Environment variable constants
 ENV_VLLORA_TRACING = "VLLORA_TRACING"
@@ -18,8 +32,18 @@ ENV_VLLORA_TRACING_EXPORTERS = "VLLORA_TRACING_EXPORTERS"
 
 # Default values
 DEFAULT_COLLECTOR_ENDPOINT = 'http://0.0.0.0:4317'
+DEFAULT_HTTP_COLLECTOR_ENDPOINT = 'http://0.0.0.0:4318'
 DEFAULT_EXPORTERS = "otlp"
 
+# Metrics
+_metrics = get_metrics_registry()
+SPANS_PROCESSED = _metrics.counter("vllora_spans_processed_total", "Spans ended and seen by the vLLora span processor")
+SPANS_SAMPLED_OUT = _metrics.counter("vllora_spans_sampled_out_total", "Spans not exported because of head or tail sampling")
+SPANS_EVICTED_UNDECIDED = _metrics.counter("vllora_spans_evicted_undecided_total", "Spans still awaiting a sampling decision when their trace was evicted from the cache, exported without one")
+
+# Span names that always carry their run's totals, even when nested under another span
+ROOT_SPAN_NAMES = ("invocation", "run")
+
 # Attribute mapping
 attribute_to_vllora_attribute_map = {
     "vllora.thread_id": "vllora.thread_id",
@@ -27,14 +51,39 @@ attribute_to_vllora_attribute_map = {
 }
 
 class vLLoraTracing:
-    def __init__(self, collector_endpoint: Optional[str] = None, api_key: Optional[str] = None, project_id: Optional[str] = None, client_name: Optional[str] = None, session_id: Optional[str] = None):
+    def __init__(self, collector_endpoint: Optional[str] = None, api_key: Optional[str] = None, project_id: Optional[str] = None, client_name: Optional[str] = None, session_id: Optional[str] = None, max_queue_size: Optional[int] = None, max_batch_size: Optional[int] = None, schedule_delay_millis: Optional[float] = None, overflow_policy: Optional[str] = None, max_traces: Optional[int] = None, trace_ttl_seconds: Optional[float] = None, span_rules: Optional[Iterable[SpanRewriteRule]] = None, sampling_ratio: Optional[float] = None, sampling_by: Optional[str] = None, tail_sampler: Optional[TailSampler] = None, max_attribute_bytes: Optional[int] = None, max_span_bytes: Optional[int] = None, dedup_min_bytes: Optional[int] = None, protocol: Optional[str] = None, compression: Optional[str] = None, channel_options: Optional[list] = None, events_compression: Optional[str] = None, spool_dir: Optional[str] = None, metrics_port: Optional[int] = None, otel_metrics: Optional[bool] = None):
+        """Configure vLLora tracing.
+
+        Args:
+            max_queue_size: Spans buffered per exporter, optional, by default read from env variable VLLORA_EXPORT_MAX_QUEUE_SIZE
+            max_batch_size: Spans sent per export call, optional, by default read from env variable VLLORA_EXPORT_MAX_BATCH_SIZE
+            schedule_delay_millis: Longest a span waits for its batch to fill, optional, by default read from env variable VLLORA_EXPORT_SCHEDULE_DELAY_MILLIS
+            overflow_policy: "drop" or "block" when an exporter queue is full, optional, by default read from env variable VLLORA_EXPORT_OVERFLOW_POLICY
+            max_traces: Open traces whose attributes are cached, optional, by default read from env variable VLLORA_TRACE_CACHE_MAX_TRACES
+            trace_ttl_seconds: Idle time before an unfinished trace is evicted, optional, by default read from env variable VLLORA_TRACE_CACHE_TTL_SECONDS
+            span_rules: Extra span rewrite rules for other frameworks, optional, applied before registered and built-in rules
+            sampling_ratio: Fraction of traces kept by head sampling, optional, by default read from env variable VLLORA_SAMPLING_RATIO
+            sampling_by: Head-sample by "trace" id or by "thread" id, optional, by default read from env variable VLLORA_SAMPLING_BY
+            tail_sampler: Keeps only errored, slow or rule-matched traces, optional, by default enabled with env variable VLLORA_TAIL_SAMPLING
+            max_attribute_bytes: Size above which a string attribute is truncated, optional, by default read from env variable VLLORA_MAX_ATTRIBUTE_BYTES
+            max_span_bytes: Total string attribute budget per span, optional, by default read from env variable VLLORA_MAX_SPAN_BYTES
+            dedup_min_bytes: Size from which repeated values are sent once per trace, optional, by default read from env variable VLLORA_DEDUP_MIN_BYTES
+            protocol: OTLP transport, "grpc" or "http/protobuf", optional, by default read from env variable VLLORA_TRACING_PROTOCOL
+            compression: OTLP compression, "none", "gzip" or "deflate", optional, by default read from env variable VLLORA_TRACING_COMPRESSION
+            channel_options: gRPC channel options, optional, by default built from VLLORA_GRPC_* env variables
+            events_compression: Events API compression, "none", "gzip" or "zstd", optional, by default read from env variable VLLORA_EVENTS_COMPRESSION
+            spool_dir: Directory where spans and events are spooled while the gateway is unreachable, optional, by default read from env variable VLLORA_SPOOL_DIR
+            metrics_port: Port serving vLLora's own metrics in Prometheus text format on /metrics, optional, by default read from env variable VLLORA_METRICS_PORT
+            otel_metrics: Report vLLora's own metrics through the global OpenTelemetry meter provider, optional, by default read from env variable VLLORA_METRICS_OTEL
+        """
         if os.getenv(ENV_VLLORA_TRACING) == "false":
             return
 
         if collector_endpoint is None:
             collector_endpoint = os.getenv(ENV_VLLORA_TRACING_BASE_URL)
         if collector_endpoint is None:
-            collector_endpoint = DEFAULT_COLLECTOR_ENDPOINT
+            # OTLP over HTTP listens on its own port
+            collector_endpoint = DEFAULT_HTTP_COLLECTOR_ENDPOINT if resolve_protocol(protocol) == PROTOCOL_HTTP_PROTOBUF else DEFAULT_COLLECTOR_ENDPOINT
 
         if api_key is None:
             api_key = os.getenv(ENV_VLLORA_API_KEY)
@@ -46,105 +95,413 @@ class vLLoraTracing:
         self.api_key = api_key
         self.project_id = project_id
         self.client_name = client_name
-        self.session_id = session_id    
-    
-    def get_processor(self, **kwargs: any):                
-        span_exporter = OTLPSpanExporter(endpoint=self.collector_endpoint, headers=[
-            ('x-api-key', self.api_key),
-            ('x-project-id', self.project_id)
-        ])
-        span_exporter_console = ConsoleSpanExporter()
+        self.session_id = session_id
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.schedule_delay_millis = schedule_delay_millis
+        self.overflow_policy = overflow_policy
+        self.max_traces = max_traces
+        self.trace_ttl_seconds = trace_ttl_seconds
+        self.span_rules = list(span_rules) if span_rules else []
+        self.sampling_ratio = sampling_ratio
+        self.sampling_by = sampling_by
+        self.tail_sampler = tail_sampler
+        self.max_attribute_bytes = max_attribute_bytes
+        self.max_span_bytes = max_span_bytes
+        self.dedup_min_bytes = dedup_min_bytes
+        self.protocol = protocol
+        self.compression = compression
+        self.channel_options = channel_options
+        self.events_compression = events_compression
+        if spool_dir is None:
+            spool_dir = os.getenv(ENV_VLLORA_SPOOL_DIR)
+        self.spool_dir = spool_dir
+        self.metrics_port = metrics_port
+        if otel_metrics is None:
+            otel_metrics = os.getenv(ENV_VLLORA_METRICS_OTEL, "false").lower() == "true"
+        self.otel_metrics = otel_metrics
 
+    def get_processor(self, **kwargs: any):
         exporters = os.getenv(ENV_VLLORA_TRACING_EXPORTERS, DEFAULT_EXPORTERS).split(",")
 
         span_exporters = []
         if "otlp" in exporters:
-            span_exporters.append(span_exporter)
+            # Every processor sending to the same collector shares one exporter and its channel
+            exporter_key = (
+                "otlp", self.collector_endpoint, self.api_key, self.project_id, self.protocol,
+                self.compression, tuple(self.channel_options or ()), self.spool_dir,
+            )
+            span_exporters.append(get_tracing_registry().exporter(exporter_key, self._create_otlp_exporter))
         if "console" in exporters:
-            span_exporters.append(span_exporter_console)
-        
-        return AttributePropagationSpanProcessor(span_exporters, self.client_name, self.session_id)
+            span_exporters.append(ConsoleSpanExporter())
+        if "parquet" in exporters:
+            from .parquet import DEFAULT_PARQUET_DIR, ENV_VLLORA_PARQUET_DIR, ParquetSpanExporter
+
+            # One writer per directory, however many processors export to it
+            parquet_dir = os.path.abspath(os.getenv(ENV_VLLORA_PARQUET_DIR, DEFAULT_PARQUET_DIR))
+            span_exporters.append(get_tracing_registry().exporter(("parquet", parquet_dir), lambda: ParquetSpanExporter(parquet_dir)))
+        if "jsonl" in exporters:
+            from .files import DEFAULT_SPAN_FILES_DIR, ENV_VLLORA_JSONL_DIR, JsonlSpanExporter
+
+            jsonl_dir = os.path.abspath(os.getenv(ENV_VLLORA_JSONL_DIR, DEFAULT_SPAN_FILES_DIR))
+            span_exporters.append(get_tracing_registry().exporter(("jsonl", jsonl_dir), lambda: JsonlSpanExporter(jsonl_dir)))
+
+        if self.events_compression is not None:
+            get_event_dispatcher().set_compression(self.events_compression)
+        if self.spool_dir:
+            get_event_dispatcher().enable_spool(os.path.join(self.spool_dir, "events"))
+
+        rewrite_engine = SpanRewriteEngine(self.span_rules + get_registered_span_rules() + list(DEFAULT_SPAN_RULES))
+
+        head_sampler = HeadSampler(self.sampling_ratio, self.sampling_by)
+        tail_sampler = self.tail_sampler if self.tail_sampler is not None else TailSampler.from_env()
+
+        payload_limiter = PayloadLimiter(self.max_attribute_bytes, self.max_span_bytes, self.dedup_min_bytes)
+        set_payload_limiter(payload_limiter)
+
+        start_prometheus_server(self.metrics_port)
+        if self.otel_metrics:
+            enable_otel_metrics()
+
+        return AttributePropagationSpanProcessor(
+            span_exporters,
+            self.client_name,
+            self.session_id,
+            max_queue_size=self.max_queue_size,
+            max_batch_size=self.max_batch_size,
+            schedule_delay_millis=self.schedule_delay_millis,
+            overflow_policy=self.overflow_policy,
+            max_traces=self.max_traces,
+            trace_ttl_seconds=self.trace_ttl_seconds,
+            rewrite_engine=rewrite_engine,
+            head_sampler=head_sampler,
+            tail_sampler=tail_sampler,
+            payload_limiter=payload_limiter,
+        )
+
+    def _create_otlp_exporter(self) -> SpanExporter:
+        headers = {"x-api-key": self.api_key, "x-project-id": self.project_id}
+        circuit_breaker = get_circuit_breaker(ENDPOINT_OTLP)
+        span_exporter = GuardedSpanExporter(create_otlp_exporter(
+            self.collector_endpoint,
+            headers,
+            protocol=self.protocol,
+            compression=self.compression,
+            channel_options=self.channel_options,
+        ), circuit_breaker)
+        if self.spool_dir:
+            span_exporter = SpoolingSpanExporter(
+                span_exporter,
+                DiskSpool(spool_directory(os.path.join(self.spool_dir, "spans"))),
+                circuit_breaker.guard(OtlpReplaySender(self.collector_endpoint, headers, self.protocol, self.compression, channel_options=self.channel_options)),
+            )
+        return span_exporter
 
 class AttributePropagationSpanProcessor(SpanProcessor):
-    def __init__(self, span_exporters: list[SpanExporter] = None, client_name: Optional[str] = None, session_id: Optional[str] = None):
-        self.span_exporters = span_exporters
-        self.span_attributes: Dict[str, Dict[str, str]] = {}
-        self.client_name = client_name
+    def __init__(self, span_exporters: list[SpanExporter] = None, client_name: Optional[str] = None, session_id: Optional[str] = None, max_queue_size: Optional[int] = None, max_batch_size: Optional[int] = None, schedule_delay_millis: Optional[float] = None, overflow_policy: Optional[str] = None, max_traces: Optional[int] = None, trace_ttl_seconds: Optional[float] = None, rewrite_engine: Optional[SpanRewriteEngine] = None, head_sampler: Optional[HeadSampler] = None, tail_sampler: Optional[TailSampler] = None, payload_limiter: Optional[PayloadLimiter] = None):
+        self.span_exporters = span_exporters or []
+        # One batching stage per exporter so a slow sink can't stall the others
+        self.export_stages = [
+            BatchExportStage(span_exporter, max_queue_size, max_batch_size, schedule_delay_millis, overflow_policy)
+            for span_exporter in self.span_exporters
+        ]
+        self.trace_cache = TraceCache(max_traces, trace_ttl_seconds, self._on_evict)
+        if rewrite_engine is None:
+            rewrite_engine = SpanRewriteEngine(get_registered_span_rules() + list(DEFAULT_SPAN_RULES))
+        self.rewrite_engine = rewrite_engine
+        if head_sampler is not None and head_sampler.samples_everything:
+            head_sampler = None
+        self.head_sampler = head_sampler
+        self.tail_sampler = tail_sampler
+        if payload_limiter is None:
+            payload_limiter = PayloadLimiter()
+        self.payload_limiter = payload_limiter if payload_limiter.enabled else None
+        self.client_name = client_name if client_name else "unknown"
         self.session_id = session_id
-    
-    def on_start(self, span: ReadableSpan, parent_context = None):
-        span_context = span.get_span_context()
-        trace_id = uuid.UUID(int=span_context.trace_id)
+        self._attribute_map = tuple(attribute_to_vllora_attribute_map.items())
+        register_processor(self)
+
+    def _collect_trace_attributes(self, attributes, trace_attributes: Dict[str, Any]):
+        for source_attribute, vllora_attribute in self._attribute_map:
+            if vllora_attribute not in trace_attributes:
+                value = attributes.get(source_attribute)
+                if value is not None:
+                    if isinstance(value, str) and value.startswith("e-"):
+                        value = value[2:]
+                    trace_attributes[vllora_attribute] = value
 
-        if trace_id not in self.span_attributes:
-            self.span_attributes[trace_id] = {}
+    def on_start(self, span: ReadableSpan, parent_context = None):
+        trace_state = self.trace_cache.get_or_create(span.get_span_context().trace_id)
 
         if "vllora.thread_id" not in span.attributes and self.session_id:
             span.set_attribute("vllora.thread_id", self.session_id)
 
-        for adk_attribute, vllora_attribute in attribute_to_vllora_attribute_map.items():
-            if vllora_attribute not in self.span_attributes[trace_id]:
-                if adk_attribute in span.attributes:
-                    self.span_attributes[trace_id][vllora_attribute] = span.attributes[adk_attribute].replace("e-", "", 1) if isinstance(span.attributes[adk_attribute], str) and span.attributes[adk_attribute].startswith("e-") else span.attributes[adk_attribute]
-           
+        self._collect_trace_attributes(span.attributes, trace_state.attributes)
+
     def on_end(self, span: ReadableSpan):
-        # Check if the span has the attribute we want to propagate
-        span_context = span.get_span_context()
-        trace_id = uuid.UUID(int=span_context.trace_id)
-
-        if trace_id not in self.span_attributes:
-            self.span_attributes[trace_id] = {}
-
-        for adk_attribute, vllora_attribute in attribute_to_vllora_attribute_map.items():
-            if vllora_attribute not in self.span_attributes[trace_id]:
-                if adk_attribute in span.attributes:
-                    self.span_attributes[trace_id][vllora_attribute] = span.attributes[adk_attribute].replace("e-", "", 1) if isinstance(span.attributes[adk_attribute], str) and span.attributes[adk_attribute].startswith("e-") else span.attributes[adk_attribute]
-        
-        # Check if we have stored attributes for this trace and apply them
-        if trace_id in self.span_attributes:
-            for adk_attribute, vllora_attribute in attribute_to_vllora_attribute_map.items():
-                if vllora_attribute not in span.attributes:
-                    if vllora_attribute in self.span_attributes[trace_id]:
-                        span._attributes[vllora_attribute] = self.span_attributes[trace_id][vllora_attribute]
-
-        if self.client_name is not None and self.client_name != '':
-            span._attributes["vllora.client_name"] = self.client_name
+        SPANS_PROCESSED.add()
+        trace_id = span.get_span_context().trace_id
+        trace_state = self.trace_cache.get_or_create(trace_id)
+        trace_attributes = trace_state.attributes
+        attributes = span._attributes
+        # Only the trace's local root ends it here; nested run spans must not release its state
+        parent = span.parent
+        is_root = parent is None or parent.is_remote
+
+        # Propagate attributes seen anywhere in the trace onto this span
+        self._collect_trace_attributes(attributes, trace_attributes)
+        self._apply_trace_attributes(trace_attributes, attributes)
+
+        attributes["vllora.client_name"] = self.client_name
+
+        if "vllora.run_id" not in attributes:
+            if trace_state.run_id is None:
+                trace_state.run_id = str(uuid.UUID(int=trace_id))
+            attributes["vllora.run_id"] = trace_state.run_id
+
+        if "vllora.thread_id" not in attributes and self.session_id:
+            attributes["vllora.thread_id"] = self.session_id
+
+        if trace_state.sampled is None:
+            head_sampler = self.head_sampler
+            thread_id = attributes.get("vllora.thread_id")
+            if head_sampler is None:
+                trace_state.sampled = True
+            elif thread_id is None and head_sampler.by == SAMPLE_BY_THREAD and not is_root and len(trace_state.pending or ()) < head_sampler.max_pending_spans:
+                # Hold the span until the trace's thread id is known, so the whole trace gets one thread-keyed decision
+                if trace_state.pending is None:
+                    trace_state.pending = []
+                trace_state.pending.append(span)
+                return
+            else:
+                trace_state.sampled = head_sampler.should_sample(trace_id, thread_id)
+                self._release_pending(trace_state)
+
+        self._process(trace_state, span, is_root)
+
+        if is_root:
+            self.trace_cache.release(trace_id)
+
+    def sample_event(self, span, thread_id: Optional[str] = None) -> bool:
+        """Return whether to send an event about ``span``, following its trace's head sampling decision.
+
+        Events are sent before spans end, so the decision is made here if no
+        span of the trace has needed it yet, and the trace's spans follow it.
+        """
+        head_sampler = self.head_sampler
+        if head_sampler is None:
+            return True
+        trace_id = span.get_span_context().trace_id
+        trace_state = self.trace_cache.get_or_create(trace_id)
+        if trace_state.sampled is None:
+            if thread_id is None:
+                thread_id = trace_state.attributes.get("vllora.thread_id") or self.session_id
+            trace_state.sampled = head_sampler.should_sample(trace_id, thread_id)
+            self._release_pending(trace_state)
+        return trace_state.sampled
+
+    @staticmethod
+    def _apply_trace_attributes(trace_attributes: Dict[str, Any], attributes):
+        for vllora_attribute, value in tuple(trace_attributes.items()):
+            if vllora_attribute not in attributes:
+                attributes[vllora_attribute] = value
+
+    def _release_pending(self, trace_state: TraceState):
+        pending = trace_state.pending
+        if not pending:
+            return
+        trace_state.pending = None
+        for pending_span in pending:
+            # The thread id found since these spans ended belongs on them too
+            self._apply_trace_attributes(trace_state.attributes, pending_span._attributes)
+            self._process(trace_state, pending_span, False)
+
+    def _process(self, trace_state: TraceState, span: ReadableSpan, is_root: bool):
+        if trace_state.sampled:
+            self.rewrite_engine.apply(span)
+            self._roll_up(trace_state, span, is_root)
+            if self.payload_limiter is not None:
+                self.payload_limiter.apply(span._attributes, trace_state.content_hashes)
+            if self.tail_sampler is None or trace_state.tail_kept:
+                self._export(span)
+            else:
+                self._buffer_for_tail_sampling(trace_state, span, is_root)
         else:
-            span._attributes["vllora.client_name"] = "unknown"
+            SPANS_SAMPLED_OUT.add()
 
-        if "vllora.run_id" not in span.attributes:
-            span._attributes["vllora.run_id"] = str(trace_id)
+    def _on_evict(self, trace_state: TraceState):
+        # The trace's root span never ended; decide what is held for it now rather than lose it
+        pending = trace_state.pending
+        if pending:
+            SPANS_EVICTED_UNDECIDED.add(len(pending))
+            if trace_state.sampled is None:
+                trace_id = pending[0].get_span_context().trace_id
+                trace_state.sampled = self.head_sampler.should_sample(trace_id, trace_state.attributes.get("vllora.thread_id"))
+            self._release_pending(trace_state)
+        buffer = trace_state.buffer
+        if buffer:
+            trace_state.buffer = None
+            if not pending:
+                SPANS_EVICTED_UNDECIDED.add(len(buffer))
+            for buffered_span in buffer:
+                self._export(buffered_span)
 
-        if "vllora.thread_id" not in span.attributes and self.session_id:
-            span._attributes["vllora.thread_id"] = self.session_id
+    def _roll_up(self, trace_state: TraceState, span: ReadableSpan, is_root: bool):
+        attributes = span._attributes
+        run_id = attributes.get("vllora.run_id")
+        rollups = trace_state.rollups
+        if is_root or span._name in ROOT_SPAN_NAMES:
+            # Spans that ended before the thread id was known are keyed without one.
+            # A nested run span gets the totals so far; the root takes them for good.
+            rollup = None
+            if rollups:
+                for key in [key for key in rollups if key[0] == run_id]:
+                    if rollup is None:
+                        rollup = RunRollup()
+                    rollup.merge(rollups.pop(key) if is_root else rollups[key])
+            if rollup is None and span._name in ROOT_SPAN_NAMES:
+                rollup = RunRollup()
+            if rollup is not None:
+                for key, value in rollup.attributes().items():
+                    attributes[key] = value
+        if is_root:
+            return
+
+        key = (run_id, attributes.get("vllora.thread_id"))
+        if rollups is None:
+            rollups = trace_state.rollups = {}
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = RunRollup()
+        rollup.add(span)
+
+    def _buffer_for_tail_sampling(self, trace_state: TraceState, span: ReadableSpan, is_root: bool):
+        buffer = trace_state.buffer
+        if buffer is None:
+            buffer = trace_state.buffer = []
+        buffer.append(span)
+
+        if is_root:
+            trace_state.buffer = None
+            if self.tail_sampler.should_keep(buffer, span):
+                for buffered_span in buffer:
+                    self._export(buffered_span)
+            else:
+                SPANS_SAMPLED_OUT.add(len(buffer))
+        elif len(buffer) >= self.tail_sampler.max_spans_per_trace:
+            # Keep oversized traces rather than holding them in memory
+            trace_state.buffer = None
+            trace_state.tail_kept = True
+            for buffered_span in buffer:
+                self._export(buffered_span)
+
+    def _export(self, span: ReadableSpan):
+        for export_stage in self.export_stages:
+            export_stage.enqueue(span)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        deadline = time.monotonic() + timeout_millis / 1000
+        flushed = True
+        for export_stage in self.export_stages:
+            flushed = export_stage.force_flush(max(0, deadline - time.monotonic()) * 1000) and flushed
+        return flushed
+
+    def shutdown(self, timeout_millis: int = 30000):
+        unregister_processor(self)
+        deadline = time.monotonic() + timeout_millis / 1000
+        for export_stage in self.export_stages:
+            export_stage.shutdown(max(0, deadline - time.monotonic()) * 1000)
+
+
+class DelegatingSpanProcessor(SpanProcessor):
+    """The span processor vLLora adds to a tracer provider, once.
+
+    Spans are handed to the current AttributePropagationSpanProcessor. When
+    init() is called again with a different configuration, the delegate is
+    swapped instead of a second processor being added to the provider.
+    """
+
+    def __init__(self, delegate: AttributePropagationSpanProcessor):
+        self.delegate = delegate
+
+    def on_start(self, span: ReadableSpan, parent_context = None):
+        self.delegate.on_start(span, parent_context)
+
+    def on_end(self, span: ReadableSpan):
+        self.delegate.on_end(span)
+
+    def sample_event(self, span, thread_id: Optional[str] = None) -> bool:
+        return self.delegate.sample_event(span, thread_id)
+
+    def replace(self, delegate: AttributePropagationSpanProcessor):
+        """Send new spans to ``delegate``, then drain and shut down the previous one."""
+        previous, self.delegate = self.delegate, delegate
+        previous.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+    def shutdown(self, timeout_millis: int = 30000):
+        self.delegate.shutdown(timeout_millis)
+
+
+class TracingRegistry:
+    """Process-level state that makes init() idempotent.
+
+    Each tracer provider gets a single DelegatingSpanProcessor, rebuilt only
+    when the vLLoraTracing configuration changes. OTLP exporters are shared
+    by every processor sending to the same collector with the same
+    credentials, so they share one gRPC channel or HTTP session.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # provider -> (processor, configuration it was built from)
+        self._processors: "weakref.WeakKeyDictionary[Any, Tuple[DelegatingSpanProcessor, Dict[str, Any]]]" = weakref.WeakKeyDictionary()
+        self._providers: Dict[str, Any] = {}
+        self._exporters: Dict[tuple, SharedSpanExporter] = {}
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        self._lock = threading.RLock()
 
-        if span._name == "invocation":
-            span._name = "run"
+    def install(self, tracer_provider, tracing: vLLoraTracing) -> DelegatingSpanProcessor:
+        """Attach vLLora to ``tracer_provider``, or reconfigure it if attached with different settings."""
+        config = dict(vars(tracing))
+        with self._lock:
+            entry = self._processors.get(tracer_provider)
+            if entry is not None:
+                processor, current_config = entry
+                if current_config != config:
+                    processor.replace(tracing.get_processor())
+                    self._processors[tracer_provider] = (processor, config)
+                return processor
 
-        if span._name.startswith("agent_run"):
-            # Extract agent name from the span name if it follows the pattern "agent_run [name]"
-            import re
-            match = re.match(r"agent_run\s*\[(.*?)\]", span._name)
-            agent_name = match.group(1) if match else span._attributes.get("agent.name", "")
+            processor = DelegatingSpanProcessor(tracing.get_processor())
+            tracer_provider.add_span_processor(processor)
+            self._processors[tracer_provider] = (processor, config)
+            return processor
 
-            span._name = "agent"
-            span._attributes["vllora.agent_name"] = agent_name
+    def provider(self, name: str):
+        """Return a private tracer provider for an integration, created on first use."""
+        with self._lock:
+            tracer_provider = self._providers.get(name)
+            if tracer_provider is None:
+                from opentelemetry.sdk.trace import TracerProvider
+                tracer_provider = self._providers[name] = TracerProvider()
+            return tracer_provider
 
-        if span._attributes.get("openinference.span.kind") == "AGENT":
-            span._attributes["vllora.agent_name"] = span._name
-            span._name = "agent"
+    def exporter(self, key: tuple, create: Callable[[], SpanExporter]) -> SharedSpanExporter:
+        """Return the exporter for ``key``, creating it on first use or after the last user shut it down."""
+        with self._lock:
+            shared = self._exporters.get(key)
+            if shared is None or shared.closed:
+                shared = self._exporters[key] = SharedSpanExporter(create(), create)
+            return shared.acquire()
 
-        if span._name.startswith("call_llm"):
-            span._name = "task"
-            span._attributes["vllora.task_name"] = "call_llm"
 
-        if span._attributes.get("openinference.span.kind") == "LLM":
-            span._attributes["vllora.task_name"] = span._name
-            span._name = "task"
+_registry = TracingRegistry()
 
-        if span._attributes.get("openinference.span.kind") == "TOOL":
-            span._attributes["vllora.tool_name"] = span._name
-            span._name = "tool"
 
-        for span_exporter in self.span_exporters:
-            span_exporter.export([span])
\ No newline at end of file
+def get_tracing_registry() -> TracingRegistry:
+    return _registry
@@ -0,0 +1,234 @@
+import functools
+import gzip
+import os
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from opentelemetry.sdk.trace.export import SpanExporter
+
+from .log import logger
+
+# Environment variable constants
+ENV_VLLORA_TRACING_PROTOCOL = "VLLORA_TRACING_PROTOCOL"
+ENV_VLLORA_TRACING_COMPRESSION = "VLLORA_TRACING_COMPRESSION"
+ENV_VLLORA_EVENTS_COMPRESSION = "VLLORA_EVENTS_COMPRESSION"
+ENV_VLLORA_GRPC_MAX_MESSAGE_BYTES = "VLLORA_GRPC_MAX_MESSAGE_BYTES"
+ENV_VLLORA_GRPC_KEEPALIVE_MILLIS = "VLLORA_GRPC_KEEPALIVE_MILLIS"
+ENV_VLLORA_GRPC_KEEPALIVE_TIMEOUT_MILLIS = "VLLORA_GRPC_KEEPALIVE_TIMEOUT_MILLIS"
+
+# Protocols
+PROTOCOL_GRPC = "grpc"
+PROTOCOL_HTTP_PROTOBUF = "http/protobuf"
+
+# Compression algorithms
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_DEFLATE = "deflate"
+COMPRESSION_ZSTD = "zstd"
+
+# Default values
+DEFAULT_TRACING_PROTOCOL = PROTOCOL_GRPC
+DEFAULT_TRACING_COMPRESSION = COMPRESSION_NONE
+DEFAULT_EVENTS_COMPRESSION = COMPRESSION_NONE
+DEFAULT_HTTP_TRACES_PATH = "/v1/traces"
+
+
+@functools.lru_cache(maxsize=1)
+def _zstd_compressor():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor()
+
+
+def resolve_protocol(protocol: Optional[str] = None) -> str:
+    if protocol is None:
+        protocol = os.getenv(ENV_VLLORA_TRACING_PROTOCOL, DEFAULT_TRACING_PROTOCOL)
+    protocol = protocol.lower()
+    if protocol == "http":
+        protocol = PROTOCOL_HTTP_PROTOBUF
+    if protocol not in (PROTOCOL_GRPC, PROTOCOL_HTTP_PROTOBUF):
+        raise ValueError(f"protocol must be '{PROTOCOL_GRPC}' or '{PROTOCOL_HTTP_PROTOBUF}', got '{protocol}'")
+    return protocol
+
+
+def resolve_compression(compression: Optional[str], env_var: str, default: str) -> str:
+    if compression is None:
+        compression = os.getenv(env_var, default)
+    compression = compression.lower()
+    if compression not in (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_DEFLATE, COMPRESSION_ZSTD):
+        raise ValueError(f"unsupported compression '{compression}'")
+    return compression
+
+
+def grpc_channel_options(max_message_bytes: Optional[int] = None, keepalive_millis: Optional[int] = None, keepalive_timeout_millis: Optional[int] = None) -> List[Tuple[str, int]]:
+    """Build gRPC channel options from arguments or VLLORA_GRPC_* env variables."""
+    if max_message_bytes is None and os.getenv(ENV_VLLORA_GRPC_MAX_MESSAGE_BYTES):
+        max_message_bytes = int(os.getenv(ENV_VLLORA_GRPC_MAX_MESSAGE_BYTES))
+    if keepalive_millis is None and os.getenv(ENV_VLLORA_GRPC_KEEPALIVE_MILLIS):
+        keepalive_millis = int(os.getenv(ENV_VLLORA_GRPC_KEEPALIVE_MILLIS))
+    if keepalive_timeout_millis is None and os.getenv(ENV_VLLORA_GRPC_KEEPALIVE_TIMEOUT_MILLIS):
+        keepalive_timeout_millis = int(os.getenv(ENV_VLLORA_GRPC_KEEPALIVE_TIMEOUT_MILLIS))
+
+    options = []
+    if max_message_bytes is not None:
+        options.append(("grpc.max_send_message_length", max_message_bytes))
+        options.append(("grpc.max_receive_message_length", max_message_bytes))
+    if keepalive_millis is not None:
+        options.append(("grpc.keepalive_time_ms", keepalive_millis))
+        options.append(("grpc.keepalive_permit_without_calls", 1))
+    if keepalive_timeout_millis is not None:
+        options.append(("grpc.keepalive_timeout_ms", keepalive_timeout_millis))
+    return options
+
+
+def _grpc_exporter(endpoint: str, headers: Dict[str, str], compression: str, channel_options: Sequence[Tuple[str, int]]) -> SpanExporter:
+    import inspect
+
+    import grpc
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+    kwargs = {
+        "endpoint": endpoint,
+        "headers": list(headers.items()),
+    }
+    if compression == COMPRESSION_GZIP:
+        kwargs["compression"] = grpc.Compression.Gzip
+    elif compression == COMPRESSION_DEFLATE:
+        kwargs["compression"] = grpc.Compression.Deflate
+    if channel_options:
+        if "channel_options" in inspect.signature(OTLPSpanExporter.__init__).parameters:
+            kwargs["channel_options"] = tuple(channel_options)
+        else:
+            logger.warning("Installed OTLP gRPC exporter does not support channel options, ignoring them")
+    return OTLPSpanExporter(**kwargs)
+
+
+def _http_exporter(endpoint: str, headers: Dict[str, str], compression: str) -> SpanExporter:
+    from opentelemetry.exporter.otlp.proto.http import Compression
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    if not endpoint.rstrip("/").endswith(DEFAULT_HTTP_TRACES_PATH):
+        endpoint = endpoint.rstrip("/") + DEFAULT_HTTP_TRACES_PATH
+    return OTLPSpanExporter(
+        endpoint=endpoint,
+        headers=headers,
+        compression={
+            COMPRESSION_GZIP: Compression.Gzip,
+            COMPRESSION_DEFLATE: Compression.Deflate,
+        }.get(compression, Compression.NoCompression),
+    )
+
+
+def create_otlp_exporter(endpoint: str, headers: Dict[str, Optional[str]], protocol: Optional[str] = None, compression: Optional[str] = None, channel_options: Optional[Sequence[Tuple[str, int]]] = None) -> SpanExporter:
+    """Create an OTLP span exporter for the selected protocol and compression.
+
+    Args:
+        endpoint: The collector endpoint
+        headers: Headers sent with every export, entries with a None value are skipped
+        protocol: "grpc" or "http/protobuf", optional, by default read from env variable VLLORA_TRACING_PROTOCOL
+        compression: "none", "gzip" or "deflate", optional, by default read from env variable VLLORA_TRACING_COMPRESSION
+        channel_options: gRPC channel options, optional, by default built from VLLORA_GRPC_* env variables
+    """
+    protocol = resolve_protocol(protocol)
+    compression = resolve_compression(compression, ENV_VLLORA_TRACING_COMPRESSION, DEFAULT_TRACING_COMPRESSION)
+    if compression == COMPRESSION_ZSTD:
+        # OTLP exporters only implement gzip and deflate
+        logger.warning("zstd is not supported for OTLP span export, using gzip")
+        compression = COMPRESSION_GZIP
+    headers = {key: value for key, value in headers.items() if value is not None}
+
+    if protocol == PROTOCOL_HTTP_PROTOBUF:
+        return _http_exporter(endpoint, headers, compression)
+    if channel_options is None:
+        channel_options = grpc_channel_options()
+    return _grpc_exporter(endpoint, headers, compression, channel_options)
+
+
+def compress_body(body: bytes, compression: str) -> Tuple[bytes, Optional[str]]:
+    """Compress a request body, returning it with its Content-Encoding value."""
+    if compression == COMPRESSION_GZIP:
+        return gzip.compress(body), COMPRESSION_GZIP
+    if compression == COMPRESSION_DEFLATE:
+        return zlib.compress(body), COMPRESSION_DEFLATE
+    if compression == COMPRESSION_ZSTD:
+        compressor = _zstd_compressor()
+        if compressor is not None:
+            return compressor.compress(body), COMPRESSION_ZSTD
+        return gzip.compress(body), COMPRESSION_GZIP
+    return body, None
+
+
+class OtlpReplaySender:
+    """Sends already-encoded ExportTraceServiceRequest bytes to a collector.
+
+    Used to replay spooled span batches without decoding them back into spans.
+    Calling the sender returns True if the collector accepted the batch.
+    """
+
+    _GRPC_EXPORT_METHOD = "/opentelemetry.proto.collector.trace.v1.TraceService/Export"
+
+    def __init__(self, endpoint: str, headers: Dict[str, Optional[str]], protocol: Optional[str] = None, compression: Optional[str] = None, timeout: float = 10, channel_options: Optional[Sequence[Tuple[str, int]]] = None):
+        self.endpoint = endpoint
+        self.headers = {key: value for key, value in headers.items() if value is not None}
+        self.protocol = resolve_protocol(protocol)
+        self.compression = resolve_compression(compression, ENV_VLLORA_TRACING_COMPRESSION, DEFAULT_TRACING_COMPRESSION)
+        if self.compression == COMPRESSION_ZSTD:
+            self.compression = COMPRESSION_GZIP
+        self.timeout = timeout
+        self.channel_options = channel_options
+        self._send = None
+
+    def _grpc_send(self):
+        import grpc
+        from urllib.parse import urlparse
+
+        parsed = urlparse(self.endpoint)
+        target = parsed.netloc if parsed.scheme in ("http", "https") else self.endpoint
+        # Same message size and keepalive settings as the exporter's channel
+        options = self.channel_options if self.channel_options is not None else grpc_channel_options()
+        if parsed.scheme == "https":
+            channel = grpc.secure_channel(target, grpc.ssl_channel_credentials(), options=options)
+        else:
+            channel = grpc.insecure_channel(target, options=options)
+        # Without serializers the stub sends and returns raw bytes
+        export = channel.unary_unary(self._GRPC_EXPORT_METHOD)
+        metadata = tuple(self.headers.items())
+        grpc_compression = {
+            COMPRESSION_GZIP: grpc.Compression.Gzip,
+            COMPRESSION_DEFLATE: grpc.Compression.Deflate,
+        }.get(self.compression, grpc.Compression.NoCompression)
+
+        def send(data: bytes) -> bool:
+            try:
+                export(data, metadata=metadata, timeout=self.timeout, compression=grpc_compression)
+            except grpc.RpcError:
+                return False
+            return True
+        return send
+
+    def _http_send(self):
+        import httpx
+
+        endpoint = self.endpoint.rstrip("/")
+        if not endpoint.endswith(DEFAULT_HTTP_TRACES_PATH):
+            endpoint += DEFAULT_HTTP_TRACES_PATH
+        client = httpx.Client(timeout=self.timeout)
+
+        def send(data: bytes) -> bool:
+            body, content_encoding = compress_body(data, self.compression)
+            headers = dict(self.headers, **{"Content-Type": "application/x-protobuf"})
+            if content_encoding:
+                headers["Content-Encoding"] = content_encoding
+            try:
+                response = client.post(endpoint, content=body, headers=headers)
+            except httpx.HTTPError:
+                return False
+            return 200 <= response.status_code < 300
+        return send
+
+    def __call__(self, data: bytes) -> bool:
+        if self._send is None:
+            self._send = self._http_send() if self.protocol == PROTOCOL_HTTP_PROTOBUF else self._grpc_send()
+        return self._send(data)
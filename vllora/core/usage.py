@@ -0,0 +1,28 @@
+from typing import Any, Mapping, Optional, Sequence
+
+# Attributes carrying the model and token usage of an LLM span, in order of preference:
+# OpenTelemetry GenAI conventions (ADK), older GenAI names, OpenInference (OpenAI Agents),
+# then what vLLora records on streamed responses
+MODEL_ATTRIBUTES = ("gen_ai.request.model", "gen_ai.response.model", "llm.model_name")
+INPUT_TOKEN_ATTRIBUTES = ("gen_ai.usage.input_tokens", "gen_ai.usage.prompt_tokens", "llm.token_count.prompt")
+OUTPUT_TOKEN_ATTRIBUTES = ("gen_ai.usage.output_tokens", "gen_ai.usage.completion_tokens", "llm.token_count.completion", "vllora.output_tokens")
+TOTAL_TOKEN_ATTRIBUTES = ("gen_ai.usage.total_tokens", "llm.token_count.total")
+
+
+def first_attribute(attributes: Mapping[str, Any], keys: Sequence[str]) -> Optional[Any]:
+    for key in keys:
+        value = attributes.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def token_count(attributes: Mapping[str, Any], keys: Sequence[str]) -> Optional[int]:
+    """Return the first of ``keys`` that holds a token count, as an int."""
+    value = first_attribute(attributes, keys)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,192 @@
+from typing import Any
+import os
+
+from agents.tracing.span_data import SpanData
+from agents.tracing.setup import GLOBAL_TRACE_PROVIDER
+from agents.tracing.processors import BackendSpanExporter
+from agents.tracing import Span, Trace
+from openinference.instrumentation.openai_agents._processor import OpenInferenceTracingProcessor
+from openai import AsyncOpenAI, AsyncStream
+
+from opentelemetry import trace
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+from opentelemetry.trace.propagation import set_span_in_context
+
+from ..core.events import send_vllora_event_sync
+from ..core.streaming import StreamTimer
+from .context import TraceMetadata, TraceMetadataCache
+
+original_post = AsyncOpenAI.post
+original_init = AsyncOpenAI.__init__
+
+original_on_span_start = OpenInferenceTracingProcessor.on_span_start
+original_on_trace_start = OpenInferenceTracingProcessor.on_trace_start
+original_on_trace_end = OpenInferenceTracingProcessor.on_trace_end
+
+# Agents trace id -> ids resolved in on_trace_start, released in on_trace_end
+_trace_metadata = TraceMetadataCache()
+
+# OpenInference span kind -> (vLLora name attribute, event type)
+_SPAN_KIND_EVENTS = {
+    "AGENT": ("vllora.agent_name", "agent"),
+    "LLM": ("vllora.task_name", "task"),
+    "TOOL": ("vllora.tool_name", "tool"),
+}
+
+class RunSpanData(SpanData):
+    __slots__ = "name"
+
+    def __init__(
+        self,
+        name: str,
+    ):
+        self.name = name
+
+    @property
+    def type(self) -> str:
+        return "run"
+
+    def export(self) -> dict[str, Any]:
+        return {
+            "type": self.type,
+        }
+
+def async_openai_init(self, *args, **kwargs):
+    """
+    Monkey-patched __init__ that uses VLLORA_API_KEY instead of OPENAI_API_KEY
+    and VLLORA_API_BASE_URL instead of OPENAI_BASE_URL if not set in environment variables.
+    """
+    # If api_key is not explicitly provided and OPENAI_API_KEY is not set,
+    # use VLLORA_API_KEY as fallback, or "no_key" if none available
+    if 'api_key' not in kwargs or kwargs['api_key'] is None:
+        if not os.environ.get("OPENAI_API_KEY"):
+            vllora_api_key = os.environ.get("VLLORA_API_KEY")
+            if vllora_api_key:
+                kwargs['api_key'] = vllora_api_key
+            else:
+                kwargs['api_key'] = "no_key"
+    
+    # If base_url is not explicitly provided and OPENAI_BASE_URL is not set,
+    # use VLLORA_API_BASE_URL as fallback
+    if 'base_url' not in kwargs or kwargs['base_url'] is None:
+        if not os.environ.get("OPENAI_BASE_URL"):
+            vllora_base_url = os.environ.get("VLLORA_API_BASE_URL")
+            if vllora_base_url:
+                kwargs['base_url'] = vllora_base_url
+    
+    # Call the original __init__
+    original_init(self, *args, **kwargs)
+
+
+def post(self, *args, **kwargs):
+    span = trace.get_current_span()
+
+    ctx = set_span_in_context(span)
+
+    headers = kwargs.get('options', {}).get('headers', {})
+    TraceContextTextMapPropagator().inject(headers, ctx)
+
+    run_id = span._attributes.get("vllora.run_id")
+    thread_id = span._attributes.get("vllora.thread_id")
+
+    headers["x-run-id"] = run_id
+    headers["x-thread-id"] = thread_id
+    
+    kwargs['options']['headers'] = headers
+
+    if not kwargs.get('stream'):
+        return original_post(self, *args, **kwargs)
+    return _timed_post(original_post(self, *args, **kwargs), StreamTimer(span))
+
+async def _timed_post(request, timer: StreamTimer):
+    response = await request
+    if isinstance(response, AsyncStream):
+        # Chunks are timed as the SDK reads them, without buffering the stream
+        response._iterator = _timed_chunks(response._iterator, timer)
+    return response
+
+def _is_content_chunk(chunk) -> bool:
+    kind = getattr(chunk, "type", None)
+    if kind is not None:
+        # Responses API: only deltas carry output, the other events are lifecycle
+        return kind.endswith(".delta")
+    # Chat Completions: the trailing usage chunk has no choices
+    return bool(getattr(chunk, "choices", None))
+
+def _output_tokens(chunk):
+    usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "response", None), "usage", None)
+    if usage is None:
+        return None
+    tokens = getattr(usage, "output_tokens", None)
+    return tokens if tokens is not None else getattr(usage, "completion_tokens", None)
+
+async def _timed_chunks(chunks, timer: StreamTimer):
+    last = None
+    try:
+        async for chunk in chunks:
+            if _is_content_chunk(chunk):
+                timer.chunk()
+            last = chunk
+            yield chunk
+    finally:
+        # Usage arrives on the final chunk: response.completed, or the Chat Completions usage chunk
+        timer.output_tokens = _output_tokens(last)
+        timer.finish()
+
+def _metadata_for(trace_id: str) -> TraceMetadata:
+    metadata = _trace_metadata.get(trace_id)
+    if metadata is None:
+        # The trace started before vLLora was initialized
+        metadata = TraceMetadata.from_trace(GLOBAL_TRACE_PROVIDER.get_current_trace())
+        _trace_metadata.put(trace_id, metadata)
+    return metadata
+
+def on_span_start(self, span: Span[any]):
+    original_on_span_start(self, span)
+
+    if not span.started_at:
+        return
+
+    metadata = _metadata_for(span.trace_id)
+    otel_span = self._otel_spans[span.span_id]
+    otel_span.set_attribute("vllora.thread_id", metadata.thread_id)
+    otel_span.set_attribute("vllora.run_id", metadata.run_id)
+
+    kind_event = _SPAN_KIND_EVENTS.get(otel_span.attributes.get("openinference.span.kind"))
+    if kind_event is not None:
+        name_attribute, event_type = kind_event
+        otel_span.set_attribute(name_attribute, otel_span.name)
+        send_vllora_event_sync(otel_span, event_type)
+
+def on_trace_start(self, trace: Trace):
+    otel_span = self._tracer.start_span(
+            name="run",
+        )
+
+    metadata = TraceMetadata.from_trace(trace)
+    _trace_metadata.put(trace.trace_id, metadata)
+
+    otel_span.set_attribute("vllora.thread_id", metadata.thread_id)
+    otel_span.set_attribute("vllora.run_id", metadata.run_id)
+
+    self._root_spans[trace.trace_id] = otel_span
+
+    send_vllora_event_sync(otel_span, "run")
+
+def on_trace_end(self, trace: Trace):
+    _trace_metadata.release(trace.trace_id)
+    original_on_trace_end(self, trace)
+
+def init_agent():
+    OpenInferenceTracingProcessor.on_span_start = on_span_start
+    OpenInferenceTracingProcessor.on_trace_start = on_trace_start
+    OpenInferenceTracingProcessor.on_trace_end = on_trace_end
+    
+    # Monkey patch AsyncOpenAI to use VLLORA_API_KEY instead of OPENAI_API_KEY
+    AsyncOpenAI.__init__ = async_openai_init
+    
+    # Inject trace headers
+    AsyncOpenAI.post = post
+    
+    # Disable span export
+    BackendSpanExporter.export = lambda self, items: None
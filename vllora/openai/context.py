@@ -0,0 +1,76 @@
+import collections
+import os
+import threading
+import uuid
+from typing import Optional
+
+from ..core.fork import reinit_after_fork
+
+# Environment variable constants
+ENV_VLLORA_OPENAI_MAX_TRACES = "VLLORA_OPENAI_MAX_TRACES"
+
+# Default values
+DEFAULT_OPENAI_MAX_TRACES = 1024
+
+
+class TraceMetadata:
+    """vLLora ids resolved once per OpenAI Agents trace and reused by every span in it."""
+
+    __slots__ = ("thread_id", "run_id")
+
+    def __init__(self, thread_id: str, run_id: str):
+        self.thread_id = thread_id
+        self.run_id = run_id
+
+    @classmethod
+    def from_trace(cls, trace) -> "TraceMetadata":
+        # The trace's group id ties its runs into one thread; without one the trace id is used
+        group_id = trace.export()['group_id']
+        if not group_id:
+            group_id = str(uuid.UUID(trace.trace_id.replace("trace_", "")))
+        return cls(group_id, group_id)
+
+
+class TraceMetadataCache:
+    """Bounded map of OpenAI Agents trace id to its TraceMetadata.
+
+    Entries are added when a trace starts and released when it ends.
+    Traces that never end are evicted oldest first once ``max_traces`` is
+    reached.
+    """
+
+    def __init__(self, max_traces: Optional[int] = None):
+        if max_traces is None:
+            max_traces = int(os.getenv(ENV_VLLORA_OPENAI_MAX_TRACES, DEFAULT_OPENAI_MAX_TRACES))
+
+        self.max_traces = max(1, max_traces)
+        self._entries: "collections.OrderedDict[str, TraceMetadata]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        reinit_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # Traces in flight at the fork end in the parent
+        self._lock = threading.Lock()
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, trace_id: str, metadata: TraceMetadata):
+        with self._lock:
+            self._entries[trace_id] = metadata
+            self._entries.move_to_end(trace_id)
+            while len(self._entries) > self.max_traces:
+                self._entries.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[TraceMetadata]:
+        # Read on every span start, so without the lock; a single dict lookup is atomic
+        return self._entries.get(trace_id)
+
+    def release(self, trace_id: str):
+        with self._lock:
+            self._entries.pop(trace_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()